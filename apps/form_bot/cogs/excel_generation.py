@@ -108,6 +108,7 @@ class ExcelGenerationButton(discord.ui.View):
             async with aiohttp.ClientSession() as session:
                 async with session.get(
                     f"{API_URL}/api/tournaments",
+                    params=[('ids', tid) for tid in DEMO_TOURNAMENT_IDS],
                     timeout=aiohttp.ClientTimeout(total=30)
                 ) as resp:
                     if resp.status != 200:
@@ -116,7 +117,7 @@ class ExcelGenerationButton(discord.ui.View):
 
                     tournaments = await resp.json()
 
-            # デモ用: 指定した大会のみ表示
+            # デモ用: 指定した大会のみ表示（ids 未対応のAPIでも絞り込めるよう手元でも確認）
             tournaments = [t for t in tournaments if t['tournament_id'] in DEMO_TOURNAMENT_IDS]
 
             if not tournaments:
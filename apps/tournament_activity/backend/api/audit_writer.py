@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+監査ログの非同期書き込み
+
+変更系APIのたびに audit_logs へ1行 INSERT を待つとレスポンスが遅れるため、
+記録はメモリ上のバッファに積むだけにして、バックグラウンドのタスクが
+AUDIT_FLUSH_INTERVAL_MS ごと（または AUDIT_BATCH_SIZE 件たまった時点）に
+複数行 INSERT でまとめて書き込む。
+
+- 終了時（shutdown）は残りをすべて書き込んでから止まる
+- バッファが AUDIT_QUEUE_SIZE 件を超えた分は捨て、件数を dropped として数える
+  （/health の audit で確認できる）。監査ログはベストエフォートで、本処理を妨げない
+- ライターが起動していない（スクリプトから呼ばれた等）ときは submit() が False を返すので、
+  呼び出し側でその場で書き込む
+
+環境変数:
+    AUDIT_FLUSH_INTERVAL_MS: 書き込み間隔（ミリ秒、既定 200）
+    AUDIT_BATCH_SIZE: この件数たまったら間隔を待たずに書き込む（既定 100）
+    AUDIT_QUEUE_SIZE: バッファの上限件数（既定 10000）
+"""
+
+import asyncio
+import os
+from collections import deque
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from api.database import db
+
+AUDIT_FLUSH_INTERVAL_MS = int(os.getenv('AUDIT_FLUSH_INTERVAL_MS', '200'))
+AUDIT_BATCH_SIZE = int(os.getenv('AUDIT_BATCH_SIZE', '100'))
+AUDIT_QUEUE_SIZE = int(os.getenv('AUDIT_QUEUE_SIZE', '10000'))
+
+# 複数行 INSERT は全行同じカラム構成にする（kind により使わないカラムは NULL）
+AUDIT_COLUMNS = (
+    'timestamp', 'kind', 'actor_discord_id', 'method', 'path', 'status_code',
+    'action', 'target_type', 'target_id', 'summary', 'request_body', 'before_json', 'after_json',
+)
+
+
+def audit_row(data: Dict[str, Any]) -> Dict[str, Any]:
+    """audit_logs の1行（記録した時刻を timestamp に入れる）"""
+    row = {column: data.get(column) for column in AUDIT_COLUMNS}
+    if row['timestamp'] is None:
+        row['timestamp'] = datetime.now().replace(microsecond=0)
+    return row
+
+
+class AuditWriter:
+    """audit_logs への書き込みをまとめるバックグラウンドライター"""
+
+    def __init__(
+        self,
+        flush_interval_ms: int = AUDIT_FLUSH_INTERVAL_MS,
+        batch_size: int = AUDIT_BATCH_SIZE,
+        queue_size: int = AUDIT_QUEUE_SIZE
+    ):
+        self.flush_interval = flush_interval_ms / 1000
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._rows: deque = deque()
+        self._task: Optional[asyncio.Task] = None
+        self._full: Optional[asyncio.Event] = None
+        self._closing = False
+        self._stats = {'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self) -> None:
+        """書き込みタスクを起動する"""
+        if self._task is not None:
+            return
+        self._closing = False
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """バッファの残りを書き込んでから止める"""
+        if self._task is None:
+            return
+        self._closing = True
+        self._full.set()
+        try:
+            await self._task
+        except Exception as e:
+            print(f'⚠️ 監査ログ書き込みタスク終了エラー: {e}')
+        self._task = None
+        await self.flush()
+
+    def submit(self, data: Dict[str, Any]) -> bool:
+        """監査ログを1件積む。ライター停止中は積まずに False を返す"""
+        if self._task is None or self._closing:
+            return False
+        if len(self._rows) >= self.queue_size:
+            self._stats['dropped'] += 1
+            dropped = self._stats['dropped']
+            # 詰まっている間の出力は間引く
+            if dropped == 1 or dropped % 1000 == 0:
+                print(f'⚠️ 監査ログのバッファが一杯のため破棄しました（累計 {dropped} 件）')
+            return True
+        self._rows.append(audit_row(data))
+        if len(self._rows) >= self.batch_size:
+            self._full.set()
+        return True
+
+    async def flush(self) -> None:
+        """バッファの内容を batch_size 件ずつ書き込む"""
+        while self._rows:
+            batch = [self._rows.popleft() for _ in range(min(len(self._rows), self.batch_size))]
+            await self._write(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        """書き込み件数・破棄件数など（/health 用）"""
+        return {'running': self.running, 'queued': len(self._rows), **self._stats}
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+            if self._closing:
+                return
+
+    async def _write(self, rows: List[Dict[str, Any]]) -> None:
+        try:
+            result = await db.bulk_insert('audit_logs', rows)
+            error = result.get('error')
+        except Exception as e:
+            error = str(e)
+        if error:
+            self._stats['failed'] += len(rows)
+            print(f'⚠️ 監査ログ記録失敗（{len(rows)}件）: {error}')
+            return
+        self._stats['written'] += len(rows)
+        self._stats['batches'] += 1
+
+
+# グローバルインスタンス
+audit_writer = AuditWriter()
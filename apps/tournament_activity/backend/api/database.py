@@ -8,19 +8,257 @@ X-Server環境用
 """
 
 import os
-import json
+import time
+import asyncio
 import aiomysql
-from typing import Optional, Dict, List, Any
+from collections import deque
+from contextlib import asynccontextmanager
+from functools import lru_cache
+from typing import Optional, Dict, List, Any, Iterable, Sequence, Tuple, AsyncIterator
 from dotenv import load_dotenv
 
+from api import json_codec
+from api.query_stats import record_query, record_acquire, record_rows
+
 load_dotenv()
 
+# IN句1回あたりの最大要素数（巨大なIN句でパケット上限やプラン劣化を起こさないよう分割する）
+IN_CHUNK_SIZE = 500
+
+# 一括INSERT/UPDATE 1文あたりの最大行数（max_allowed_packet を超えないよう分割する）
+BULK_BATCH_SIZE = 500
+
+# ストリーミングSELECTで1回に読み出す行数
+STREAM_BATCH_SIZE = 500
+
+# 非バッファカーソル（SSCursor）は execute 時点で行数が分からず、rowcount にこの値が入る
+_UNBUFFERED_ROWCOUNT = 2 ** 64 - 1
+
+# コネクションプール設定（環境変数で調整する）
+POOL_MINSIZE = int(os.getenv('DB_POOL_MINSIZE', '1'))
+POOL_MAXSIZE = int(os.getenv('DB_POOL_MAXSIZE', '10'))
+# この秒数より古い接続は作り直す（サーバ側の wait_timeout より短くする。-1 で無効）
+POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '3600'))
+DB_CONNECT_TIMEOUT = float(os.getenv('DB_CONNECT_TIMEOUT', '10'))
+# この秒数以上使われていなかった接続は取得時に ping で生存確認する（0 なら毎回、-1 で無効）
+POOL_PRE_PING_IDLE = float(os.getenv('DB_POOL_PRE_PING_IDLE', '30'))
+# /health の取得待ち時間パーセンタイル算出に使う直近サンプル数
+POOL_WAIT_SAMPLES = 1000
+
+# 組み立て済みSQLのキャッシュ上限（キーは呼び出し箇所ごとの形なので数百程度に収まる）
+STATEMENT_CACHE_SIZE = 1024
+
+# json_fields 未指定時にJSONとして扱うフィールド
+DEFAULT_JSON_FIELDS = ('type', 'pair2')
+
+
+def _where_sql(filter_keys: Tuple[str, ...]) -> str:
+    """等価条件のWHERE句（条件が無ければ空文字）"""
+    if not filter_keys:
+        return ''
+    return ' WHERE ' + ' AND '.join(f"{key} = %s" for key in filter_keys)
+
+
+def _parse_order_by(order_by: str) -> Tuple[Tuple[str, str], ...]:
+    """'timestamp DESC, id DESC' → (('timestamp', 'DESC'), ('id', 'DESC'))"""
+    order = []
+    for part in order_by.split(','):
+        tokens = part.split()
+        if not tokens:
+            continue
+        direction = tokens[1].upper() if len(tokens) > 1 else 'ASC'
+        if len(tokens) > 2 or direction not in ('ASC', 'DESC'):
+            raise ValueError(f'Invalid order_by: {order_by}')
+        order.append((tokens[0], direction))
+    return tuple(order)
+
+
+def _keyset_sql(order: Tuple[Tuple[str, str], ...]) -> str:
+    """
+    キーセット（カーソル）ページング用のWHERE句
+
+    order の並びでカーソル位置より後ろの行を返す条件。
+    例: order_by='timestamp DESC, id DESC', after=(ts, 10)
+        → (timestamp < ts) OR (timestamp = ts AND id < 10)
+    パラメータの並びは _keyset_params と対応する。
+    """
+    clauses = []
+    for i, (column, direction) in enumerate(order):
+        parts = [f"{prev_column} = %s" for prev_column, _ in order[:i]]
+        op = '<' if direction == 'DESC' else '>'
+        parts.append(f"{column} {op} %s")
+        clauses.append('(' + ' AND '.join(parts) + ')')
+    return '(' + ' OR '.join(clauses) + ')'
+
+
+def _keyset_params(after: Sequence[Any]) -> List[Any]:
+    """_keyset_sql のプレースホルダに対応するパラメータ"""
+    params: List[Any] = []
+    for i in range(len(after)):
+        params.extend(after[:i + 1])
+    return params
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _compile_select(
+    table: str,
+    columns: str,
+    filter_keys: Tuple[str, ...],
+    order_by: Optional[str],
+    keyset_size: int,
+    has_limit: bool,
+    has_offset: bool,
+    for_update: bool
+) -> str:
+    """SELECT文を組み立てる（同じ形の呼び出しはキャッシュから返す）"""
+    sql = f"SELECT {columns} FROM {table}"
+    where_clauses = [f"{key} = %s" for key in filter_keys]
+
+    order = _parse_order_by(order_by) if order_by else ()  # 不正な指定はここで弾く
+    if keyset_size:
+        if not order:
+            raise ValueError('after requires order_by')
+        if keyset_size != len(order):
+            raise ValueError('after must have one value per order_by column')
+        where_clauses.append(_keyset_sql(order))
+
+    if where_clauses:
+        sql += " WHERE " + " AND ".join(where_clauses)
+
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+
+    if has_limit:
+        sql += " LIMIT %s"
+    elif has_offset:
+        # MariaDBはLIMITなしのOFFSETを書けないため上限値を指定
+        sql += " LIMIT 18446744073709551615"
+    if has_offset:
+        sql += " OFFSET %s"
+
+    if for_update:
+        # トランザクション内で読んだ行をコミットまでロックする
+        sql += " FOR UPDATE"
+    return sql
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _compile_insert(table: str, data_keys: Tuple[str, ...]) -> str:
+    """INSERT文を組み立てる"""
+    placeholders = ', '.join(['%s'] * len(data_keys))
+    return f"INSERT INTO {table} ({', '.join(data_keys)}) VALUES ({placeholders})"
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _compile_update(table: str, data_keys: Tuple[str, ...], filter_keys: Tuple[str, ...]) -> str:
+    """UPDATE文を組み立てる"""
+    set_clause = ', '.join(f"{key} = %s" for key in data_keys)
+    return f"UPDATE {table} SET {set_clause}{_where_sql(filter_keys)}"
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _compile_delete(table: str, filter_keys: Tuple[str, ...]) -> str:
+    """DELETE文を組み立てる"""
+    return f"DELETE FROM {table}{_where_sql(filter_keys)}"
+
+
+@lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _decoder_plan(json_fields: Tuple[str, ...], column_names: Tuple[str, ...]) -> Tuple[str, ...]:
+    """結果セットのカラムのうち、JSONとしてデコードすべきものだけを返す"""
+    return tuple(field for field in json_fields if field in column_names)
+
+
+def _json_fields_key(json_fields: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """json_fields をキャッシュキーに使えるタプルへ正規化する"""
+    return DEFAULT_JSON_FIELDS if json_fields is None else tuple(json_fields)
+
+
+def _encode_values(values: Iterable[Any]) -> List[Any]:
+    """リスト/辞書をJSON文字列に変換したパラメータ列を返す"""
+    return [
+        json_codec.dumps(value) if isinstance(value, (list, dict)) else value
+        for value in values
+    ]
+
+
+def _decode_rows(
+    cursor,
+    rows: Sequence[Dict[str, Any]],
+    json_fields: Optional[Iterable[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    JSON文字列のカラムをPythonオブジェクトに変換する
+
+    デコード対象のカラムは cursor.description から結果セットごとに1回だけ決め、
+    行ごとにはそのカラムだけを見る。
+    """
+    rows = list(rows)
+    if not rows:
+        return rows
+    plan = _decoder_plan(_json_fields_key(json_fields), tuple(d[0] for d in cursor.description))
+    if not plan:
+        return rows
+    for row in rows:
+        for field in plan:
+            value = row[field]
+            if value and isinstance(value, str):
+                try:
+                    row[field] = json_codec.loads(value)
+                except json_codec.JSONDecodeError:
+                    pass  # JSON以外の文字列はそのまま
+    return rows
+
+
+class TimedCursor:
+    """aiomysql のカーソルをラップし、実行時間・行数を query_stats に記録する"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    async def execute(self, query: str, args: Any = None) -> int:
+        start = time.perf_counter()
+        try:
+            return await self._cursor.execute(query, args)
+        finally:
+            rows = self._cursor.rowcount
+            # 非バッファカーソルの行数は読み終わるまで不明（stream_select が後で記録する）
+            record_query(query, (time.perf_counter() - start) * 1000, -1 if rows == _UNBUFFERED_ROWCOUNT else rows)
+
+    async def executemany(self, query: str, args: Any) -> int:
+        start = time.perf_counter()
+        try:
+            return await self._cursor.executemany(query, args)
+        finally:
+            record_query(query, (time.perf_counter() - start) * 1000, self._cursor.rowcount)
+
+
+class TimedConnection:
+    """aiomysql の接続をラップし、cursor() で TimedCursor を返す"""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @asynccontextmanager
+    async def cursor(self, *cursor_classes) -> AsyncIterator[TimedCursor]:
+        async with self._conn.cursor(*cursor_classes) as cursor:
+            yield TimedCursor(cursor)
+
 
 class Database:
     """MariaDBデータベース接続クラス（シングルトン）"""
 
     _instance: Optional['Database'] = None
     _pool: Optional[aiomysql.Pool] = None
+    # 接続取得を待っているコルーチン数と、直近の取得待ち時間（ミリ秒）
+    _waiters: int = 0
+    _acquire_count: int = 0
+    _acquire_waits: deque = deque(maxlen=POOL_WAIT_SAMPLES)
 
     def __new__(cls):
         if cls._instance is None:
@@ -47,8 +285,10 @@ class Database:
                 db=db_name,
                 charset='utf8mb4',
                 autocommit=True,
-                minsize=1,
-                maxsize=10
+                minsize=POOL_MINSIZE,
+                maxsize=POOL_MAXSIZE,
+                pool_recycle=POOL_RECYCLE,
+                connect_timeout=DB_CONNECT_TIMEOUT
             )
 
     async def close(self):
@@ -65,28 +305,54 @@ class Database:
             raise RuntimeError('Database pool not initialized. Call initialize() first.')
         return self._pool
 
-    def _serialize_json_fields(self, data: Dict[str, Any]) -> Dict[str, Any]:
-        """リストをJSON文字列に変換"""
-        result = data.copy()
-        for key, value in result.items():
-            if isinstance(value, (list, dict)):
-                result[key] = json.dumps(value, ensure_ascii=False)
-        return result
-
-    def _deserialize_json_fields(self, row: Dict[str, Any], json_fields: List[str] = None) -> Dict[str, Any]:
-        """JSON文字列をPythonオブジェクトに変換"""
-        if json_fields is None:
-            json_fields = ['type', 'pair2']  # デフォルトのJSONフィールド
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[TimedConnection]:
+        """
+        プールから接続を取得する
 
-        result = dict(row)
-        for field in json_fields:
-            if field in result and result[field]:
-                if isinstance(result[field], str):
-                    try:
-                        result[field] = json.loads(result[field])
-                    except json.JSONDecodeError:
-                        pass  # JSON以外の文字列はそのまま
-        return result
+        pool.acquire() の代わりに使う。取得までの待ち時間と、
+        この接続で実行したクエリの時間がリクエスト単位で計測される。
+        しばらく使われていなかった接続は ping で生存確認し、切れていれば再接続する。
+        """
+        start = time.perf_counter()
+        waiting = True
+        self._waiters += 1
+        try:
+            async with self.pool.acquire() as conn:
+                self._waiters -= 1
+                waiting = False
+                wait_ms = (time.perf_counter() - start) * 1000
+                self._acquire_count += 1
+                self._acquire_waits.append(wait_ms)
+                record_acquire(wait_ms)
+                if POOL_PRE_PING_IDLE >= 0:
+                    idle = asyncio.get_running_loop().time() - conn.last_usage
+                    if idle >= POOL_PRE_PING_IDLE:
+                        await conn.ping(reconnect=True)
+                yield TimedConnection(conn)
+        finally:
+            if waiting:
+                # 取得前にキャンセル・失敗した場合
+                self._waiters -= 1
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """プールの状態（/health 用）。未初期化なら initialized=False のみ返す"""
+        if self._pool is None:
+            return {'initialized': False}
+        waits = sorted(self._acquire_waits)
+        p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+        return {
+            'initialized': True,
+            'size': self._pool.size,
+            'in_use': self._pool.size - self._pool.freesize,
+            'free': self._pool.freesize,
+            'minsize': self._pool.minsize,
+            'maxsize': self._pool.maxsize,
+            'waiters': self._waiters,
+            'acquires': self._acquire_count,
+            'acquire_p95_ms': round(p95, 2),
+            'acquire_max_ms': round(waits[-1], 2) if waits else 0.0,
+        }
 
     async def execute_query(
         self,
@@ -95,7 +361,11 @@ class Database:
         filters: Optional[Dict[str, Any]] = None,
         data: Optional[Dict[str, Any]] = None,
         columns: str = '*',
-        json_fields: List[str] = None
+        json_fields: List[str] = None,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None
     ) -> Dict[str, Any]:
         """
         クエリを実行する汎用メソッド
@@ -107,98 +377,456 @@ class Database:
             data: 挿入/更新データ
             columns: 取得カラム
             json_fields: JSONとして扱うフィールドのリスト
+            order_by: 並び順（select用。例: 'timestamp DESC, id DESC'）
+            limit: 最大取得件数（select用）
+            offset: 読み飛ばす件数（select用）
+            after: キーセットページングのカーソル（select用）。
+                order_by の各カラムに対応する値で、この位置より後ろの行を返す
 
         Returns:
             クエリ結果（Supabase互換形式）
         """
         try:
-            async with self.pool.acquire() as conn:
+            async with self.acquire() as conn:
                 async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    return await self._run_query(
+                        cursor, table, operation, filters, data, columns, json_fields,
+                        order_by, limit, offset, after
+                    )
 
-                    if operation == 'select':
-                        # SELECT クエリ
-                        sql = f"SELECT {columns} FROM {table}"
-                        params = []
+        except Exception as e:
+            print(f'❌ Database error: {e}')
+            # Supabase互換形式でエラーを返す
+            return {'data': None, 'error': str(e)}
 
-                        if filters:
-                            where_clauses = []
-                            for key, value in filters.items():
-                                where_clauses.append(f"{key} = %s")
-                                params.append(value)
-                            sql += " WHERE " + " AND ".join(where_clauses)
+    async def _run_query(
+        self,
+        cursor,
+        table: str,
+        operation: str,
+        filters: Optional[Dict[str, Any]],
+        data: Optional[Dict[str, Any]],
+        columns: str,
+        json_fields: Optional[List[str]],
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None,
+        after: Optional[Sequence[Any]] = None,
+        for_update: bool = False
+    ) -> Dict[str, Any]:
+        """
+        execute_query の本体。与えられたカーソル上で実行し、エラーは送出する
 
-                        await cursor.execute(sql, params)
-                        rows = await cursor.fetchall()
+        SQLは (テーブル, 操作, フィルタキー, カラム, 並び順...) ごとに組み立て済みの
+        ものをキャッシュから使い、ここではパラメータを並べるだけにする。
+        """
+        filters = filters or {}
+
+        if operation == 'select':
+            # SELECT クエリ
+            sql = _compile_select(
+                table, columns, tuple(filters), order_by,
+                len(after) if after is not None else 0,
+                limit is not None, bool(offset), for_update
+            )
+            params = list(filters.values())
+            if after is not None:
+                params.extend(_keyset_params(after))
+            if limit is not None:
+                params.append(int(limit))
+            if offset:
+                params.append(int(offset))
+
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+
+            # JSON フィールドをデシリアライズ
+            # Supabase互換形式で返す
+            return {'data': _decode_rows(cursor, rows, json_fields), 'error': None}
+
+        elif operation == 'insert':
+            # INSERT クエリ
+            sql = _compile_insert(table, tuple(data))
+            await cursor.execute(sql, _encode_values(data.values()))
+
+            # 挿入されたIDを取得
+            inserted_id = cursor.lastrowid
+
+            # Supabase互換形式で返す
+            return {'data': [{'id': inserted_id, **data}], 'error': None}
+
+        elif operation == 'update':
+            # UPDATE クエリ
+            sql = _compile_update(table, tuple(data), tuple(filters))
+            params = _encode_values(data.values())
+            params.extend(filters.values())
+            await cursor.execute(sql, params)
+
+            # Supabase互換形式で返す
+            return {'data': [data], 'error': None}
+
+        elif operation == 'delete':
+            # DELETE クエリ
+            sql = _compile_delete(table, tuple(filters))
+            await cursor.execute(sql, list(filters.values()))
+
+            # Supabase互換形式で返す
+            return {'data': [], 'error': None}
+
+        else:
+            raise ValueError(f'Unknown operation: {operation}')
+
+    async def fetchall(
+        self,
+        sql: str,
+        params: Optional[Sequence[Any]] = None,
+        json_fields: Iterable[str] = ()
+    ) -> List[Dict[str, Any]]:
+        """
+        生SQLのSELECTを実行して全行を返す（JOIN・集計など execute_query で書けない読み込み用）
 
-                        # JSON フィールドをデシリアライズ
-                        deserialized_rows = [
-                            self._deserialize_json_fields(row, json_fields)
-                            for row in rows
-                        ]
+        json_fields に指定したカラムだけJSONとしてデコードする。
+        DBエラーはそのまま送出する（呼び出し側のHTTPException変換に任せる）。
+        """
+        async with self.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                await cursor.execute(sql, params)
+                return _decode_rows(cursor, await cursor.fetchall(), json_fields)
 
-                        # Supabase互換形式で返す
-                        return {'data': deserialized_rows, 'error': None}
+    async def select_in(
+        self,
+        table: str,
+        key: str,
+        values: Iterable[Any],
+        columns: str = '*',
+        filters: Optional[Dict[str, Any]] = None,
+        json_fields: List[str] = None,
+        many: bool = False,
+        chunk_size: int = IN_CHUNK_SIZE
+    ) -> Dict[Any, Any]:
+        """
+        キーの集合で一括取得する（SELECT ... WHERE key IN (...)）
 
-                    elif operation == 'insert':
-                        # INSERT クエリ
-                        serialized_data = self._serialize_json_fields(data)
-                        columns_str = ', '.join(serialized_data.keys())
-                        placeholders = ', '.join(['%s'] * len(serialized_data))
-                        sql = f"INSERT INTO {table} ({columns_str}) VALUES ({placeholders})"
+        1件ずつ execute_query を呼ぶN+1を避けるためのメソッド。
+        values は重複・Noneを除外し、chunk_size ごとに分割して
+        1接続上で順に実行する。
 
-                        await cursor.execute(sql, list(serialized_data.values()))
+        Args:
+            table: テーブル名
+            key: 検索キーのカラム名
+            values: 検索するキーの値
+            columns: 取得カラム（key が含まれていなければ自動で追加）
+            filters: 追加の等価条件
+            json_fields: JSONとして扱うフィールドのリスト
+            many: True なら {キー: [行, ...]}、False なら {キー: 行}（先勝ち）
+            chunk_size: IN句1回あたりの最大要素数
 
-                        # 挿入されたIDを取得
-                        inserted_id = cursor.lastrowid
+        Returns:
+            キーの値 → 行（many=True なら行のリスト）の辞書
 
-                        # Supabase互換形式で返す
-                        return {'data': [{'id': inserted_id, **data}], 'error': None}
+        Raises:
+            DBエラーはそのまま送出する（呼び出し側のHTTPException変換に任せる）
+        """
+        keys = list(dict.fromkeys(v for v in values if v is not None))
+        result: Dict[Any, Any] = {}
+        if not keys:
+            return result
+
+        if columns != '*' and key not in [c.strip() for c in columns.split(',')]:
+            columns = f"{key}, {columns}"
+
+        base_sql = f"SELECT {columns} FROM {table} WHERE "
+        base_params: List[Any] = []
+        for f_key, f_value in (filters or {}).items():
+            base_sql += f"{f_key} = %s AND "
+            base_params.append(f_value)
+
+        async with self.acquire() as conn:
+            async with conn.cursor(aiomysql.DictCursor) as cursor:
+                for i in range(0, len(keys), chunk_size):
+                    chunk = keys[i:i + chunk_size]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    sql = f"{base_sql}{key} IN ({placeholders})"
+                    await cursor.execute(sql, base_params + chunk)
+                    rows = _decode_rows(cursor, await cursor.fetchall(), json_fields)
+                    for row in rows:
+                        if many:
+                            result.setdefault(row[key], []).append(row)
+                        elif row[key] not in result:
+                            result[row[key]] = row
 
-                    elif operation == 'update':
-                        # UPDATE クエリ
-                        serialized_data = self._serialize_json_fields(data)
-                        set_clauses = [f"{key} = %s" for key in serialized_data.keys()]
-                        params = list(serialized_data.values())
+        return result
 
-                        sql = f"UPDATE {table} SET {', '.join(set_clauses)}"
+    @asynccontextmanager
+    async def stream_select(
+        self,
+        table: str,
+        filters: Optional[Dict[str, Any]] = None,
+        columns: str = '*',
+        json_fields: List[str] = None,
+        order_by: Optional[str] = None,
+        batch_size: int = STREAM_BATCH_SIZE
+    ) -> AsyncIterator[AsyncIterator[Dict[str, Any]]]:
+        """
+        全件走査用のストリーミングSELECT（非バッファカーソル）
 
-                        if filters:
-                            where_clauses = []
-                            for key, value in filters.items():
-                                where_clauses.append(f"{key} = %s")
-                                params.append(value)
-                            sql += " WHERE " + " AND ".join(where_clauses)
+        execute_query の select は結果を全てメモリに読み込むため、player_mst の
+        全件取得のような走査では件数に比例してメモリを使い、最初の1行を返すまで
+        全件の受信を待つ。こちらはサーバ側から batch_size 行ずつ読み出して返す。
 
-                        await cursor.execute(sql, params)
+        使用例:
+            async with db.stream_select('player_mst', columns='player_id, player_name') as rows:
+                async for row in rows:
+                    ...
 
-                        # Supabase互換形式で返す
-                        return {'data': [data], 'error': None}
+        ブロックを抜けるまで接続を1本占有する（途中で抜けた場合は残りを読み捨てる）。
+        DBエラーはそのまま送出する（呼び出し側のHTTPException変換に任せる）。
+        """
+        filters = filters or {}
+        sql = _compile_select(table, columns, tuple(filters), order_by, 0, False, False, False)
 
-                    elif operation == 'delete':
-                        # DELETE クエリ
-                        sql = f"DELETE FROM {table}"
-                        params = []
+        async with self.acquire() as conn:
+            async with conn.cursor(aiomysql.SSDictCursor) as cursor:
+                await cursor.execute(sql, list(filters.values()))
 
-                        if filters:
-                            where_clauses = []
-                            for key, value in filters.items():
-                                where_clauses.append(f"{key} = %s")
-                                params.append(value)
-                            sql += " WHERE " + " AND ".join(where_clauses)
+                async def rows() -> AsyncIterator[Dict[str, Any]]:
+                    count = 0
+                    try:
+                        while True:
+                            batch = await cursor.fetchmany(batch_size)
+                            if not batch:
+                                break
+                            count += len(batch)
+                            for row in _decode_rows(cursor, batch, json_fields):
+                                yield row
+                    finally:
+                        record_rows(count)
+
+                yield rows()
+
+    async def bulk_insert(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        update_columns: Optional[List[str]] = None,
+        batch_size: int = BULK_BATCH_SIZE
+    ) -> Dict[str, Any]:
+        """
+        複数行を一括INSERTする（multi-row VALUES）
 
-                        await cursor.execute(sql, params)
+        batch_size 行ごとに1文にまとめて実行する。全行は同じキー構成であること。
+        update_columns を指定すると ON DUPLICATE KEY UPDATE で upsert する。
 
-                        # Supabase互換形式で返す
-                        return {'data': [], 'error': None}
+        Args:
+            table: テーブル名
+            rows: 挿入データのリスト
+            update_columns: 重複時に上書きするカラム（None なら通常のINSERT）
+            batch_size: 1文あたりの最大行数
 
-                    else:
-                        raise ValueError(f'Unknown operation: {operation}')
+        Returns:
+            クエリ結果（Supabase互換形式。count は影響行数の合計）
+        """
+        if not rows:
+            return {'data': [], 'count': 0, 'error': None}
+
+        try:
+            async with self.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    count = await self._run_bulk_insert(cursor, table, rows, update_columns, batch_size)
+            return {'data': rows, 'count': count, 'error': None}
 
         except Exception as e:
             print(f'❌ Database error: {e}')
-            # Supabase互換形式でエラーを返す
-            return {'data': None, 'error': str(e)}
+            return {'data': None, 'count': 0, 'error': str(e)}
+
+    async def _run_bulk_insert(
+        self,
+        cursor,
+        table: str,
+        rows: List[Dict[str, Any]],
+        update_columns: Optional[List[str]],
+        batch_size: int
+    ) -> int:
+        """bulk_insert の本体。与えられたカーソル上で実行し、影響行数を返す"""
+        columns = list(rows[0].keys())
+        for row in rows:
+            if list(row.keys()) != columns:
+                raise ValueError('bulk_insert rows must share the same columns')
+
+        columns_str = ', '.join(columns)
+        row_placeholder = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        suffix = ''
+        if update_columns:
+            suffix = ' ON DUPLICATE KEY UPDATE ' + ', '.join(
+                f"{col} = VALUES({col})" for col in update_columns
+            )
+
+        count = 0
+        for i in range(0, len(rows), batch_size):
+            batch = rows[i:i + batch_size]
+            sql = (
+                f"INSERT INTO {table} ({columns_str}) VALUES "
+                + ', '.join([row_placeholder] * len(batch))
+                + suffix
+            )
+            params: List[Any] = []
+            for row in batch:
+                params.extend(_encode_values(row.values()))
+            await cursor.execute(sql, params)
+            count += cursor.rowcount
+        return count
+
+    async def bulk_update(
+        self,
+        table: str,
+        key: str,
+        rows: List[Dict[str, Any]],
+        batch_size: int = BULK_BATCH_SIZE
+    ) -> Dict[str, Any]:
+        """
+        キーごとに異なる値を一括UPDATEする
+
+        各行は key と更新したいカラムを持つ辞書。行ごとにカラム構成が
+        違ってもよく、その行に無いカラムは現在値のまま残す。
+        batch_size 行ごとに CASE 式を使った1文の UPDATE にまとめる。
+
+        例: [{'player_id': 1, 'jsta_number': 'A'}, {'player_id': 2, 'sex': 0}]
+            → UPDATE player_mst SET
+                  jsta_number = CASE player_id WHEN 1 THEN 'A' ELSE jsta_number END,
+                  sex = CASE player_id WHEN 2 THEN 0 ELSE sex END
+              WHERE player_id IN (1, 2)
+
+        Returns:
+            クエリ結果（Supabase互換形式。count は影響行数の合計）
+        """
+        if not rows:
+            return {'data': [], 'count': 0, 'error': None}
+
+        try:
+            count = 0
+            async with self.acquire() as conn:
+                async with conn.cursor() as cursor:
+                    for i in range(0, len(rows), batch_size):
+                        batch = [dict(zip(row, _encode_values(row.values()))) for row in rows[i:i + batch_size]]
+
+                        columns: List[str] = []
+                        for row in batch:
+                            for col in row:
+                                if col != key and col not in columns:
+                                    columns.append(col)
+                        if not columns:
+                            continue
+
+                        set_clauses = []
+                        params: List[Any] = []
+                        for col in columns:
+                            cases = []
+                            for row in batch:
+                                if col in row:
+                                    cases.append('WHEN %s THEN %s')
+                                    params.extend([row[key], row[col]])
+                            set_clauses.append(
+                                f"{col} = CASE {key} {' '.join(cases)} ELSE {col} END"
+                            )
+
+                        keys = [row[key] for row in batch]
+                        sql = (
+                            f"UPDATE {table} SET {', '.join(set_clauses)} "
+                            f"WHERE {key} IN ({', '.join(['%s'] * len(keys))})"
+                        )
+                        await cursor.execute(sql, params + keys)
+                        count += cursor.rowcount
+
+            return {'data': rows, 'count': count, 'error': None}
 
+        except Exception as e:
+            print(f'❌ Database error: {e}')
+            return {'data': None, 'count': 0, 'error': str(e)}
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator['Transaction']:
+        """
+        1接続・1コミットで複数の文を実行するトランザクション
+
+        プールは autocommit=True のため、文ごとにコミットされると途中失敗で
+        不整合な状態が残る。ブロック内の文は同じ接続で実行し、正常終了時に
+        まとめてコミット、例外時はロールバックして例外を再送出する。
+
+        使用例:
+            async with db.transaction() as tx:
+                await tx.execute("UPDATE ...", (a, b))
+                await tx.execute_query('player_mst', operation='delete', filters={...})
+        """
+        async with self.acquire() as conn:
+            await conn.begin()
+            try:
+                async with conn.cursor(aiomysql.DictCursor) as cursor:
+                    yield Transaction(self, cursor)
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+
+
+class Transaction:
+    """db.transaction() が返すトランザクション（1接続上で実行する）
+
+    Database と違いエラーを {'error': ...} で返さず送出する（ロールバックさせるため）。
+    """
+
+    def __init__(self, database: Database, cursor):
+        self._db = database
+        self.cursor = cursor
+
+    async def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> int:
+        """生SQLを実行して影響行数を返す"""
+        await self.cursor.execute(sql, params)
+        return self.cursor.rowcount
 
-# グローバルインスタンス
-db = Database()
+    async def fetchall(self, sql: str, params: Optional[Sequence[Any]] = None) -> List[Dict[str, Any]]:
+        """生SQLのSELECTを実行して全行を返す"""
+        await self.cursor.execute(sql, params)
+        return list(await self.cursor.fetchall())
+
+    async def fetchone(self, sql: str, params: Optional[Sequence[Any]] = None) -> Optional[Dict[str, Any]]:
+        """生SQLのSELECTを実行して先頭行を返す"""
+        await self.cursor.execute(sql, params)
+        return await self.cursor.fetchone()
+
+    async def execute_query(
+        self,
+        table: str,
+        operation: str = 'select',
+        filters: Optional[Dict[str, Any]] = None,
+        data: Optional[Dict[str, Any]] = None,
+        columns: str = '*',
+        json_fields: List[str] = None,
+        order_by: Optional[str] = None,
+        limit: Optional[int] = None,
+        for_update: bool = False
+    ) -> Dict[str, Any]:
+        """Database.execute_query と同じ形式で実行する。for_update=True で SELECT ... FOR UPDATE"""
+        return await self._db._run_query(
+            self.cursor, table, operation, filters, data, columns, json_fields,
+            order_by=order_by, limit=limit, for_update=for_update
+        )
+
+    async def bulk_insert(
+        self,
+        table: str,
+        rows: List[Dict[str, Any]],
+        update_columns: Optional[List[str]] = None,
+        batch_size: int = BULK_BATCH_SIZE
+    ) -> int:
+        """Database.bulk_insert と同じ。影響行数を返す"""
+        if not rows:
+            return 0
+        return await self._db._run_bulk_insert(self.cursor, table, rows, update_columns, batch_size)
+
+
+# グローバルインスタンス（DB_BACKEND=sqlite ならMariaDB無しで動くSQLite版）
+if os.getenv('DB_BACKEND', 'mariadb').lower() == 'sqlite':
+    from api.database_sqlite import SqliteDatabase
+    db: Database = SqliteDatabase()
+else:
+    db = Database()
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+データベース接続管理（SQLite版・開発/計測用）
+
+MariaDB無しでバックエンド全体を動かすための Database 実装。
+環境変数 DB_BACKEND=sqlite で api.database.db がこのクラスになる。
+
+aiosqlite の接続を aiomysql と同じ形（pool.acquire() / conn.cursor(DictCursor) /
+cursor.execute('... %s ...')）で包み、Database の execute_query・select_in・
+bulk_*・transaction や、ルーターの生SQLをそのまま実行できるようにする。
+MySQL固有の構文（%s、ON DUPLICATE KEY UPDATE、GREATEST、FOR UPDATE など）は
+実行前にSQLite向けに書き換える。
+
+スキーマは起動時にリポジトリの *.sql（database_setup_mariadb.sql と
+backend 直下の alter_*.sql / create_*.sql）を変換して作成する。
+
+環境変数:
+    DB_SQLITE_PATH: DBファイルのパス（既定 tournament_local.sqlite3）
+    DB_POOL_MAXSIZE: 接続数（既定 10。書き込みはSQLite側で直列化される）
+"""
+
+import os
+import re
+import asyncio
+import sqlite3
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Dict, List, Any, Sequence, Tuple, AsyncIterator, Deque
+
+import aiomysql
+import aiosqlite
+
+from api.database import Database, POOL_MAXSIZE, _UNBUFFERED_ROWCOUNT
+
+SQLITE_PATH = os.getenv('DB_SQLITE_PATH', 'tournament_local.sqlite3')
+
+_BACKEND_DIR = Path(__file__).resolve().parent.parent
+_REPO_ROOT = _BACKEND_DIR.parent.parent.parent
+
+
+def schema_files() -> List[Path]:
+    """スキーマ作成に使う *.sql（実行順）"""
+    files = []
+    setup = _REPO_ROOT / 'database_setup_mariadb.sql'
+    if setup.exists():
+        files.append(setup)
+    files.extend(sorted(_BACKEND_DIR.glob('alter_*.sql')))
+    files.extend(sorted(_BACKEND_DIR.glob('create_*.sql')))
+    return files
+
+
+# ---------------------------------------------------------------------------
+# 型変換（aiomysql と同じ Python 型で返す）
+# ---------------------------------------------------------------------------
+
+def _convert_date(value: bytes):
+    text = value.decode()
+    try:
+        return date.fromisoformat(text[:10])
+    except ValueError:
+        return text
+
+
+def _convert_datetime(value: bytes):
+    text = value.decode()
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        return text
+
+
+def _convert_time(value: bytes):
+    """TIME は aiomysql と同じく timedelta で返す"""
+    text = value.decode()
+    try:
+        parts = [int(p) for p in text.split(':')]
+        while len(parts) < 3:
+            parts.append(0)
+        return timedelta(hours=parts[0], minutes=parts[1], seconds=parts[2])
+    except ValueError:
+        return text
+
+
+sqlite3.register_converter('DATE', _convert_date)
+sqlite3.register_converter('DATETIME', _convert_datetime)
+sqlite3.register_converter('TIMESTAMP', _convert_datetime)
+sqlite3.register_converter('TIME', _convert_time)
+
+
+def _adapt_param(value: Any) -> Any:
+    """パラメータを SQLite に渡せる値にする（MySQL に渡したときと同じ文字列表現）"""
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        total = int(value.total_seconds())
+        return f"{total // 3600:02d}:{(total % 3600) // 60:02d}:{total % 60:02d}"
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _adapt_params(args: Any) -> Any:
+    if args is None:
+        return ()
+    if isinstance(args, dict):
+        return {k: _adapt_param(v) for k, v in args.items()}
+    if not isinstance(args, (list, tuple)):
+        args = (args,)
+    return [_adapt_param(v) for v in args]
+
+
+# ---------------------------------------------------------------------------
+# SQL変換（MySQL → SQLite）
+# ---------------------------------------------------------------------------
+
+_LOCAL_NOW = "datetime('now', 'localtime')"
+
+_DML_REWRITES = [
+    (re.compile(r'\bINSERT\s+IGNORE\b', re.I), 'INSERT OR IGNORE'),
+    (re.compile(r'\bGREATEST\s*\(', re.I), 'MAX('),
+    (re.compile(r'\bLEAST\s*\(', re.I), 'MIN('),
+    (re.compile(r'\bIF\s*\(', re.I), 'IIF('),
+    (re.compile(r'\bNOW\s*\(\s*\)', re.I), _LOCAL_NOW),
+    (re.compile(r'\bCURDATE\s*\(\s*\)', re.I), "date('now', 'localtime')"),
+    (re.compile(r'\bLIMIT\s+18446744073709551615\b', re.I), 'LIMIT -1'),
+    (re.compile(r'\s+FOR\s+UPDATE\s*$', re.I), ''),
+]
+
+_ON_DUPLICATE = re.compile(r'\bON\s+DUPLICATE\s+KEY\s+UPDATE\b', re.I)
+_VALUES_REF = re.compile(r'\bVALUES\s*\(\s*`?([A-Za-z_]\w*)`?\s*\)', re.I)
+
+_CREATE_TABLE = re.compile(
+    r'^\s*CREATE\s+TABLE\s+(IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*)\)([^()]*)$', re.I | re.S
+)
+_ALTER_ADD = re.compile(r'^\s*ALTER\s+TABLE\s+`?(\w+)`?\s+(ADD\s+COLUMN\b.*)$', re.I | re.S)
+_ALTER_MODIFY = re.compile(r'^\s*ALTER\s+TABLE\s+`?\w+`?\s+MODIFY\b', re.I)
+_INDEX_ITEM = re.compile(r'^(?:INDEX|KEY)\s+`?(\w+)`?\s*(\(.*\))$', re.I | re.S)
+_UNIQUE_ITEM = re.compile(r'^UNIQUE\s+(?:KEY|INDEX)\s+`?\w+`?\s*(\(.*\))$', re.I | re.S)
+_COLUMN_REWRITES = [
+    (re.compile(r'\bINT(?:EGER)?(?:\(\d+\))?(?:\s+UNSIGNED)?\s+(?:NOT\s+NULL\s+)?AUTO_INCREMENT\s+PRIMARY\s+KEY\b', re.I),
+     'INTEGER PRIMARY KEY AUTOINCREMENT'),
+    (re.compile(r'\s+AUTO_INCREMENT\b', re.I), ''),
+    (re.compile(r'\s+ON\s+UPDATE\s+CURRENT_TIMESTAMP\b', re.I), ''),
+    (re.compile(r"\s+COMMENT\s+'(?:[^']|'')*'", re.I), ''),
+    (re.compile(r'\s+UNSIGNED\b', re.I), ''),
+    (re.compile(r'\s+(?:CHARACTER\s+SET|CHARSET|COLLATE)\s+\w+', re.I), ''),
+    (re.compile(r'\bENUM\s*\([^)]*\)', re.I), 'TEXT'),
+    (re.compile(r'\bDEFAULT\s+CURRENT_TIMESTAMP\b', re.I), f'DEFAULT ({_LOCAL_NOW})'),
+]
+_ON_UPDATE_COLUMN = re.compile(r'^`?(\w+)`?\s.*\bON\s+UPDATE\s+CURRENT_TIMESTAMP\b', re.I | re.S)
+
+
+def _split_top_level(text: str, sep: str = ',') -> List[str]:
+    """括弧・引用符の外にある区切り文字で分割する"""
+    parts, depth, quote, current = [], 0, None, []
+    for ch in text:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"', '`'):
+            quote = ch
+        elif ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    if ''.join(current).strip():
+        parts.append(''.join(current).strip())
+    return parts
+
+
+def _strip_comments(sql: str) -> str:
+    """'--' 行コメントを除く（文字列中は考慮しない。スキーマファイル用）"""
+    return '\n'.join(line.split('--', 1)[0] for line in sql.splitlines())
+
+
+def _translate_column(item: str) -> str:
+    for pattern, repl in _COLUMN_REWRITES:
+        item = pattern.sub(repl, item)
+    return item
+
+
+def _translate_create_table(match: re.Match) -> List[str]:
+    if_not_exists, table, body = match.group(1) or '', match.group(2), match.group(3)
+    items, extra = [], []
+    for item in _split_top_level(_strip_comments(body)):
+        index = _INDEX_ITEM.match(item)
+        unique = _UNIQUE_ITEM.match(item)
+        if index:
+            # SQLite のインデックス名はDB全体で一意なのでテーブル名を付ける
+            extra.append(f"CREATE INDEX IF NOT EXISTS {table}_{index.group(1)} ON {table} {index.group(2)}")
+        elif unique:
+            items.append(f"UNIQUE {unique.group(1)}")
+        else:
+            on_update = _ON_UPDATE_COLUMN.match(item)
+            if on_update:
+                # ON UPDATE CURRENT_TIMESTAMP はトリガーで再現する
+                column = on_update.group(1)
+                extra.append(
+                    f"CREATE TRIGGER IF NOT EXISTS {table}_{column}_on_update AFTER UPDATE ON {table} "
+                    f"FOR EACH ROW WHEN NEW.{column} IS OLD.{column} BEGIN "
+                    f"UPDATE {table} SET {column} = {_LOCAL_NOW} WHERE rowid = NEW.rowid; END"
+                )
+            items.append(_translate_column(item))
+    create = f"CREATE TABLE {if_not_exists}{table} (\n    " + ',\n    '.join(items) + "\n)"
+    return [create] + extra
+
+
+@lru_cache(maxsize=1024)
+def translate_sql(sql: str, has_params: bool = True) -> Tuple[str, ...]:
+    """
+    MySQL向けのSQLを SQLite で実行できる文に変換する
+
+    CREATE TABLE はインデックス・トリガーの文が増えるため、文のタプルを返す。
+    has_params が真なら pymysql 形式のプレースホルダ（%s / %(name)s / %%）も変換する。
+    """
+    create = _CREATE_TABLE.match(sql)
+    if create:
+        return tuple(_translate_create_table(create))
+
+    alter = _ALTER_ADD.match(_strip_comments(sql))
+    if alter:
+        # SQLite は1文1カラム、IF NOT EXISTS 無し
+        table = alter.group(1)
+        statements = []
+        for clause in _split_top_level(alter.group(2)):
+            clause = re.sub(r'^ADD\s+COLUMN\s+(IF\s+NOT\s+EXISTS\s+)?', '', clause, flags=re.I)
+            statements.append(f"ALTER TABLE {table} ADD COLUMN {_translate_column(clause)}")
+        return tuple(statements)
+
+    if _ALTER_MODIFY.match(_strip_comments(sql)):
+        # SQLite の列は型を強制しないので、型の変更は不要
+        return ()
+
+    for pattern, repl in _DML_REWRITES:
+        sql = pattern.sub(repl, sql)
+    upsert = _ON_DUPLICATE.search(sql)
+    if upsert:
+        # ON DUPLICATE KEY UPDATE col = VALUES(col) → ON CONFLICT DO UPDATE SET col = excluded.col
+        sql = sql[:upsert.start()] + 'ON CONFLICT DO UPDATE SET' + _VALUES_REF.sub(r'excluded.\1', sql[upsert.end():])
+    if has_params:
+        sql = re.sub(r'%\((\w+)\)s|%s|%%', lambda m: f":{m.group(1)}" if m.group(1) else ('?' if m.group(0) == '%s' else '%'), sql)
+    return (sql,)
+
+
+# ---------------------------------------------------------------------------
+# aiomysql 互換のプール・接続・カーソル
+# ---------------------------------------------------------------------------
+
+class SqliteCursor:
+    """aiomysql のカーソルと同じ使い方ができる SQLite カーソル
+
+    SSDictCursor を指定しても結果は execute 時にまとめて読む（非バッファ読み出しは再現しない）。
+    ただし rowcount は aiomysql の SSCursor と同じく不明の値（_UNBUFFERED_ROWCOUNT）にし、
+    行数は読み出した側（stream_select）だけが記録する。
+    """
+
+    def __init__(self, connection: 'SqliteConnection', as_dict: bool, unbuffered: bool = False):
+        self._connection = connection
+        self._as_dict = as_dict
+        self._unbuffered = unbuffered
+        self._rows: Deque[Any] = deque()
+        self.description = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    async def execute(self, query: str, args: Any = None) -> int:
+        statements = translate_sql(query, args is not None)
+        params = _adapt_params(args)
+        conn = self._connection.raw
+        self._connection.touch()
+        for i, sql in enumerate(statements):
+            cursor = await conn.execute(sql, params if i == len(statements) - 1 else ())
+            self._collect(cursor, await cursor.fetchall() if cursor.description else None)
+            await cursor.close()
+        return self.rowcount
+
+    async def executemany(self, query: str, args: Sequence[Any]) -> int:
+        (sql,) = translate_sql(query, True)
+        self._connection.touch()
+        cursor = await self._connection.raw.executemany(sql, [_adapt_params(a) for a in args])
+        self._collect(cursor, None)
+        await cursor.close()
+        return self.rowcount
+
+    def _collect(self, cursor, rows: Optional[List[Any]]) -> None:
+        self.description = cursor.description
+        self.lastrowid = cursor.lastrowid
+        if rows is None:
+            self._rows = deque()
+            self.rowcount = cursor.rowcount
+            return
+        if self._as_dict:
+            names = [d[0] for d in cursor.description]
+            rows = [dict(zip(names, row)) for row in rows]
+        else:
+            rows = [tuple(row) for row in rows]
+        self._rows = deque(rows)
+        self.rowcount = _UNBUFFERED_ROWCOUNT if self._unbuffered else len(rows)
+
+    async def fetchone(self):
+        return self._rows.popleft() if self._rows else None
+
+    async def fetchmany(self, size: int = 1):
+        return [self._rows.popleft() for _ in range(min(size, len(self._rows)))]
+
+    async def fetchall(self):
+        rows, self._rows = list(self._rows), deque()
+        return rows
+
+    async def close(self):
+        self._rows = deque()
+
+
+class SqliteConnection:
+    """aiomysql の接続と同じ使い方ができる SQLite 接続"""
+
+    def __init__(self, raw: aiosqlite.Connection):
+        self.raw = raw
+        self.last_usage = asyncio.get_running_loop().time()
+
+    def touch(self) -> None:
+        self.last_usage = asyncio.get_running_loop().time()
+
+    @asynccontextmanager
+    async def cursor(self, *cursor_classes) -> AsyncIterator[SqliteCursor]:
+        as_dict = any(issubclass(c, (aiomysql.DictCursor, aiomysql.SSDictCursor)) for c in cursor_classes)
+        unbuffered = any(issubclass(c, aiomysql.SSCursor) for c in cursor_classes)
+        cursor = SqliteCursor(self, as_dict, unbuffered)
+        try:
+            yield cursor
+        finally:
+            await cursor.close()
+
+    async def begin(self) -> None:
+        # 書き込みロックを先に取り、FOR UPDATE 相当の直列化をする
+        await self.raw.execute('BEGIN IMMEDIATE')
+
+    async def commit(self) -> None:
+        if self.raw.in_transaction:
+            await self.raw.execute('COMMIT')
+
+    async def rollback(self) -> None:
+        if self.raw.in_transaction:
+            await self.raw.execute('ROLLBACK')
+
+    async def ping(self, reconnect: bool = True) -> None:
+        """ローカルファイルなので切断は起きない"""
+
+
+class SqlitePool:
+    """aiomysql.Pool と同じ属性・acquire() を持つ SQLite 接続プール"""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.minsize = self.maxsize = size
+        self._connections: List[SqliteConnection] = []
+        self._free: asyncio.Queue = asyncio.Queue()
+
+    async def open(self) -> None:
+        for i in range(self.maxsize):
+            raw = await aiosqlite.connect(
+                self.path, detect_types=sqlite3.PARSE_DECLTYPES, isolation_level=None
+            )
+            await raw.execute('PRAGMA busy_timeout = 30000')
+            if i == 0:
+                # WAL はDBファイルに記録されるので最初の1接続で切り替える
+                await raw.execute('PRAGMA journal_mode = WAL')
+            conn = SqliteConnection(raw)
+            self._connections.append(conn)
+            self._free.put_nowait(conn)
+
+    @property
+    def size(self) -> int:
+        return len(self._connections)
+
+    @property
+    def freesize(self) -> int:
+        return self._free.qsize()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[SqliteConnection]:
+        conn = await self._free.get()
+        try:
+            yield conn
+        finally:
+            # 途中で抜けたトランザクションを次の利用者に持ち越さない
+            if conn.raw.in_transaction:
+                await conn.raw.execute('ROLLBACK')
+            self._free.put_nowait(conn)
+
+    def close(self) -> None:
+        pass
+
+    async def wait_closed(self) -> None:
+        for conn in self._connections:
+            await conn.raw.close()
+        self._connections = []
+
+
+class SqliteDatabase(Database):
+    """SQLite 版の Database（DB_BACKEND=sqlite で使用）"""
+
+    async def initialize(self):
+        """接続プールを作成し、スキーマを作成する"""
+        if self._pool is None:
+            # ':memory:' は接続ごとに別DBになるため1接続に限る
+            size = 1 if SQLITE_PATH == ':memory:' else POOL_MAXSIZE
+            pool = SqlitePool(SQLITE_PATH, size)
+            await pool.open()
+            self._pool = pool
+            await self.bootstrap_schema()
+
+    async def bootstrap_schema(self, files: Optional[List[Path]] = None) -> None:
+        """*.sql の CREATE / ALTER / INSERT を変換して実行する（既存のものはスキップ）"""
+        async with self.pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                for path in files or schema_files():
+                    text = _strip_comments(path.read_text(encoding='utf-8'))
+                    for statement in _split_top_level(text, ';'):
+                        keyword = statement.split(None, 1)[0].upper() if statement else ''
+                        if keyword not in ('CREATE', 'ALTER', 'INSERT'):
+                            continue  # SHOW / 確認用SELECT などは実行しない
+                        try:
+                            await cursor.execute(statement)
+                        except sqlite3.Error as e:
+                            message = str(e)
+                            if 'duplicate column' in message or 'UNIQUE constraint' in message:
+                                continue  # 2回目以降の起動
+                            print(f'⚠️ SQLiteスキーマ変換スキップ ({path.name}): {message}')
+        print(f'✅ SQLiteスキーマを作成しました: {SQLITE_PATH}')
@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Discord REST クライアント（プロセス共通）
+
+DM・チャンネル投稿・Webhook など Discord への送信はすべてこのクライアントを通す。
+httpx.AsyncClient を1つだけ作って接続を使い回し（keep-alive、h2 があれば HTTP/2）、
+Discord のレート制限に合わせて送信を待たせる。
+
+    - ルートごとのバケット: 応答の X-RateLimit-Bucket / Remaining / Reset-After を覚え、
+      残り回数が 0 のバケットへの送信はリセットまで待つ。バケットは Discord と同じく
+      チャンネル・Webhook などの主要パラメータごとに分ける。
+    - グローバル制限: 1秒あたり DISCORD_GLOBAL_RATE 件までに抑え、global の 429 を
+      受けたら全送信を retry_after だけ止める。
+    - 429: retry_after が DISCORD_MAX_RETRY_WAIT 秒以内ならその場で待って再送し、
+      それより長ければ 429 の応答をそのまま返す（通知アウトボックスが後で再送する）。
+
+応答のステータス確認は呼び出し側で行う（4xx/5xx でも例外にしない）。
+送信件数・429・待ち時間などの集計は stats() で取得でき、/health にも出す。
+
+環境変数:
+    DISCORD_HTTP2: '0' で HTTP/2 を使わない（既定: h2 パッケージがあれば使う）
+    DISCORD_MAX_CONNECTIONS: 最大同時接続数（既定 20）
+    DISCORD_GLOBAL_RATE: 1秒あたりの最大リクエスト数（既定 50）
+    DISCORD_MAX_RETRY_WAIT: 429 をその場で待って再送する上限秒数（既定 10）
+"""
+
+import asyncio
+import os
+import re
+import time
+from collections import deque
+from typing import Optional, Dict, List, Any, Tuple, Deque
+from urllib.parse import urlsplit
+
+import httpx
+
+from api import json_codec
+
+try:
+    import h2  # noqa: F401  HTTP/2 はオプション（httpx[http2]）
+    _H2_AVAILABLE = True
+except ImportError:
+    _H2_AVAILABLE = False
+
+DISCORD_API_BASE = 'https://discord.com/api/v10'
+DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN', '')
+
+DISCORD_HTTP2 = os.getenv('DISCORD_HTTP2', '1') != '0' and _H2_AVAILABLE
+DISCORD_MAX_CONNECTIONS = int(os.getenv('DISCORD_MAX_CONNECTIONS', '20'))
+DISCORD_GLOBAL_RATE = int(os.getenv('DISCORD_GLOBAL_RATE', '50'))
+DISCORD_MAX_RETRY_WAIT = float(os.getenv('DISCORD_MAX_RETRY_WAIT', '10'))
+
+HTTP_TIMEOUT = 10.0
+MAX_RETRIES = 3
+# 覚えておくバケット数の上限（DMチャンネルごとにバケットができるため）
+MAX_BUCKETS = 5000
+
+# バケットを分ける主要パラメータ（この直後のIDはルートに残す）
+_MAJOR_PARAMS = {'channels', 'guilds', 'webhooks'}
+_SNOWFLAKE = re.compile(r'^\d{15,25}$')
+_API_PREFIX = re.compile(r'^/api(?:/v\d+)?')
+
+# files に渡す添付: (ファイル名, 内容, MIMEタイプ)
+Attachment = Tuple[str, bytes, str]
+
+
+def route_of(method: str, url: str) -> Tuple[str, str]:
+    """
+    URL からレート制限のルートと主要パラメータを求める
+
+    例: POST .../channels/123/messages/456 → ('POST /channels/123/messages/{id}', '123')
+    Webhook のトークンは '{token}' に置き換え、集計などに出さない。
+    """
+    path = _API_PREFIX.sub('', urlsplit(url).path)
+    parts = path.strip('/').split('/')
+    route = []
+    major = []
+    for i, part in enumerate(parts):
+        prev = parts[i - 1] if i else ''
+        if i >= 2 and parts[i - 2] == 'webhooks':
+            route.append('{token}')
+        elif _SNOWFLAKE.match(part):
+            if prev in _MAJOR_PARAMS:
+                route.append(part)
+                major.append(part)
+            else:
+                route.append('{id}')
+        else:
+            route.append(part)
+    return f"{method} /{'/'.join(route)}", ':'.join(major)
+
+
+def multipart(payload: Dict[str, Any], attachments: List[Attachment]) -> Tuple[Dict[str, str], List[Any]]:
+    """メッセージ本文と添付を Discord のマルチパート形式（payload_json + files[n]）にする"""
+    data = {'payload_json': json_codec.dumps(payload)}
+    files = [(f'files[{i}]', attachment) for i, attachment in enumerate(attachments)]
+    return data, files
+
+
+def retry_after_of(res: httpx.Response) -> Optional[float]:
+    """429 応答の待ち秒数（本文の retry_after、無ければ Retry-After ヘッダ）"""
+    try:
+        return float(res.json()['retry_after'])
+    except Exception:
+        try:
+            return float(res.headers['Retry-After'])
+        except (KeyError, ValueError):
+            return None
+
+
+class _Bucket:
+    """1つのレート制限バケットの状態"""
+
+    __slots__ = ('lock', 'remaining', 'reset_at')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+
+    def delay(self, now: float) -> float:
+        """送信前に待つ秒数"""
+        if now >= self.reset_at:
+            self.remaining = None
+            return 0.0
+        if self.remaining is not None and self.remaining <= 0:
+            return self.reset_at - now
+        return 0.0
+
+
+class DiscordClient:
+    """Discord REST API のクライアント（レート制限つき）"""
+
+    def __init__(
+        self,
+        token: str = DISCORD_BOT_TOKEN,
+        http2: bool = DISCORD_HTTP2,
+        max_connections: int = DISCORD_MAX_CONNECTIONS,
+        global_rate: int = DISCORD_GLOBAL_RATE,
+        max_retry_wait: float = DISCORD_MAX_RETRY_WAIT
+    ):
+        self.token = token
+        self.http2 = http2
+        self.max_connections = max_connections
+        self.global_rate = global_rate
+        self.max_retry_wait = max_retry_wait
+        self._client: Optional[httpx.AsyncClient] = None
+        # ルート → X-RateLimit-Bucket、'バケット:主要パラメータ' → 状態
+        self._bucket_ids: Dict[str, str] = {}
+        self._buckets: Dict[str, _Bucket] = {}
+        # 直近1秒の送信時刻と、global の 429 で止める期限
+        self._sent_at: Deque[float] = deque()
+        self._global_lock: Optional[asyncio.Lock] = None
+        self._global_until = 0.0
+        self._metrics: Dict[str, Any] = {
+            'requests': 0,
+            'errors': 0,
+            'rate_limited': 0,
+            'global_rate_limited': 0,
+            'retries': 0,
+            'bucket_waits': 0,
+            'wait_seconds': 0.0,
+            'request_ms': 0.0,
+            'status': {},
+        }
+
+    @property
+    def configured(self) -> bool:
+        """BOT_TOKEN が設定されているか（DM・チャンネル投稿に必要）"""
+        return bool(self.token)
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=60.0,
+                ),
+            )
+            self._global_lock = asyncio.Lock()
+        return self._client
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        json: Any = None,
+        data: Optional[Dict[str, Any]] = None,
+        files: Optional[List[Any]] = None,
+        params: Optional[Dict[str, Any]] = None,
+        auth: bool = True,
+        timeout: Optional[float] = None
+    ) -> httpx.Response:
+        """
+        Discord にリクエストを送る
+
+        url は 'channels/123/messages' のような API パス、または Webhook などの完全なURL。
+        auth=False なら Authorization ヘッダを付けない（Webhook はURLのトークンで認証する）。
+        """
+        if not url.startswith('http'):
+            url = f"{DISCORD_API_BASE}/{url.lstrip('/')}"
+        route, major = route_of(method, url)
+        headers = {'Authorization': f'Bot {self.token}'} if auth else None
+        client = self._http()
+        loop = asyncio.get_running_loop()
+
+        attempt = 0
+        while True:
+            bucket = self._bucket(route, major)
+            await self._wait_global(loop)
+            async with bucket.lock:
+                wait = bucket.delay(loop.time())
+                if wait > 0:
+                    self._metrics['bucket_waits'] += 1
+                    self._metrics['wait_seconds'] += wait
+                    await asyncio.sleep(wait)
+                if bucket.remaining is not None:
+                    bucket.remaining -= 1
+
+            start = time.perf_counter()
+            try:
+                res = await client.request(
+                    method, url, headers=headers, json=json, data=data, files=files,
+                    params=params, timeout=timeout or HTTP_TIMEOUT
+                )
+            except Exception:
+                self._metrics['errors'] += 1
+                raise
+            finally:
+                self._metrics['requests'] += 1
+                self._metrics['request_ms'] += (time.perf_counter() - start) * 1000
+            status = self._metrics['status']
+            status[res.status_code] = status.get(res.status_code, 0) + 1
+            self._update_bucket(route, major, bucket, res, loop.time())
+
+            if res.status_code != 429:
+                return res
+
+            retry_after = retry_after_of(res)
+            self._metrics['rate_limited'] += 1
+            if res.headers.get('X-RateLimit-Global') or res.headers.get('X-RateLimit-Scope') == 'global':
+                self._metrics['global_rate_limited'] += 1
+                self._global_until = loop.time() + (retry_after or 1.0)
+            elif retry_after is not None:
+                bucket.remaining = 0
+                bucket.reset_at = max(bucket.reset_at, loop.time() + retry_after)
+
+            if retry_after is None or retry_after > self.max_retry_wait or attempt >= MAX_RETRIES:
+                return res
+            attempt += 1
+            self._metrics['retries'] += 1
+            print(f'⏳ Discord 429: {route} {retry_after:.2f}秒後に再送')
+            await asyncio.sleep(retry_after)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request('POST', url, **kwargs)
+
+    async def open_dm(self, discord_id: str) -> httpx.Response:
+        """DMチャンネルを作成（既存ならそのチャンネル）して応答を返す"""
+        return await self.post('users/@me/channels', json={'recipient_id': str(discord_id)})
+
+    async def send_message(
+        self, channel_id: str, payload: Dict[str, Any], attachments: Optional[List[Attachment]] = None,
+        timeout: Optional[float] = None
+    ) -> httpx.Response:
+        """チャンネル（DMチャンネルを含む）にメッセージを投稿する"""
+        url = f'channels/{channel_id}/messages'
+        if attachments:
+            data, files = multipart(payload, attachments)
+            return await self.post(url, data=data, files=files, timeout=timeout)
+        return await self.post(url, json=payload, timeout=timeout)
+
+    async def execute_webhook(
+        self, webhook_url: str, payload: Dict[str, Any], attachments: Optional[List[Attachment]] = None,
+        wait: bool = False, timeout: Optional[float] = None
+    ) -> httpx.Response:
+        """Webhook でメッセージを投稿する。wait=True なら作成したメッセージを応答で受け取る"""
+        params = {'wait': 'true'} if wait else None
+        if attachments:
+            data, files = multipart(payload, attachments)
+            return await self.post(webhook_url, data=data, files=files, params=params, auth=False, timeout=timeout)
+        return await self.post(webhook_url, json=payload, params=params, auth=False, timeout=timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """送信の集計（/health 用）"""
+        metrics = dict(self._metrics)
+        metrics['status'] = dict(metrics['status'])
+        metrics['wait_seconds'] = round(metrics['wait_seconds'], 3)
+        metrics['request_ms'] = round(metrics['request_ms'], 1)
+        metrics['http2'] = self.http2
+        metrics['buckets'] = len(self._buckets)
+        return metrics
+
+    def _bucket(self, route: str, major: str) -> _Bucket:
+        bucket_id = self._bucket_ids.get(route)
+        key = f'{bucket_id}:{major}' if bucket_id else route
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= MAX_BUCKETS:
+                self._prune()
+            bucket = self._buckets[key] = _Bucket()
+        return bucket
+
+    def _update_bucket(self, route: str, major: str, bucket: _Bucket, res: httpx.Response, now: float) -> None:
+        """応答の X-RateLimit-* でバケットの状態を更新する"""
+        headers = res.headers
+        bucket_id = headers.get('X-RateLimit-Bucket')
+        if bucket_id and self._bucket_ids.get(route) != bucket_id:
+            # 初めて分かったバケットIDにはここまでの状態を引き継ぐ
+            self._bucket_ids[route] = bucket_id
+            self._buckets.setdefault(f'{bucket_id}:{major}', bucket)
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset_after = headers.get('X-RateLimit-Reset-After')
+        try:
+            if remaining is not None:
+                bucket.remaining = int(remaining)
+            if reset_after is not None:
+                bucket.reset_at = now + float(reset_after)
+        except ValueError:
+            pass
+
+    def _prune(self) -> None:
+        """リセット済みで使われていないバケットを捨てる"""
+        now = asyncio.get_running_loop().time()
+        for key in [k for k, b in self._buckets.items() if b.reset_at <= now and not b.lock.locked()]:
+            del self._buckets[key]
+
+    async def _wait_global(self, loop: asyncio.AbstractEventLoop) -> None:
+        """グローバル制限（1秒あたりの件数・global の 429）を待つ"""
+        async with self._global_lock:
+            now = loop.time()
+            wait = self._global_until - now
+            sent_at = self._sent_at
+            while sent_at and sent_at[0] <= now - 1.0:
+                sent_at.popleft()
+            if len(sent_at) >= self.global_rate:
+                wait = max(wait, sent_at[0] + 1.0 - now)
+            if wait > 0:
+                self._metrics['wait_seconds'] += wait
+                await asyncio.sleep(wait)
+            sent_at.append(loop.time())
+
+
+# グローバルインスタンス
+discord = DiscordClient()
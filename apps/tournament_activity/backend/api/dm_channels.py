@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DMチャンネルIDのキャッシュと DM 送信
+
+Discord の DM は POST users/@me/channels でチャンネルを作ってからメッセージを送るが、
+ユーザーごとの DM チャンネルIDは変わらない。作成したIDを discord_dm_channel に保存し、
+プロセス内の LRU と合わせて引くことで、2回目以降の DM は送信1回で済ませる。
+
+DM を送る処理はすべて send_dm() を使うこと（通知アウトボックスの DM もこれで送る）。
+キャッシュしたチャンネルが消えていた（404）場合は作り直して1回だけ再送する。
+
+環境変数:
+    DM_CHANNEL_CACHE_SIZE: プロセス内に保持する件数（既定 5000）
+"""
+
+import os
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+import httpx
+
+from api.database import db
+from api.discord_client import discord
+
+DM_CHANNEL_CACHE_SIZE = int(os.getenv('DM_CHANNEL_CACHE_SIZE', '5000'))
+
+
+class DMChannelCache:
+    """discord_id → DMチャンネルID（LRU + discord_dm_channel テーブル）"""
+
+    def __init__(self, maxsize: int = DM_CHANNEL_CACHE_SIZE):
+        self.maxsize = maxsize
+        # 末尾が最近使ったもの
+        self._channels: 'OrderedDict[str, str]' = OrderedDict()
+        self._stats = {'hits': 0, 'db_hits': 0, 'misses': 0, 'invalidations': 0}
+
+    async def get(self, discord_id: str) -> Optional[str]:
+        """キャッシュ済みのDMチャンネルID（無ければ None）"""
+        discord_id = str(discord_id)
+        channel_id = self._channels.get(discord_id)
+        if channel_id is not None:
+            self._channels.move_to_end(discord_id)
+            self._stats['hits'] += 1
+            return channel_id
+
+        result = await db.execute_query(
+            'discord_dm_channel', operation='select',
+            filters={'discord_id': discord_id}, columns='channel_id', json_fields=()
+        )
+        if result.get('error'):
+            # キャッシュは最適化なので、読めなければチャンネルを作り直す
+            print(f"⚠️ DMチャンネルキャッシュ読込失敗: {result['error']}")
+        elif result.get('data'):
+            channel_id = result['data'][0]['channel_id']
+            self._remember(discord_id, channel_id)
+            self._stats['db_hits'] += 1
+            return channel_id
+        self._stats['misses'] += 1
+        return None
+
+    async def put(self, discord_id: str, channel_id: str) -> None:
+        """作成したDMチャンネルIDを保存する"""
+        discord_id = str(discord_id)
+        self._remember(discord_id, str(channel_id))
+        result = await db.bulk_insert(
+            'discord_dm_channel',
+            [{'discord_id': discord_id, 'channel_id': str(channel_id)}],
+            update_columns=['channel_id']
+        )
+        if result.get('error'):
+            print(f"⚠️ DMチャンネルキャッシュ保存失敗: {result['error']}")
+
+    async def invalidate(self, discord_id: str) -> None:
+        """使えなくなったDMチャンネルIDを捨てる"""
+        discord_id = str(discord_id)
+        self._channels.pop(discord_id, None)
+        self._stats['invalidations'] += 1
+        result = await db.execute_query(
+            'discord_dm_channel', operation='delete', filters={'discord_id': discord_id}
+        )
+        if result.get('error'):
+            print(f"⚠️ DMチャンネルキャッシュ削除失敗: {result['error']}")
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット数など（/health 用）"""
+        return {'size': len(self._channels), **self._stats}
+
+    def _remember(self, discord_id: str, channel_id: str) -> None:
+        self._channels[discord_id] = channel_id
+        self._channels.move_to_end(discord_id)
+        while len(self._channels) > self.maxsize:
+            self._channels.popitem(last=False)
+
+
+# グローバルインスタンス
+dm_channels = DMChannelCache()
+
+
+async def send_dm(discord_id: str, payload: Dict[str, Any]) -> httpx.Response:
+    """
+    ユーザーに DM を送る
+
+    DMチャンネル作成に失敗した場合はその応答を、それ以外はメッセージ送信の応答を返す
+    （ステータスの確認は呼び出し側で行う）。
+    """
+    channel_id = await dm_channels.get(discord_id)
+    if channel_id is not None:
+        res = await discord.send_message(channel_id, payload)
+        if res.status_code != 404:
+            return res
+        # チャンネルが消えている（Unknown Channel）→ 作り直して送る
+        await dm_channels.invalidate(discord_id)
+
+    res = await discord.open_dm(discord_id)
+    if res.status_code != 200:
+        return res
+    channel_id = res.json()['id']
+    await dm_channels.put(discord_id, channel_id)
+    return await discord.send_message(channel_id, payload)
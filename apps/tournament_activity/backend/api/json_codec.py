@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSONコーデック
+
+DBのJSONカラム（type / pair2 など）の変換と、HTTPレスポンスのJSON化で共通に使う。
+orjson が入っていれば orjson、無ければ標準の json を使う（環境変数で固定も可）。
+
+レスポンスは FastJSONResponse（main.py で既定のレスポンスクラスに設定）で返す。
+大きな一覧を返すエンドポイントは FastJSONResponse(data) を直接返すと
+FastAPI の jsonable_encoder による行ごとの変換も省ける。
+日付・時刻・timedelta・Decimal は jsonable_encoder と同じ形で出力する。
+
+環境変数:
+    JSON_CODEC: 'orjson' または 'json'（既定: orjson があれば orjson）
+"""
+
+import os
+import json
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from enum import Enum
+from typing import Any
+from uuid import UUID
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson はオプション
+    orjson = None
+
+JSON_CODEC = os.getenv('JSON_CODEC', 'orjson' if orjson is not None else 'json').lower()
+if JSON_CODEC == 'orjson' and orjson is None:
+    raise RuntimeError('JSON_CODEC=orjson but orjson is not installed')
+
+# orjson.JSONDecodeError は json.JSONDecodeError のサブクラスなのでどちらの実装でもこれで捕まえられる
+JSONDecodeError = json.JSONDecodeError
+
+
+def _default(value: Any) -> Any:
+    """標準でJSON化できない値の変換（jsonable_encoder と同じ結果にする）"""
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, Decimal):
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode()
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode='json')
+    # 以下は orjson ならネイティブに扱う型（標準 json 用）
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+if JSON_CODEC == 'orjson':
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps_bytes(value: Any) -> bytes:
+        """UTF-8のJSONバイト列にする（HTTPレスポンス用）"""
+        return orjson.dumps(value, default=_default, option=_OPTIONS)
+
+    def dumps(value: Any) -> str:
+        """JSON文字列にする（DBのJSONカラム用。非ASCIIはエスケープしない）"""
+        return orjson.dumps(value, default=_default, option=_OPTIONS).decode()
+
+    loads = orjson.loads
+else:
+    def dumps_bytes(value: Any) -> bytes:
+        """UTF-8のJSONバイト列にする（HTTPレスポンス用）"""
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode()
+
+    def dumps(value: Any) -> str:
+        """JSON文字列にする（DBのJSONカラム用。非ASCIIはエスケープしない）"""
+        return json.dumps(value, default=_default, ensure_ascii=False)
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    """コーデック層でJSON化するレスポンス"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
@@ -14,9 +14,10 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from api.json_codec import FastJSONResponse
 from api.routers import players, tournaments, registrations, auth, session, available_tournaments, notification, oauth2, excel_generation, practice, app_logs, referee_training, events, sheets_import, comments, audit, game_scores
 
-app = FastAPI(title="Tournament Activity API")
+app = FastAPI(title="Tournament Activity API", default_response_class=FastJSONResponse)
 
 # CORS設定
 frontend_url = os.getenv('FRONTEND_URL', '*')
@@ -30,6 +31,8 @@ app.add_middleware(
 
 # 監査ログ: 全変更系API操作(POST/PUT/DELETE/PATCH)を自動記録
 _AUDIT_METHODS = {"POST", "PUT", "DELETE", "PATCH"}
+# クライアントログの記録は操作ではないので対象外（書き込みが倍になるため）
+_AUDIT_EXEMPT_PATHS = {"/api/logs", "/api/logs/batch"}
 
 
 def _extract_actor(body_bytes: bytes, request: Request) -> str | None:
@@ -51,7 +54,7 @@ def _extract_actor(body_bytes: bytes, request: Request) -> str | None:
 async def audit_middleware(request: Request, call_next):
     path = request.url.path
     method = request.method
-    is_target = method in _AUDIT_METHODS and path.startswith("/api")
+    is_target = method in _AUDIT_METHODS and path.startswith("/api") and path not in _AUDIT_EXEMPT_PATHS
     body_bytes = b""
     # JSONボディのみキャプチャ（multipart等の大容量アップロードは読まない）
     content_type = request.headers.get("content-type", "")
@@ -89,6 +92,19 @@ async def audit_middleware(request: Request, call_next):
 
     return response
 
+
+# DBクエリ計測: リクエストごとのクエリ数・DB時間を Server-Timing ヘッダで返す
+# （audit_middleware より後に登録して外側に置く。監査ログは積むだけなのでクエリには数えられない）
+@app.middleware("http")
+async def query_stats_middleware(request: Request, call_next):
+    from api.query_stats import begin_request, report_request
+    stats = begin_request()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = stats.server_timing()
+    response.headers["Timing-Allow-Origin"] = frontend_url
+    report_request(stats, request.method, request.url.path)
+    return response
+
 # データベース初期化
 @app.on_event("startup")
 async def startup_event():
@@ -97,6 +113,15 @@ async def startup_event():
     await db.initialize()
     print("✅ データベース接続を初期化しました")
 
+    # 監査ログの書き込みと通知アウトボックスの送信を開始
+    from api.audit_writer import audit_writer
+    from api.notification_outbox import dispatcher
+    from api.session_store import session_store
+    await audit_writer.start()
+    await dispatcher.start()
+    # 期限切れセッションの定期削除
+    await session_store.start()
+
     # OAuth2設定の確認（デバッグ用）
     oauth_redirect = os.getenv('OAUTH_REDIRECT_URI', 'NOT_SET')
     discord_client_id = os.getenv('DISCORD_CLIENT_ID', 'NOT_SET')
@@ -107,6 +132,15 @@ async def startup_event():
 async def shutdown_event():
     """終了時にデータベース接続をクローズ"""
     from api.database import db
+    from api.discord_client import discord
+    from api.notification_outbox import dispatcher
+    from api.audit_writer import audit_writer
+    from api.session_store import session_store
+    await session_store.stop()
+    await dispatcher.stop()
+    await discord.close()
+    # 溜まっている監査ログを書き込んでからDBを閉じる
+    await audit_writer.stop()
     await db.close()
     print("✅ データベース接続をクローズしました")
 
@@ -137,7 +171,20 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
+    """死活監視。DBコネクションプールの使用状況と Discord への送信状況・監査ログの書き込み状況も返す"""
+    from api.database import db
+    from api.audit_writer import audit_writer
+    from api.discord_client import discord
+    from api.dm_channels import dm_channels
+    from api.session_store import session_store
+    return {
+        "status": "healthy",
+        "db_pool": db.pool_stats(),
+        "discord": discord.stats(),
+        "dm_channels": dm_channels.stats(),
+        "audit": audit_writer.stats(),
+        "sessions": session_store.stats(),
+    }
 
 
 if __name__ == "__main__":
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通知アウトボックス（notification_outbox）とバックグラウンド送信
+
+Discord への DM・Webhook 通知はリクエスト処理中に送らず、notification_outbox に
+1件1行で積んで応答を返す。送信はプロセス内のディスパッチャ（main.py の起動時に開始）が行い、
+失敗したものは指数バックオフで再送し、再送上限や恒久エラー（403 など）で dead にする。
+送信そのものは共通の Discord クライアント（api/discord_client.py）で行う。
+
+使い方:
+    await enqueue([
+        webhook_message(url, {'content': content}, 'registration'),
+        dm_message(discord_id, content, 'registration'),
+    ])
+
+DB の変更と同時に通知を積むときは、同じトランザクションで enqueue_in(tx, ...) を呼び、
+コミット後に dispatcher.wake() する（変更がロールバックされれば通知も残らない）。
+
+多人数への一斉送信は fan_out() で積むと batch_id が返り、batch_progress()
+（GET /api/notify/batches/{batch_id}）で宛先ごとの送信結果と進捗を確認できる。
+同時に送る件数は NOTIFY_WORKERS で決まり、Discord のグローバル制限は
+discord_client 側で守るので、数百件の DM でも数秒〜数十秒で送り終わる。
+
+行の取得は「送信待ちのIDを読む → status='pending' を条件に sending へ更新」で行うため、
+複数ワーカー（uvicorn --workers）で同時に動かしても同じ通知を二重に送らない。
+送信中のままプロセスが止まった行は SENDING_TIMEOUT 秒後に送信待ちへ戻す。
+
+環境変数:
+    NOTIFY_WORKERS: 同時に送信するワーカー数（既定 8、0 でこのプロセスでは送信しない）
+    NOTIFY_MAX_ATTEMPTS: 送信を試みる最大回数（既定 8）
+    NOTIFY_RETRY_BASE: 再送間隔の初期値（秒、既定 10。失敗ごとに倍）
+    NOTIFY_RETRY_MAX: 再送間隔の上限（秒、既定 3600）
+    NOTIFY_POLL_INTERVAL: 新着が無いときに送信待ちを確認する間隔（秒、既定 5）
+"""
+
+import asyncio
+import base64
+import mimetypes
+import os
+import random
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, List, Any, Iterable
+
+import aiomysql
+import httpx
+
+from api.database import db
+from api.discord_client import discord, retry_after_of
+from api.dm_channels import send_dm
+
+NOTIFY_WORKERS = int(os.getenv('NOTIFY_WORKERS', '8'))
+NOTIFY_MAX_ATTEMPTS = int(os.getenv('NOTIFY_MAX_ATTEMPTS', '8'))
+NOTIFY_RETRY_BASE = float(os.getenv('NOTIFY_RETRY_BASE', '10'))
+NOTIFY_RETRY_MAX = float(os.getenv('NOTIFY_RETRY_MAX', '3600'))
+NOTIFY_POLL_INTERVAL = float(os.getenv('NOTIFY_POLL_INTERVAL', '5'))
+
+# 送信中のまま残った行を送信待ちに戻すまでの秒数（プロセス停止・強制終了への備え）
+SENDING_TIMEOUT = 300
+# 1回に取得する送信待ちの件数
+CLAIM_BATCH_SIZE = 50
+
+OUTBOX_STATUSES = ('pending', 'sending', 'sent', 'dead')
+
+
+class DeliveryError(Exception):
+    """通知の送信失敗。retryable=False なら再送せず dead にする"""
+
+    def __init__(self, message: str, retryable: bool = True, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def _now() -> datetime:
+    return datetime.now().replace(microsecond=0)
+
+
+def _attachment(path: Any) -> Dict[str, str]:
+    """添付ファイルを読み、行に保存する形（ファイル名・MIMEタイプ・base64）にする"""
+    path = Path(path)
+    return {
+        'name': path.name,
+        'content_type': mimetypes.guess_type(path.name)[0] or 'application/octet-stream',
+        'data': base64.b64encode(path.read_bytes()).decode('ascii'),
+    }
+
+
+def _message(
+    kind: str, channel: str, target: str, payload: Dict[str, Any], files: Optional[Iterable[Any]] = None
+) -> Dict[str, Any]:
+    return {
+        'kind': kind,
+        'channel': channel,
+        'target': target,
+        'payload': payload,
+        'attachments': [_attachment(p) for p in files] if files else None,
+        'status': 'pending',
+        'next_attempt_at': _now(),
+        'batch_id': None,
+    }
+
+
+def dm_message(discord_id: Optional[str], content: str, kind: str) -> Optional[Dict[str, Any]]:
+    """DM 1件分の行（送信先が無い・BOT_TOKEN 未設定なら None）"""
+    if not discord_id or not discord.configured:
+        return None
+    return _message(kind, 'dm', str(discord_id), {'content': content})
+
+
+def webhook_message(
+    url: Optional[str], body: Dict[str, Any], kind: str, files: Optional[Iterable[Any]] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Webhook 1件分の行（URL 未設定なら None）
+
+    files は添付ファイルのパス。内容はこの時点で読んで行に保存するので、送信時に
+    別のワーカー・ホストが取得しても、元のファイルが消えていても同じ添付で送れる。
+    """
+    if not url:
+        return None
+    return _message(kind, 'webhook', url, body, files)
+
+
+def new_batch_id() -> str:
+    """一斉送信の進捗をまとめて見るためのID"""
+    return uuid.uuid4().hex
+
+
+def _rows(messages: Iterable[Optional[Dict[str, Any]]], batch_id: Optional[str]) -> List[Dict[str, Any]]:
+    rows = [m for m in messages if m]
+    for row in rows:
+        row['batch_id'] = batch_id
+    return rows
+
+
+async def enqueue(messages: Iterable[Optional[Dict[str, Any]]], batch_id: Optional[str] = None) -> int:
+    """dm_message() / webhook_message() の行を積む（None は無視）。積んだ件数を返す"""
+    rows = _rows(messages, batch_id)
+    if not rows:
+        return 0
+    result = await db.bulk_insert('notification_outbox', rows)
+    if result.get('error'):
+        raise RuntimeError(f"通知の登録に失敗しました: {result['error']}")
+    dispatcher.wake()
+    return len(rows)
+
+
+async def enqueue_in(tx, messages: Iterable[Optional[Dict[str, Any]]], batch_id: Optional[str] = None) -> int:
+    """
+    enqueue() をトランザクション内で行う（本体の変更と通知が一緒にコミット・ロールバックされる）
+
+    コミット前の行はディスパッチャから見えないため、コミット後に dispatcher.wake() を呼ぶこと。
+    """
+    rows = _rows(messages, batch_id)
+    if rows:
+        await tx.bulk_insert('notification_outbox', rows)
+    return len(rows)
+
+
+async def fan_out(messages: Iterable[Optional[Dict[str, Any]]]) -> str:
+    """複数の宛先への通知を1つの batch_id で積み、その batch_id を返す"""
+    batch_id = new_batch_id()
+    await enqueue(messages, batch_id)
+    return batch_id
+
+
+async def batch_progress(batch_id: str) -> Dict[str, Any]:
+    """一斉送信の進捗（状態別件数と宛先ごとの結果）"""
+    rows = await db.fetchall(
+        "SELECT id, kind, channel, target, status, attempts, last_error, sent_at FROM notification_outbox"
+        " WHERE batch_id = %s ORDER BY id",
+        (batch_id,)
+    )
+    counts = {status: 0 for status in OUTBOX_STATUSES}
+    for row in rows:
+        counts[row['status']] = counts.get(row['status'], 0) + 1
+        # Webhook URL にはトークンが含まれるので返さない
+        if row['channel'] == 'webhook':
+            row['target'] = None
+    return {
+        'batch_id': batch_id,
+        'total': len(rows),
+        'counts': counts,
+        'done': counts['pending'] + counts['sending'] == 0,
+        'results': rows,
+    }
+
+
+async def requeue(message_ids: List[int]) -> int:
+    """dead の通知を送信待ちに戻す（試行回数もリセット）。戻した件数を返す"""
+    if not message_ids:
+        return 0
+    placeholders = ', '.join(['%s'] * len(message_ids))
+    count = await _execute(
+        "UPDATE notification_outbox SET status = 'pending', attempts = 0, next_attempt_at = %s"
+        f" WHERE id IN ({placeholders}) AND status = 'dead'",
+        [_now(), *message_ids]
+    )
+    if count:
+        dispatcher.wake()
+    return count
+
+
+async def _execute(sql: str, params: Optional[List[Any]] = None) -> int:
+    """生SQLの更新を実行して影響行数を返す"""
+    async with db.acquire() as conn:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            await cursor.execute(sql, params)
+            return cursor.rowcount
+
+
+def _check_response(res: httpx.Response, label: str) -> None:
+    """Discord の応答を確認し、失敗なら DeliveryError を送出する"""
+    if 200 <= res.status_code < 300:
+        return
+    detail = f'{label}失敗: {res.status_code} {res.text[:200]}'
+    if res.status_code == 429:
+        raise DeliveryError(detail, retry_after=retry_after_of(res))
+    # 5xx は Discord 側の一時的な障害、それ以外の 4xx（DM拒否・Webhook削除など）は再送しても失敗する
+    raise DeliveryError(detail, retryable=res.status_code >= 500)
+
+
+def _attachment_file(attachment: Any) -> tuple:
+    """
+    行に保存した添付を (ファイル名, 内容, MIMEタイプ) にする
+
+    以前の行はファイルパスを持つ。読めなければ添付を省かずに送信失敗として再送する。
+    """
+    if isinstance(attachment, dict):
+        return attachment['name'], base64.b64decode(attachment['data']), attachment['content_type']
+    path = Path(attachment)
+    try:
+        content = path.read_bytes()
+    except OSError as e:
+        raise DeliveryError(f'添付ファイルを読めません: {path} ({e})')
+    return path.name, content, mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+
+
+class NotificationDispatcher:
+    """notification_outbox の送信待ちを取り出して送るバックグラウンド処理"""
+
+    def __init__(
+        self,
+        workers: int = NOTIFY_WORKERS,
+        max_attempts: int = NOTIFY_MAX_ATTEMPTS,
+        retry_base: float = NOTIFY_RETRY_BASE,
+        retry_max: float = NOTIFY_RETRY_MAX,
+        poll_interval: float = NOTIFY_POLL_INTERVAL
+    ):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.poll_interval = poll_interval
+        # このプロセスが sending にした行の目印（claim_token は '{_id}-{取得回数}'）
+        self._id = uuid.uuid4().hex[:16]
+        self._claims = 0
+        self._tasks: List[asyncio.Task] = []
+        self._queue: Optional[asyncio.Queue] = None
+        self._wake: Optional[asyncio.Event] = None
+        # ワーカーがキューから取り出したら立てる（キューの空き待ち用）
+        self._space: Optional[asyncio.Event] = None
+        self._next_recover = 0.0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> None:
+        """ワーカーを起動する（NOTIFY_WORKERS=0 なら何もしない）"""
+        if self.workers <= 0 or self._tasks:
+            return
+        # ワーカーの手が空くまで次の取得を待たせる（取得済みの行を溜め込まない）
+        self._queue = asyncio.Queue(maxsize=self.workers * 2)
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._poll_loop())]
+        self._tasks.extend(asyncio.create_task(self._worker()) for _ in range(self.workers))
+        print(f'📨 通知ディスパッチャを起動しました（ワーカー {self.workers}）')
+
+    async def stop(self) -> None:
+        """ワーカーを止め、送信できなかった行を送信待ちに戻す"""
+        if not self._tasks:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        try:
+            await _execute(
+                "UPDATE notification_outbox SET status = 'pending', claim_token = NULL"
+                " WHERE claim_token LIKE %s AND status = 'sending'",
+                [f'{self._id}-%']
+            )
+        except Exception as e:
+            print(f'⚠️ 送信中の通知を戻せませんでした: {e}')
+
+    def wake(self) -> None:
+        """新しい通知が積まれたことを知らせる（ポーリング間隔を待たずに送る）"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _poll_loop(self) -> None:
+        while True:
+            # キューの空きぶんだけ取得する（取得した行をメモリ上で待たせない）
+            free = self._queue.maxsize - self._queue.qsize()
+            if free <= 0:
+                self._space.clear()
+                await self._space.wait()
+                continue
+
+            # 取得前にクリアし、取得中に積まれた通知の wake() を取りこぼさない
+            self._wake.clear()
+            try:
+                await self._recover_stale()
+                rows = await self._claim(min(free, CLAIM_BATCH_SIZE))
+            except Exception as e:
+                print(f'⚠️ 通知アウトボックスの取得に失敗: {e}')
+                rows = []
+
+            if rows:
+                # 送信中の行の完了は待たずに次を取得する（遅い宛先が他の通知を止めない）
+                for row in rows:
+                    self._queue.put_nowait(row)
+                continue
+
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _recover_stale(self) -> None:
+        """送信中のまま SENDING_TIMEOUT 秒を過ぎた行を送信待ちに戻す（1分に1回）"""
+        loop_time = asyncio.get_running_loop().time()
+        if loop_time < self._next_recover:
+            return
+        self._next_recover = loop_time + 60
+        count = await _execute(
+            "UPDATE notification_outbox SET status = 'pending', claim_token = NULL"
+            " WHERE status = 'sending' AND claimed_at < %s",
+            [_now() - timedelta(seconds=SENDING_TIMEOUT)]
+        )
+        if count:
+            print(f'♻️ 送信中のまま残っていた通知 {count} 件を送信待ちに戻しました')
+
+    async def _claim(self, limit: int) -> List[Dict[str, Any]]:
+        """送信時刻になった行を最大 limit 件 sending にして取得する"""
+        now = _now()
+        due = await db.fetchall(
+            "SELECT id FROM notification_outbox WHERE status = 'pending' AND next_attempt_at <= %s"
+            " ORDER BY next_attempt_at, id LIMIT %s",
+            (now, limit)
+        )
+        if not due:
+            return []
+        ids = [row['id'] for row in due]
+        placeholders = ', '.join(['%s'] * len(ids))
+        self._claims += 1
+        token = f'{self._id}-{self._claims}'
+        # 他のワーカーが先に取った行は status が変わっているので更新されない
+        claimed = await _execute(
+            "UPDATE notification_outbox SET status = 'sending', claim_token = %s, claimed_at = %s,"
+            " attempts = attempts + 1"
+            f" WHERE id IN ({placeholders}) AND status = 'pending'",
+            [token, now, *ids]
+        )
+        if not claimed:
+            return []
+        return await db.fetchall(
+            "SELECT id, kind, channel, target, payload, attachments, attempts, claim_token FROM notification_outbox"
+            " WHERE claim_token = %s AND status = 'sending' ORDER BY id",
+            (token,),
+            json_fields=['payload', 'attachments']
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            row = await self._queue.get()
+            self._space.set()
+            try:
+                # 取得から時間が経っていれば他のプロセスが取り直している可能性があるので、
+                # まだ自分の取得であることを確かめ、claimed_at を更新してから送る（二重送信防止）
+                if not await self._touch(row):
+                    print(f"⚠️ 他のディスパッチャが取り直したため送信しません: id={row['id']}")
+                    continue
+                error = None
+                try:
+                    await self._deliver(row)
+                except DeliveryError as e:
+                    error = e
+                except Exception as e:
+                    # 通信エラー・タイムアウトなどは再送する
+                    error = DeliveryError(f'{type(e).__name__}: {e}')
+                await self._finish(row, error)
+            except Exception as e:
+                print(f"⚠️ 通知の結果を記録できませんでした: id={row['id']} / {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _touch(self, row: Dict[str, Any]) -> bool:
+        """自分が取得した行のままなら claimed_at を今にする"""
+        return bool(await _execute(
+            "UPDATE notification_outbox SET claimed_at = %s"
+            " WHERE id = %s AND claim_token = %s AND status = 'sending'",
+            [_now(), row['id'], row['claim_token']]
+        ))
+
+    async def _deliver(self, row: Dict[str, Any]) -> None:
+        if row['channel'] == 'dm':
+            await self._send_dm(row['target'], row['payload'])
+        elif row['channel'] == 'webhook':
+            await self._send_webhook(row['target'], row['payload'], row.get('attachments') or [])
+        else:
+            raise DeliveryError(f"未対応の channel: {row['channel']}", retryable=False)
+
+    async def _send_dm(self, discord_id: str, payload: Dict[str, Any]) -> None:
+        if not discord.configured:
+            raise DeliveryError('DISCORD_BOT_TOKEN が設定されていません', retryable=False)
+        # DMチャンネルIDはキャッシュ済みなら送信1回で済む
+        _check_response(await send_dm(discord_id, payload), 'DM送信')
+
+    async def _send_webhook(self, url: str, payload: Dict[str, Any], attachments: List[Any]) -> None:
+        files = [_attachment_file(a) for a in attachments]
+        if files:
+            res = await discord.execute_webhook(url, payload, files, timeout=20.0)
+            if res.status_code == 429 or res.status_code >= 500 or 200 <= res.status_code < 300:
+                _check_response(res, 'Webhook送信（添付付き）')
+                return
+            # 添付付きが拒否されたら（サイズ超過など）本文だけでも送る（通知欠落防止）
+            print(f'⚠️ 添付付きWebhookが失敗したため本文のみ送信します: {res.status_code}')
+        res = await discord.execute_webhook(url, payload)
+        _check_response(res, 'Webhook送信')
+
+    async def _finish(self, row: Dict[str, Any], error: Optional[DeliveryError]) -> None:
+        """送信結果を記録する（成功→sent、再送可能→pending、それ以外→dead）"""
+        now = _now()
+        if error is None:
+            data = {'status': 'sent', 'sent_at': now, 'claim_token': None, 'last_error': None}
+        elif not error.retryable or row['attempts'] >= self.max_attempts:
+            data = {'status': 'dead', 'claim_token': None, 'last_error': str(error)[:500]}
+            print(f"💀 通知を送信できませんでした: id={row['id']} kind={row['kind']} / {error}")
+        else:
+            delay = error.retry_after
+            if delay is None:
+                delay = min(self.retry_max, self.retry_base * 2 ** (row['attempts'] - 1)) * random.uniform(0.8, 1.2)
+            data = {
+                'status': 'pending',
+                'next_attempt_at': now + timedelta(seconds=delay),
+                'claim_token': None,
+                'last_error': str(error)[:500],
+            }
+            print(f"⚠️ 通知送信失敗（{delay:.0f}秒後に再送）: id={row['id']} kind={row['kind']} / {error}")
+
+        # 自分の取得のままの行だけ更新する（取り直された行の結果を上書きしない）
+        updated = await _execute(
+            f"UPDATE notification_outbox SET {', '.join(f'{key} = %s' for key in data)}"
+            " WHERE id = %s AND claim_token = %s",
+            [*data.values(), row['id'], row['claim_token']]
+        )
+        if not updated:
+            print(f"⚠️ 取り直された通知のため結果を記録しません: id={row['id']}")
+
+
+# グローバルインスタンス
+dispatcher = NotificationDispatcher()
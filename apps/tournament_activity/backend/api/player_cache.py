@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+選手キャッシュ（player_mst の読み込みキャッシュ）
+
+権限チェックや名前解決で player_mst を discord_id / player_id から引く処理が
+1リクエストに何度もあるため、プロセス内に LRU + TTL で保持する。
+player_id と discord_id のどちらで引いても同じ行を共有する。
+
+player_mst を更新するエンドポイント（players.py）は更新後に invalidate() を呼ぶこと。
+複数ワーカー構成では他ワーカーのキャッシュは消えないため、TTL が古さの上限になる。
+
+環境変数:
+    PLAYER_CACHE_TTL: 保持秒数（既定 300、0 でキャッシュ無効）
+    PLAYER_CACHE_SIZE: 最大保持件数（既定 2000）
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+from api.database import db
+
+PLAYER_CACHE_TTL = float(os.getenv('PLAYER_CACHE_TTL', '300'))
+PLAYER_CACHE_SIZE = int(os.getenv('PLAYER_CACHE_SIZE', '2000'))
+
+
+class PlayerCache:
+    """player_mst の行を player_id / discord_id で引くキャッシュ"""
+
+    def __init__(self, ttl: float = PLAYER_CACHE_TTL, maxsize: int = PLAYER_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # player_id → (期限, 行)。末尾が最近使ったもの
+        self._rows: 'OrderedDict[int, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        # discord_id → player_id
+        self._by_discord: Dict[str, int] = {}
+
+    async def get_by_player_id(self, player_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """player_id で選手を取得（見つからなければ None）"""
+        if player_id is None:
+            return None
+        cached = self._get(int(player_id))
+        if cached is not None:
+            return cached
+        return await self._load('player_id', int(player_id))
+
+    async def get_by_discord_id(self, discord_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        """discord_id で選手を取得（見つからなければ None）"""
+        if not discord_id:
+            return None
+        player_id = self._by_discord.get(str(discord_id))
+        if player_id is not None:
+            cached = self._get(player_id)
+            if cached is not None:
+                return cached
+        return await self._load('discord_id', str(discord_id))
+
+    def invalidate(self, player_id: Optional[int] = None, discord_id: Optional[str] = None) -> None:
+        """選手の更新・削除後に呼ぶ。どちらかのIDが分かれば両方の索引から消す"""
+        if player_id is None and discord_id:
+            player_id = self._by_discord.pop(str(discord_id), None)
+        if player_id is not None:
+            self._drop(int(player_id))
+
+    def clear(self) -> None:
+        """全件を破棄する（一括更新後など）"""
+        self._rows.clear()
+        self._by_discord.clear()
+
+    def _get(self, player_id: int) -> Optional[Dict[str, Any]]:
+        entry = self._rows.get(player_id)
+        if entry is None:
+            return None
+        expires_at, row = entry
+        if expires_at < time.monotonic():
+            self._drop(player_id)
+            return None
+        self._rows.move_to_end(player_id)
+        # 呼び出し側が書き換えてもキャッシュに影響しないようコピーを返す
+        return dict(row)
+
+    async def _load(self, key: str, value: Any) -> Optional[Dict[str, Any]]:
+        result = await db.execute_query('player_mst', operation='select', filters={key: value})
+        if result.get('error'):
+            raise RuntimeError(result['error'])
+        if not result.get('data'):
+            return None
+        row = result['data'][0]
+        self._put(row)
+        return dict(row)
+
+    def _put(self, row: Dict[str, Any]) -> None:
+        if self.ttl <= 0:
+            return
+        player_id = row['player_id']
+        self._drop(player_id)
+        self._rows[player_id] = (time.monotonic() + self.ttl, dict(row))
+        if row.get('discord_id'):
+            self._by_discord[str(row['discord_id'])] = player_id
+        while len(self._rows) > self.maxsize:
+            oldest_id, _ = next(iter(self._rows.items()))
+            self._drop(oldest_id)
+
+    def _drop(self, player_id: int) -> None:
+        entry = self._rows.pop(player_id, None)
+        if entry is not None:
+            discord_id = entry[1].get('discord_id')
+            if discord_id and self._by_discord.get(str(discord_id)) == player_id:
+                del self._by_discord[str(discord_id)]
+
+
+# グローバルインスタンス
+player_cache = PlayerCache()
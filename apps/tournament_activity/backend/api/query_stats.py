@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+DBクエリ計測
+
+クエリごとの所要時間・テーブル・操作・行数と、コネクション取得の待ち時間を記録する。
+リクエスト単位の集計は contextvar に持ち、main.py のミドルウェアが
+Server-Timing ヘッダとして返す。しきい値を超えたクエリはスロークエリとしてログに出す。
+
+環境変数:
+    DB_SLOW_QUERY_MS: スロークエリとして出力するしきい値（ミリ秒、既定 200）
+    DB_QUERY_COUNT_WARN: 1リクエストのクエリ数がこれ以上なら警告を出す（既定 50、0で無効）
+"""
+
+import os
+import re
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Optional, Dict, Tuple
+
+SLOW_QUERY_MS = float(os.getenv('DB_SLOW_QUERY_MS', '200'))
+QUERY_COUNT_WARN = int(os.getenv('DB_QUERY_COUNT_WARN', '50'))
+
+# スロークエリログに出すSQLの最大長
+_SQL_LOG_LENGTH = 300
+
+_TABLE_PATTERN = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN)\s+`?(\w+)', re.IGNORECASE)
+
+
+class RequestQueryStats:
+    """1リクエスト分のクエリ集計"""
+
+    def __init__(self):
+        self.count = 0
+        self.rows = 0
+        self.db_ms = 0.0
+        self.wait_ms = 0.0
+        self.acquires = 0
+        # (テーブル, 操作) → 回数
+        self.by_statement: Dict[Tuple[str, str], int] = {}
+
+    def server_timing(self) -> str:
+        """Server-Timing ヘッダの値"""
+        return (
+            f'db;dur={self.db_ms:.1f};desc="{self.count} queries, {self.rows} rows", '
+            f'db-wait;dur={self.wait_ms:.1f};desc="{self.acquires} acquires"'
+        )
+
+    def top_statements(self, n: int = 5) -> str:
+        """回数の多い (テーブル, 操作) を 'player_mst SELECT x12, ...' の形で返す"""
+        top = sorted(self.by_statement.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return ', '.join(f"{table} {operation} x{count}" for (table, operation), count in top)
+
+
+_current: ContextVar[Optional[RequestQueryStats]] = ContextVar('db_query_stats', default=None)
+
+
+def begin_request() -> RequestQueryStats:
+    """現在のリクエストの集計を開始して返す"""
+    stats = RequestQueryStats()
+    _current.set(stats)
+    return stats
+
+
+@lru_cache(maxsize=1024)
+def describe_sql(sql: str) -> Tuple[str, str]:
+    """SQLから (テーブル, 操作) を推定する（ログ・集計用）"""
+    operation = sql.lstrip().split(None, 1)[0].upper() if sql.strip() else '?'
+    match = _TABLE_PATTERN.search(sql)
+    return (match.group(1) if match else '?'), operation
+
+
+def record_query(sql: str, duration_ms: float, rows: int) -> None:
+    """クエリ1件の実行結果を記録する"""
+    table, operation = describe_sql(sql)
+
+    stats = _current.get()
+    if stats is not None:
+        stats.count += 1
+        stats.db_ms += duration_ms
+        if rows > 0:
+            stats.rows += rows
+        key = (table, operation)
+        stats.by_statement[key] = stats.by_statement.get(key, 0) + 1
+
+    if duration_ms >= SLOW_QUERY_MS:
+        text = ' '.join(sql.split())
+        if len(text) > _SQL_LOG_LENGTH:
+            text = text[:_SQL_LOG_LENGTH] + '...'
+        print(f'🐢 Slow query {duration_ms:.1f}ms [{table} {operation}] rows={rows}: {text}')
+
+
+def record_rows(rows: int) -> None:
+    """ストリーミングで読み終えた行数を記録する（execute 時点で行数が分からない場合）"""
+    stats = _current.get()
+    if stats is not None and rows > 0:
+        stats.rows += rows
+
+
+def record_acquire(wait_ms: float) -> None:
+    """コネクション取得の待ち時間を記録する"""
+    stats = _current.get()
+    if stats is not None:
+        stats.acquires += 1
+        stats.wait_ms += wait_ms
+
+
+def report_request(stats: RequestQueryStats, method: str, path: str) -> None:
+    """クエリ数が多いリクエストを警告する（N+1の検出用）"""
+    if QUERY_COUNT_WARN and stats.count >= QUERY_COUNT_WARN:
+        print(
+            f'⚠️ {method} {path}: {stats.count} queries ({stats.db_ms:.1f}ms) '
+            f'- {stats.top_statements()}'
+        )
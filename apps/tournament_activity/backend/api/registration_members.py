@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+申込メンバー（registration_member）の同期と検索
+
+tournament_registration.pair2 は JSON 配列の文字列なので、ある選手が含まれる申込を
+インデックスで探せない。pair1 / pair2 の選手を registration_member に1人1行で持ち、
+選手からの検索はこちらを JOIN する。
+
+申込の pair1 / pair2 を書き換える処理は、同じトランザクション内で
+replace_members() / delete_members() を呼んで同期すること。
+"""
+
+from typing import Optional, Dict, List, Any, Iterable
+
+from api import json_codec
+from api.database import db, Transaction
+
+# 選手が pair1 / pair2 として含まれる申込ID（idx_member_player を使う）
+MEMBER_REGISTRATIONS_SQL = "SELECT registration_id FROM registration_member WHERE player_id = %s"
+
+
+def member_rows(registration_id: int, pair1: Optional[int], pair2: Optional[Iterable[int]]) -> List[Dict[str, Any]]:
+    """申込1件分の registration_member の行"""
+    rows = []
+    if pair1 is not None:
+        rows.append({'registration_id': registration_id, 'player_id': pair1, 'role': 'pair1', 'position': 0})
+    for position, player_id in enumerate(pair2 or []):
+        if player_id is not None:
+            rows.append({'registration_id': registration_id, 'player_id': player_id, 'role': 'pair2', 'position': position})
+    return rows
+
+
+async def replace_members(
+    tx: Transaction, registration_id: int, pair1: Optional[int], pair2: Optional[Iterable[int]]
+) -> None:
+    """申込のメンバーを pair1 / pair2 の内容で置き換える"""
+    await delete_members(tx, [registration_id])
+    rows = member_rows(registration_id, pair1, pair2)
+    if rows:
+        await tx.bulk_insert('registration_member', rows)
+
+
+async def delete_members(tx: Transaction, registration_ids: List[int]) -> None:
+    """申込を削除する前に、そのメンバー行を削除する"""
+    if not registration_ids:
+        return
+    placeholders = ', '.join(['%s'] * len(registration_ids))
+    await tx.execute(
+        f"DELETE FROM registration_member WHERE registration_id IN ({placeholders})",
+        list(registration_ids)
+    )
+
+
+async def registrations_of_player(player_id: int, columns: str = 'r.*') -> List[Dict[str, Any]]:
+    """選手が pair1 / pair2 として含まれる申込を返す（pair2 はデコード済み）"""
+    return await db.fetchall(
+        f"SELECT {columns} FROM tournament_registration r "
+        f"WHERE r.registration_id IN ({MEMBER_REGISTRATIONS_SQL})",
+        (player_id,),
+        json_fields=['pair2']
+    )
+
+
+async def backfill_members() -> int:
+    """
+    全申込の pair1 / pair2 から registration_member を作り直す（移行時・不整合の修復用）
+
+    読み込みから書き込みまで1トランザクションで行う。作成した行数を返す。
+    """
+    async with db.transaction() as tx:
+        registrations = await tx.fetchall(
+            "SELECT registration_id, pair1, pair2 FROM tournament_registration FOR UPDATE"
+        )
+        rows = []
+        for reg in registrations:
+            pair2 = reg['pair2']
+            if isinstance(pair2, str):
+                try:
+                    pair2 = json_codec.loads(pair2)
+                except json_codec.JSONDecodeError:
+                    print(f"⚠️ pair2 が不正なJSONのためスキップ: registration_id={reg['registration_id']}")
+                    pair2 = None
+            rows.extend(member_rows(reg['registration_id'], reg['pair1'], pair2 if isinstance(pair2, list) else None))
+        await tx.execute("DELETE FROM registration_member")
+        if rows:
+            await tx.bulk_insert('registration_member', rows)
+    return len(rows)
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+練習・イベント・審判講習会の参加者集計
+
+一覧APIで親（練習・イベント等）ごとに参加者・選手名・招待者を引くと N+1 になるため、
+親IDの集合でまとめて JOIN / GROUP BY し、親の件数によらず一定のクエリ数で
+participant_count / participant_names / invited_player_ids を付ける。
+
+並び順は親ID・選手のキー順（参加者・招待者テーブルには id や created_at が無い環境もあるため、
+確実にあるカラムだけで並べる）。
+
+使い方:
+    schedules = await db.fetchall("SELECT * FROM practice_schedule ...")
+    await practice_roster.attach(schedules)
+    participants = await practice_roster.participants(practice_id)
+"""
+
+from typing import Optional, Dict, List, Any
+
+from api.database import db
+
+
+def _placeholders(values: list) -> str:
+    return ', '.join(['%s'] * len(values))
+
+
+class Roster:
+    """参加者テーブル1種類分の集計（親ID → 参加者・招待者）"""
+
+    def __init__(
+        self,
+        table: str,
+        parent_key: str,
+        player_key: str = 'player_id',
+        invitations_table: Optional[str] = None
+    ):
+        """
+        Args:
+            table: 参加者テーブル（例: practice_participants）
+            parent_key: 親IDのカラム（例: practice_id）
+            player_key: player_mst と結び付けるカラム（player_id または discord_id）
+            invitations_table: 招待者テーブル（visibility=invited の親のみ参照。無ければ None）
+        """
+        self.table = table
+        self.parent_key = parent_key
+        self.player_key = player_key
+        self.invitations_table = invitations_table
+
+    async def attach(self, parents: List[Dict[str, Any]], names: bool = True) -> List[Dict[str, Any]]:
+        """
+        親の行に participant_count と（names=True なら）participant_names・invited_player_ids を付ける
+
+        選手マスタに無い参加者は人数にだけ数える。parents をそのまま更新して返す。
+        """
+        for parent in parents:
+            parent['participant_count'] = 0
+            if names:
+                parent['participant_names'] = []
+                parent['invited_player_ids'] = []
+        if not parents:
+            return parents
+
+        by_id = {parent['id']: parent for parent in parents}
+        ids = list(by_id)
+
+        if names:
+            rows = await db.fetchall(
+                f"SELECT pt.{self.parent_key} AS parent_id, p.player_name FROM {self.table} pt"
+                f" LEFT JOIN player_mst p ON p.{self.player_key} = pt.{self.player_key}"
+                f" WHERE pt.{self.parent_key} IN ({_placeholders(ids)})"
+                f" ORDER BY pt.{self.parent_key}, pt.{self.player_key}",
+                ids
+            )
+            for row in rows:
+                parent = by_id[row['parent_id']]
+                parent['participant_count'] += 1
+                if row['player_name'] is not None:
+                    parent['participant_names'].append(row['player_name'])
+        else:
+            rows = await db.fetchall(
+                f"SELECT {self.parent_key} AS parent_id, COUNT(*) AS participant_count FROM {self.table}"
+                f" WHERE {self.parent_key} IN ({_placeholders(ids)}) GROUP BY {self.parent_key}",
+                ids
+            )
+            for row in rows:
+                by_id[row['parent_id']]['participant_count'] = row['participant_count']
+
+        if names and self.invitations_table:
+            invited_ids = [parent['id'] for parent in parents if parent.get('visibility') == 'invited']
+            if invited_ids:
+                rows = await db.fetchall(
+                    f"SELECT {self.parent_key} AS parent_id, player_id FROM {self.invitations_table}"
+                    f" WHERE {self.parent_key} IN ({_placeholders(invited_ids)})"
+                    f" ORDER BY {self.parent_key}, player_id",
+                    invited_ids
+                )
+                for row in rows:
+                    by_id[row['parent_id']]['invited_player_ids'].append(row['player_id'])
+
+        return parents
+
+    async def participants(self, parent_id: int) -> List[Dict[str, Any]]:
+        """親1件の参加者一覧（player_name 付き、選手のキー順）"""
+        return await db.fetchall(
+            f"SELECT pt.*, p.player_name FROM {self.table} pt"
+            f" LEFT JOIN player_mst p ON p.{self.player_key} = pt.{self.player_key}"
+            f" WHERE pt.{self.parent_key} = %s ORDER BY pt.{self.player_key}",
+            (parent_id,)
+        )
+
+
+# グローバルインスタンス
+practice_roster = Roster('practice_participants', 'practice_id', invitations_table='practice_invitations')
+event_roster = Roster('event_participants', 'event_id', invitations_table='event_invitations')
+referee_training_roster = Roster('referee_training_registration', 'training_id', player_key='discord_id')
@@ -4,15 +4,24 @@
 アプリログルーター
 
 アプリケーションログの記録・取得
+
+クライアントはログを溜めて POST /logs/batch でまとめて送る（gzip 圧縮可）。
+ログの記録は監査ログの対象外（api/main.py の _AUDIT_EXEMPT_PATHS）。
 """
 
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+import zlib
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, RootModel, ValidationError
+from typing import Optional, List
 from api.database import db
 
 router = APIRouter()
 
+# 1回のバッチで受け付ける最大件数と、本文の最大バイト数（受信時・展開後とも。gzip爆弾対策）
+LOG_BATCH_MAX_ENTRIES = 500
+LOG_BATCH_MAX_BYTES = 1024 * 1024
+
 
 class LogEntry(BaseModel):
     level: str
@@ -22,6 +31,59 @@ class LogEntry(BaseModel):
     detail: Optional[str] = None
 
 
+class LogBatchEntry(LogEntry):
+    timestamp: Optional[datetime] = None  # クライアントで記録した時刻（省略時は受信時刻）
+
+
+class LogBatch(RootModel[List[LogBatchEntry]]):
+    pass
+
+
+async def _read_batch_body(request: Request) -> bytes:
+    """
+    リクエスト本文を読み、Content-Encoding: gzip なら展開する
+
+    Content-Length が上限を超えていれば読まずに413。本文は届いた分ずつ展開し、
+    受信量・展開後の量のどちらかが LOG_BATCH_MAX_BYTES を超えた時点で413にする。
+    """
+    content_encoding = request.headers.get('content-encoding', '').strip().lower()
+    if content_encoding not in ('', 'identity', 'gzip'):
+        raise HTTPException(status_code=415, detail=f'未対応の Content-Encoding: {content_encoding}')
+    content_length = request.headers.get('content-length', '')
+    if content_length.isdigit() and int(content_length) > LOG_BATCH_MAX_BYTES:
+        raise HTTPException(status_code=413, detail='ログが大きすぎます')
+
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS) if content_encoding == 'gzip' else None
+    received = 0
+    body = bytearray()
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > LOG_BATCH_MAX_BYTES:
+            raise HTTPException(status_code=413, detail='ログが大きすぎます')
+        if decompressor is None:
+            body += chunk
+            continue
+        try:
+            # 上限+1バイトまでしか展開しない（残りは unconsumed_tail に残る）
+            body += decompressor.decompress(chunk, LOG_BATCH_MAX_BYTES + 1 - len(body))
+        except zlib.error as e:
+            raise HTTPException(status_code=400, detail=f'gzip を展開できません: {e}')
+        if len(body) > LOG_BATCH_MAX_BYTES or decompressor.unconsumed_tail:
+            raise HTTPException(status_code=413, detail='ログが大きすぎます')
+    if decompressor is not None and not decompressor.eof:
+        raise HTTPException(status_code=400, detail='gzip が途中で終わっています')
+    return bytes(body)
+
+
+def _local_time(value: Optional[datetime], received_at: datetime) -> datetime:
+    """タイムゾーン付きの時刻はサーバーのローカル時刻にそろえる（app_logs.timestamp と同じ基準）"""
+    if value is None:
+        return received_at
+    if value.tzinfo is not None:
+        value = value.astimezone().replace(tzinfo=None)
+    return value.replace(microsecond=0)
+
+
 @router.post("/logs")
 async def create_log(entry: LogEntry):
     """ログエントリを記録"""
@@ -43,51 +105,90 @@ async def create_log(entry: LogEntry):
     return {'success': True}
 
 
+@router.post("/logs/batch")
+async def create_logs_batch(request: Request):
+    """ログエントリの配列をまとめて記録（Content-Encoding: gzip 可）"""
+    body = await _read_batch_body(request)
+    try:
+        entries = LogBatch.model_validate_json(body).root
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    if len(entries) > LOG_BATCH_MAX_ENTRIES:
+        raise HTTPException(status_code=413, detail=f'1回に送れるログは{LOG_BATCH_MAX_ENTRIES}件までです')
+
+    received_at = datetime.now().replace(microsecond=0)
+    result = await db.bulk_insert('app_logs', [
+        {
+            'timestamp': _local_time(entry.timestamp, received_at),
+            'level': entry.level,
+            'discord_id': entry.discord_id,
+            'username': entry.username,
+            'event': entry.event,
+            'detail': entry.detail,
+        }
+        for entry in entries
+    ])
+
+    if result.get('error'):
+        raise HTTPException(status_code=500, detail=result['error'])
+
+    return {'success': True, 'count': len(entries)}
+
+
 async def _attach_player_names(logs: list) -> list:
     """ログにplayer_mst.player_nameを付与"""
-    p_res = await db.execute_query('player_mst', operation='select')
-    name_map: dict = {}
-    for p in (p_res.get('data') or []):
-        did = p.get('discord_id')
-        if did:
-            name_map[did] = p.get('player_name')
+    players = await db.select_in(
+        'player_mst', 'discord_id',
+        (log.get('discord_id') for log in logs),
+        columns='discord_id, player_name',
+    )
     for log in logs:
-        did = log.get('discord_id')
-        log['player_name'] = name_map.get(did) if did else None
+        p = players.get(log.get('discord_id'))
+        log['player_name'] = p.get('player_name') if p else None
     return logs
 
 
 @router.get("/logs")
-async def get_logs():
-    """最新200件のログを取得（timestamp降順）"""
+async def get_logs(limit: int = 200, before_id: Optional[int] = None):
+    """最新のログを取得（新しい順、既定200件）
+
+    続きは最後に受け取ったログの id を before_id に渡して取得する。
+    """
     result = await db.execute_query(
         'app_logs',
         operation='select',
+        order_by='id DESC',
+        limit=max(1, min(limit, 1000)),
+        after=(before_id,) if before_id is not None else None,
     )
 
     if result.get('error'):
         raise HTTPException(status_code=500, detail=result['error'])
 
     logs = result.get('data') or []
-    logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
-    logs = logs[:200]
     await _attach_player_names(logs)
     return logs
 
 
 @router.get("/logs/search")
-async def search_logs(discord_id: str):
-    """discord_idでログを検索"""
+async def search_logs(discord_id: str, limit: Optional[int] = None, before_id: Optional[int] = None):
+    """discord_idでログを検索（新しい順）
+
+    既定では一致したログをすべて返す。limit を指定した場合は最大 limit 件で、
+    続きは最後に受け取ったログの id を before_id に渡して取得する。
+    """
     result = await db.execute_query(
         'app_logs',
         operation='select',
         filters={'discord_id': discord_id},
+        order_by='id DESC',
+        limit=max(1, min(limit, 1000)) if limit is not None else None,
+        after=(before_id,) if before_id is not None else None,
     )
 
     if result.get('error'):
         raise HTTPException(status_code=500, detail=result['error'])
 
     logs = result.get('data') or []
-    logs.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
     await _attach_player_names(logs)
     return logs
@@ -8,6 +8,7 @@
 - GET /api/audit-logs: 閲覧用
 
 記録は常にベストエフォート（失敗しても本処理を妨げない）。
+書き込みは api/audit_writer.py がバックグラウンドでまとめて行う（記録側は積むだけで待たない）。
 """
 
 import json
@@ -15,6 +16,7 @@ from datetime import datetime
 from typing import Optional, Any
 from fastapi import APIRouter, HTTPException
 from api.database import db
+from api.audit_writer import audit_writer, audit_row
 
 router = APIRouter()
 
@@ -40,8 +42,11 @@ def _to_json(value: Any) -> Optional[str]:
 
 
 async def _insert(data: dict):
+    if audit_writer.submit(data):
+        return
+    # ライター停止中（起動前・終了後）はその場で書き込む
     try:
-        await db.execute_query('audit_logs', operation='insert', data=data)
+        await db.execute_query('audit_logs', operation='insert', data=audit_row(data))
     except Exception as e:
         print(f"⚠️ 監査ログ記録失敗: {e}")
 
@@ -80,35 +85,41 @@ async def record_change(
 
 
 @router.get("/audit-logs")
-async def get_audit_logs(kind: Optional[str] = None, target_id: Optional[str] = None, limit: int = 300):
-    """監査ログを取得（timestamp降順）。kind/target_idで絞り込み可。"""
+async def get_audit_logs(
+    kind: Optional[str] = None, target_id: Optional[str] = None,
+    limit: int = 300, before_id: Optional[int] = None,
+):
+    """監査ログを取得（新しい順）。kind/target_idで絞り込み可。
+
+    続きは最後に受け取ったログの id を before_id に渡して取得する（キーセットページング）。
+    """
     try:
         filters = {}
         if kind:
             filters['kind'] = kind
         if target_id:
             filters['target_id'] = target_id
+        # id は記録順に採番されるため timestamp 降順と同じ並びになる（主キーで並べ替え不要）
         result = await db.execute_query(
             'audit_logs', operation='select',
             filters=filters if filters else None,
+            order_by='id DESC',
+            limit=max(1, min(limit, 1000)),
+            after=(before_id,) if before_id is not None else None,
         )
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
         logs = result.get('data') or []
-        logs.sort(key=lambda x: (x.get('timestamp') or ''), reverse=True)
-        logs = logs[:max(1, min(limit, 1000))]
 
         # 実行者名をplayer_mstから付与
-        ids = list({l.get('actor_discord_id') for l in logs if l.get('actor_discord_id')})
-        name_map = {}
-        if ids:
-            p = await db.execute_query('player_mst', operation='select')
-            for row in (p.get('data') or []):
-                did = row.get('discord_id')
-                if did:
-                    name_map[did] = row.get('player_name')
+        players = await db.select_in(
+            'player_mst', 'discord_id',
+            (l.get('actor_discord_id') for l in logs),
+            columns='discord_id, player_name',
+        )
         for l in logs:
-            l['actor_name'] = name_map.get(l.get('actor_discord_id'))
+            p = players.get(l.get('actor_discord_id'))
+            l['actor_name'] = p.get('player_name') if p else None
             ts = l.get('timestamp')
             if isinstance(ts, datetime):
                 l['timestamp'] = ts.isoformat()
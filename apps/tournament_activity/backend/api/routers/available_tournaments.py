@@ -2,108 +2,99 @@
 # -*- coding: utf-8 -*-
 """
 申込可能な大会を取得するルーター
+
+Activity を開いたときに最初に呼ばれるため、結果はユーザーごとに短時間キャッシュする。
+申込・大会を変更するエンドポイントは invalidate_available_tournaments() を呼ぶこと。
+複数ワーカー構成では他ワーカーのキャッシュは消えないため、TTL が古さの上限になる。
+
+環境変数:
+    AVAILABLE_TOURNAMENTS_CACHE_TTL: 保持秒数（既定 30、0 でキャッシュ無効）
 """
 
+import os
+import time
+from datetime import date
+from typing import Optional, Dict, List, Tuple, Iterable
+
 from fastapi import APIRouter, HTTPException
 from api.database import db
-from datetime import datetime
+from api.json_codec import FastJSONResponse
+from api.player_cache import player_cache
 
 router = APIRouter()
 
+AVAILABLE_CACHE_TTL = float(os.getenv('AVAILABLE_TOURNAMENTS_CACHE_TTL', '30'))
+# キャッシュするユーザー数の上限（超えたら古いものから捨てる）
+AVAILABLE_CACHE_SIZE = 1000
+
+# discord_id → (期限, 大会リスト)
+_available_cache: Dict[str, Tuple[float, List[dict]]] = {}
+
+# 締切前で、本人の申込も pair1/pair2 としての登録も無い大会
+# （申込者は unique_registration、メンバーは registration_member.idx_member_player で引く）
+_AVAILABLE_SQL = (
+    "SELECT t.* FROM tournament_mst t"
+    " WHERE t.deadline_date >= %s"
+    " AND NOT EXISTS (SELECT 1 FROM tournament_registration r"
+    " WHERE r.discord_id = %s AND r.tournament_id = t.tournament_id)"
+)
+_NOT_MEMBER_SQL = (
+    " AND NOT EXISTS (SELECT 1 FROM registration_member m"
+    " JOIN tournament_registration r ON r.registration_id = m.registration_id"
+    " WHERE m.player_id = %s AND r.tournament_id = t.tournament_id)"
+)
+
+
+def invalidate_available_tournaments(discord_ids: Optional[Iterable[str]] = None) -> None:
+    """申込可能大会のキャッシュを破棄する（discord_ids 省略時は全ユーザー分）"""
+    if discord_ids is None:
+        _available_cache.clear()
+        return
+    for discord_id in discord_ids:
+        if discord_id:
+            _available_cache.pop(str(discord_id), None)
+
 
 @router.get("/tournaments/available/{discord_id}")
 async def get_available_tournaments(discord_id: str):
     """
     申込可能な大会を取得
-    
+
     条件：
     1. deadline_dateが過ぎていない
     2. そのdiscord_idがまだ申し込んでいない
     3. そのdiscord_idのplayer_idがpair1やpair2として登録されていない
-    
+
     Args:
         discord_id: Discord User ID
-    
+
     Returns:
         申込可能な大会のリスト
     """
     try:
+        cached = _available_cache.get(discord_id)
+        if cached is not None and cached[0] > time.monotonic():
+            return FastJSONResponse(cached[1])
+
         # discord_idからplayer_idを取得
-        player_result = await db.execute_query(
-            'player_mst',
-            operation='select',
-            filters={'discord_id': discord_id},
-            columns='player_id'
-        )
-
-        if player_result.get('error'):
-            raise HTTPException(status_code=500, detail=player_result['error'])
-
-        player_id = None
-        player_data = player_result.get('data', [])
-        if player_data:
-            player_id = player_data[0]['player_id']
-
-        # 全大会を取得
-        tournaments_result = await db.execute_query(
-            'tournament_mst',
-            operation='select',
-            json_fields=['type']
-        )
-
-        if tournaments_result.get('error'):
-            raise HTTPException(status_code=500, detail=tournaments_result['error'])
-
-        all_tournaments = tournaments_result.get('data', [])
-
-        # 全ての申込データを取得
-        all_registrations_result = await db.execute_query(
-            'tournament_registration',
-            operation='select',
-            columns='tournament_id, discord_id, pair1, pair2',
-            json_fields=['pair2']
-        )
-
-        if all_registrations_result.get('error'):
-            raise HTTPException(status_code=500, detail=all_registrations_result['error'])
-        
-        # 除外すべき大会IDを収集
-        excluded_tournament_ids = set()
-        all_registrations = all_registrations_result.get('data', [])
-        if all_registrations:
-            for reg in all_registrations:
-                # 条件1: 自分が申し込んだ大会
-                if reg['discord_id'] == discord_id:
-                    excluded_tournament_ids.add(reg['tournament_id'])
-                
-                # 条件2: 自分がpair1として登録されている
-                if player_id and reg['pair1'] == player_id:
-                    excluded_tournament_ids.add(reg['tournament_id'])
-                
-                # 条件3: 自分がpair2配列に含まれている
-                if player_id and reg['pair2'] and player_id in reg['pair2']:
-                    excluded_tournament_ids.add(reg['tournament_id'])
-        
-        # 現在時刻
-        now = datetime.now().date()
-        
-        # フィルタリング
-        available_tournaments = []
-        for tournament in all_tournaments:
-            # 締切チェック
-            deadline_str = tournament['deadline_date']
-            if isinstance(deadline_str, str):
-                deadline = datetime.fromisoformat(deadline_str.replace('Z', '')).date()
-            else:
-                deadline = deadline_str
-            
-            # 条件: 締切が過ぎていない AND 除外リストに含まれていない
-            if deadline >= now and tournament['tournament_id'] not in excluded_tournament_ids:
-                available_tournaments.append(tournament)
-        
-        return available_tournaments
-    
+        player = await player_cache.get_by_discord_id(discord_id)
+
+        sql = _AVAILABLE_SQL
+        params = [date.today(), discord_id]
+        if player:
+            sql += _NOT_MEMBER_SQL
+            params.append(player['player_id'])
+
+        available_tournaments = await db.fetchall(sql, params, json_fields=['type'])
+
+        if AVAILABLE_CACHE_TTL > 0:
+            _available_cache.pop(discord_id, None)
+            _available_cache[discord_id] = (time.monotonic() + AVAILABLE_CACHE_TTL, available_tournaments)
+            while len(_available_cache) > AVAILABLE_CACHE_SIZE:
+                del _available_cache[next(iter(_available_cache))]
+
+        return FastJSONResponse(available_tournaments)
+
     except Exception as e:
         print(f'申込可能大会取得エラー: {e}')
         raise HTTPException(status_code=500, detail=str(e))
-
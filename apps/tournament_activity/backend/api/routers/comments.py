@@ -5,21 +5,27 @@
 
 練習・イベント・審判講習へのコメント（スレッド）機能
 メンション(<@player_id>)時にDiscord DMで通知
+
+メンション先の名前は投稿・編集時に解決して comments.mention_names（{"player_id": 名前}）に
+保存し、一覧では本文の <@id> の表示に使う（一覧のたびに選手を引かない）。
 """
 
-import os
 import re
-import httpx
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, Literal
 from datetime import datetime
 from api.database import db
+from api.discord_client import discord
+from api.notification_outbox import enqueue, dm_message
+from api.player_cache import player_cache
 
 router = APIRouter()
 
 ALLOWED_TARGET_TYPES = {"practice", "event", "referee_training"}
 
+MENTION_RE = re.compile(r"<@(\d+)>")
+
 TARGET_LABELS = {
     "practice": "練習",
     "event": "イベント",
@@ -54,43 +60,70 @@ def _serialize_comment(row: dict) -> dict:
 
 
 async def _is_admin(discord_id: str) -> bool:
-    if not discord_id:
+    player = await player_cache.get_by_discord_id(discord_id)
+    if not player:
         return False
-    res = await db.execute_query("player_mst", operation="select", filters={"discord_id": discord_id})
-    if not res.get("data"):
-        return False
-    return (res["data"][0].get("admin_role") or 2) == 0
+    return (player.get("admin_role") or 2) == 0
+
+
+def _mention_ids(body: Optional[str]) -> list:
+    """本文中の <@player_id> の player_id（出現順・重複なし）"""
+    return list(dict.fromkeys(int(m) for m in MENTION_RE.findall(body or "")))
+
+
+async def _players_by_id(player_ids) -> dict:
+    """player_id → 選手（名前・discord_id）を1クエリで取得"""
+    return await db.select_in(
+        "player_mst", "player_id", player_ids,
+        columns="player_id, player_name, discord_id",
+    )
+
+
+def _mention_names(body: str, players: dict) -> dict:
+    """本文のメンション先の名前（{"player_id": 名前}。見つからない選手は含めない）"""
+    names = {}
+    for pid in _mention_ids(body):
+        p = players.get(pid)
+        if p and p.get("player_name"):
+            names[str(pid)] = p["player_name"]
+    return names
 
 
 async def _attach_player_names(comments: list) -> list:
+    """投稿者名と（未保存の古いコメントの）メンション先の名前をまとめて付ける"""
+    ids = [c["player_id"] for c in comments]
     for c in comments:
-        p_res = await db.execute_query("player_mst", operation="select", filters={"player_id": c["player_id"]})
-        if p_res.get("data"):
-            c["player_name"] = p_res["data"][0].get("player_name")
-        else:
-            c["player_name"] = None
+        if c.get("mention_names") is None:
+            ids.extend(_mention_ids(c.get("body")))
+    players = await _players_by_id(ids)
+    for c in comments:
+        p = players.get(c["player_id"])
+        c["player_name"] = p.get("player_name") if p else None
+        if c.get("mention_names") is None:
+            c["mention_names"] = _mention_names(c.get("body"), players)
     return comments
 
 
-async def _send_mention_dms(body: str, target_type: str, target_id: int, sender_player_id: int, exclude_ids=None):
-    """本文中の <@player_id> を抽出し、対象者にDiscord DMを送信。
+async def _send_mention_dms(
+    body: str, target_type: str, target_id: int, sender_player_id: int, players: dict, exclude_ids=None
+):
+    """本文中の <@player_id> の対象者へのDiscord DMを通知アウトボックスに積む。
+    players は送信者とメンション先を _players_by_id() で引いたもの。
     exclude_ids（編集前に既に通知済みのID等）と送信者自身は除外する。"""
-    bot_token = os.getenv("DISCORD_BOT_TOKEN", "")
-    if not bot_token:
+    if not discord.configured:
         return
 
-    mentioned_ids = set(int(m) for m in re.findall(r"<@(\d+)>", body or ""))
     exclude = set(exclude_ids or [])
     if sender_player_id is not None:
         exclude.add(sender_player_id)  # 自己メンションは通知しない
-    mentioned_ids = [pid for pid in mentioned_ids if pid not in exclude]
+    mentioned_ids = [pid for pid in _mention_ids(body) if pid not in exclude]
     if not mentioned_ids:
         return
 
     sender_name = "メンバー"
-    s_res = await db.execute_query("player_mst", operation="select", filters={"player_id": sender_player_id})
-    if s_res.get("data"):
-        sender_name = s_res["data"][0].get("player_name") or sender_name
+    sender = players.get(sender_player_id)
+    if sender:
+        sender_name = sender.get("player_name") or sender_name
 
     target_label = TARGET_LABELS.get(target_type, target_type)
     target_title = ""
@@ -109,69 +142,67 @@ async def _send_mention_dms(body: str, target_type: str, target_id: int, sender_
             t = t_res["data"][0]
             target_title = f"審判講習 {t.get('training_date', '')} {t.get('location', '')}"
 
-    # メンション展開用に全player_idの名前を先取得
-    name_map: dict = {}
-    all_ids = set(re.findall(r"<@(\d+)>", body or ""))
-    for pid_str in all_ids:
-        try:
-            pres = await db.execute_query("player_mst", operation="select", filters={"player_id": int(pid_str)})
-            if pres.get("data"):
-                name_map[pid_str] = pres["data"][0].get("player_name") or pid_str
-        except Exception:
-            pass
-    plain_body = re.sub(r"<@(\d+)>", lambda m: f"@{name_map.get(m.group(1), m.group(1))}", body)
-
-    headers = {"Authorization": f"Bot {bot_token}", "Content-Type": "application/json"}
+    name_map = _mention_names(body, players)
+    plain_body = MENTION_RE.sub(lambda m: f"@{name_map.get(m.group(1), m.group(1))}", body)
 
+    messages = []
     for pid in mentioned_ids:
-        try:
-            p_res = await db.execute_query("player_mst", operation="select", filters={"player_id": pid})
-            if not p_res.get("data"):
-                continue
-            target_discord_id = p_res["data"][0].get("discord_id")
-            if not target_discord_id:
-                continue
-
-            content = (
-                f"💬 {target_label}「{target_title}」のコメントであなたがメンションされました。\n"
-                f"投稿者: {sender_name}\n"
-                f"内容: {plain_body}"
-            )
+        target = players.get(pid)
+        if not target or not target.get("discord_id"):
+            continue
+        content = (
+            f"💬 {target_label}「{target_title}」のコメントであなたがメンションされました。\n"
+            f"投稿者: {sender_name}\n"
+            f"内容: {plain_body}"
+        )
+        messages.append(dm_message(target["discord_id"], content, "mention"))
 
-            async with httpx.AsyncClient() as client:
-                ch = await client.post(
-                    "https://discord.com/api/v10/users/@me/channels",
-                    headers=headers,
-                    json={"recipient_id": target_discord_id},
-                    timeout=5.0,
-                )
-                if ch.status_code == 200:
-                    channel_id = ch.json()["id"]
-                    await client.post(
-                        f"https://discord.com/api/v10/channels/{channel_id}/messages",
-                        headers=headers,
-                        json={"content": content},
-                        timeout=5.0,
-                    )
-                    print(f"✅ メンションDM送信成功: {target_discord_id}")
-        except Exception as e:
-            print(f"⚠️ メンションDM送信失敗: player_id={pid} / {e}")
+    await enqueue(messages)
 
 
 @router.get("/comments")
-async def get_comments(target_type: str, target_id: int):
-    """コメント一覧を取得"""
+async def get_comments(
+    target_type: str,
+    target_id: int,
+    limit: Optional[int] = None,
+    before_id: Optional[int] = None,
+):
+    """コメント一覧を取得
+
+    limit を指定すると、トップレベルのコメントを新しい順に limit 件と、その返信すべてを返す
+    （続きは返ってきたトップレベルのうち最小の id を before_id に渡す）。
+    省略時は全件を投稿順で返す。
+
+    Args:
+        limit: トップレベルのコメントの最大件数
+        before_id: ページング用。この id より前（古い）のトップレベルのコメントを返す
+    """
     if target_type not in ALLOWED_TARGET_TYPES:
         raise HTTPException(status_code=400, detail="invalid target_type")
     try:
-        result = await db.execute_query(
-            "comments", operation="select",
-            filters={"target_type": target_type, "target_id": target_id},
-        )
-        if result.get("error"):
-            raise HTTPException(status_code=500, detail=result["error"])
-        comments = result.get("data", []) or []
-        comments.sort(key=lambda c: c.get("created_at") or "")
+        if limit is None and before_id is None:
+            comments = await db.fetchall(
+                "SELECT * FROM comments WHERE target_type = %s AND target_id = %s ORDER BY created_at, id",
+                (target_type, target_id),
+                json_fields=["mention_names"]
+            )
+        else:
+            sql = "SELECT * FROM comments WHERE target_type = %s AND target_id = %s AND parent_id IS NULL"
+            params: list = [target_type, target_id]
+            if before_id is not None:
+                sql += " AND id < %s"
+                params.append(before_id)
+            sql += " ORDER BY id DESC LIMIT %s"
+            params.append(max(1, min(limit or 50, 200)))
+            comments = await db.fetchall(sql, params, json_fields=["mention_names"])
+            if comments:
+                root_ids = [c["id"] for c in comments]
+                comments += await db.fetchall(
+                    "SELECT * FROM comments"
+                    f" WHERE parent_id IN ({', '.join(['%s'] * len(root_ids))}) ORDER BY created_at, id",
+                    root_ids,
+                    json_fields=["mention_names"]
+                )
         comments = [_serialize_comment(c) for c in comments]
         await _attach_player_names(comments)
         return comments
@@ -190,11 +221,14 @@ async def create_comment(comment: CommentCreate):
     if not body:
         raise HTTPException(status_code=400, detail="本文を入力してください")
     try:
+        # 送信者とメンション先をまとめて引き、メンション先の名前は保存しておく
+        players = await _players_by_id([comment.player_id] + _mention_ids(body))
         insert_data = {
             "target_type": comment.target_type,
             "target_id": comment.target_id,
             "player_id": comment.player_id,
             "body": body,
+            "mention_names": _mention_names(body, players),
         }
         if comment.parent_id is not None:
             insert_data["parent_id"] = comment.parent_id
@@ -205,9 +239,9 @@ async def create_comment(comment: CommentCreate):
         if result.get("error"):
             raise HTTPException(status_code=500, detail=result["error"])
 
-        # メンションDM送信（バックグラウンド的に。失敗しても投稿は成功）
+        # メンションDMを通知アウトボックスに積む（失敗しても投稿は成功）
         try:
-            await _send_mention_dms(body, comment.target_type, comment.target_id, comment.player_id)
+            await _send_mention_dms(body, comment.target_type, comment.target_id, comment.player_id, players)
         except Exception as e:
             print(f"⚠️ メンションDM処理エラー: {e}")
 
@@ -232,28 +266,32 @@ async def update_comment(comment_id: int, payload: CommentUpdate):
 
         # 権限チェック
         is_owner = False
-        p_res = await db.execute_query("player_mst", operation="select", filters={"discord_id": payload.discord_id})
-        if p_res.get("data") and p_res["data"][0].get("player_id") == c.get("player_id"):
+        editor = await player_cache.get_by_discord_id(payload.discord_id)
+        if editor and editor.get("player_id") == c.get("player_id"):
             is_owner = True
         if not is_owner and not await _is_admin(payload.discord_id):
             raise HTTPException(status_code=403, detail="編集権限がありません")
 
         # 編集前の本文に含まれていたメンション（通知済み）を控える
-        old_mentioned = set(int(m) for m in re.findall(r"<@(\d+)>", c.get("body") or ""))
+        old_mentioned = set(_mention_ids(c.get("body")))
+
+        # 送信者は編集者本人とする
+        editor_player_id = editor.get("player_id") if editor else c["player_id"]
+        players = await _players_by_id([editor_player_id] + _mention_ids(body))
 
         result = await db.execute_query(
             "comments", operation="update",
             filters={"id": comment_id},
-            data={"body": body},
+            data={"body": body, "mention_names": _mention_names(body, players)},
         )
         if result.get("error"):
             raise HTTPException(status_code=500, detail=result["error"])
 
         # 編集時は「新規に追加されたメンションのみ」へ通知（既存分の再送を防ぐ）
-        # 送信者は編集者本人とする
-        editor_player_id = p_res["data"][0].get("player_id") if p_res.get("data") else c["player_id"]
         try:
-            await _send_mention_dms(body, c["target_type"], c["target_id"], editor_player_id, exclude_ids=old_mentioned)
+            await _send_mention_dms(
+                body, c["target_type"], c["target_id"], editor_player_id, players, exclude_ids=old_mentioned
+            )
         except Exception as e:
             print(f"⚠️ メンションDM処理エラー: {e}")
 
@@ -274,8 +312,8 @@ async def delete_comment(comment_id: int, discord_id: str):
         c = c_res["data"][0]
 
         is_owner = False
-        p_res = await db.execute_query("player_mst", operation="select", filters={"discord_id": discord_id})
-        if p_res.get("data") and p_res["data"][0].get("player_id") == c.get("player_id"):
+        actor = await player_cache.get_by_discord_id(discord_id)
+        if actor and actor.get("player_id") == c.get("player_id"):
             is_owner = True
         if not is_owner and not await _is_admin(discord_id):
             raise HTTPException(status_code=403, detail="削除権限がありません")
@@ -11,6 +11,8 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import timedelta
 from api.database import db
+from api.player_cache import player_cache
+from api.rosters import event_roster
 
 router = APIRouter()
 
@@ -79,35 +81,8 @@ async def get_events():
         events = [_fix_time_fields(e) for e in events]
         events.sort(key=lambda e: e.get('event_date', ''))
 
-        for event in events:
-            pt_result = await db.execute_query(
-                'event_participants', operation='select',
-                filters={'event_id': event['id']}
-            )
-            participants = pt_result.get('data', [])
-            event['participant_count'] = len(participants)
-
-            names = []
-            for pt in participants:
-                p_result = await db.execute_query(
-                    'player_mst', operation='select',
-                    filters={'player_id': pt['player_id']}
-                )
-                if p_result.get('data'):
-                    names.append(p_result['data'][0]['player_name'])
-            event['participant_names'] = names
-
-            # 招待者リスト
-            if event.get('visibility') == 'invited':
-                inv_result = await db.execute_query(
-                    'event_invitations', operation='select',
-                    filters={'event_id': event['id']}
-                )
-                event['invited_player_ids'] = [r['player_id'] for r in (inv_result.get('data') or [])]
-            else:
-                event['invited_player_ids'] = []
-
-        return events
+        # 参加者数・参加者名・招待者（イベントIDでまとめて取得）
+        return await event_roster.attach(events)
     except HTTPException:
         raise
     except Exception as e:
@@ -169,18 +144,7 @@ async def delete_event(event_id: int):
 async def get_event_participants(event_id: int):
     """イベントの参加者一覧を取得"""
     try:
-        result = await db.execute_query(
-            'event_participants', operation='select',
-            filters={'event_id': event_id}
-        )
-        participants = result.get('data', [])
-        for pt in participants:
-            p_result = await db.execute_query(
-                'player_mst', operation='select',
-                filters={'player_id': pt['player_id']}
-            )
-            pt['player_name'] = p_result['data'][0]['player_name'] if p_result.get('data') else None
-        return participants
+        return await event_roster.participants(event_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -202,11 +166,9 @@ async def join_event(event_id: int, body: EventJoin):
             raise HTTPException(status_code=404, detail="イベントが見つかりません")
         max_p = ev_res['data'][0].get('max_participants')
         is_admin = False
-        if body.actor_discord_id:
-            a_res = await db.execute_query('player_mst', operation='select', filters={'discord_id': body.actor_discord_id})
-            if a_res.get('data'):
-                row = a_res['data'][0]
-                is_admin = row.get('admin_role') == 0 or row.get('practice_admin') == 1
+        actor = await player_cache.get_by_discord_id(body.actor_discord_id)
+        if actor:
+            is_admin = actor.get('admin_role') == 0 or actor.get('practice_admin') == 1
         if max_p is not None and not is_admin:
             cur = await db.execute_query(
                 'event_participants', operation='select', filters={'event_id': event_id}
@@ -247,8 +209,14 @@ async def update_event_invitations(event_id: int, body: EventInvitationUpdate):
     """イベントの招待者リストを更新"""
     try:
         await db.execute_query('event_invitations', operation='delete', filters={'event_id': event_id})
-        for pid in body.player_ids:
-            await db.execute_query('event_invitations', operation='insert', data={'event_id': event_id, 'player_id': pid})
+        result = await db.bulk_insert(
+            'event_invitations',
+            [{'event_id': event_id, 'player_id': pid} for pid in dict.fromkeys(body.player_ids)]
+        )
+        if result.get('error'):
+            raise HTTPException(status_code=500, detail=result['error'])
         return {"success": True, "message": f"{len(body.player_ids)}名を招待しました"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
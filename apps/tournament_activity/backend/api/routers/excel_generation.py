@@ -11,9 +11,9 @@ from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 from api.database import db
+from api.discord_client import discord
 from api.ward_webhooks import get_ward_webhook_url
 from datetime import datetime, timedelta, date
-import httpx
 import os
 import sys
 from pathlib import Path
@@ -22,7 +22,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
 from services.excel_service_factory import ExcelServiceFactory
-from services.discord_file_service import DiscordFileService
+from services.discord_file_service import DiscordFileService, XLSX_MIME_TYPE
 from services.wards.sumida_text_service import SumidaTextService
 
 router = APIRouter()
@@ -49,26 +49,40 @@ def _split_for_discord(content: str, limit: int = 1900) -> list:
     return chunks
 
 
-async def _build_team_members(registration: dict) -> list:
+async def _load_players(registrations: list) -> tuple:
+    """申込データに登場する選手（申込者・pair1・pair2）を一括取得
+
+    Returns:
+        (by_discord, by_id): discord_id → 選手, player_id → 選手 の辞書
+    """
+    by_discord = await db.select_in(
+        "player_mst", "discord_id", (reg.get("discord_id") for reg in registrations)
+    )
+    member_ids = []
+    for reg in registrations:
+        member_ids.append(reg.get("pair1"))
+        member_ids.extend(reg.get("pair2") or [])
+    by_id = await db.select_in("player_mst", "player_id", member_ids)
+    return by_discord, by_id
+
+
+def _build_team_members(registration: dict, by_discord: dict, by_id: dict) -> list:
     """
     団体戦の申込1件から出場メンバーの選手情報リストを構築
 
     メンバー = 申込者本人(discord_id) + pair1 + pair2。
     申込者は出場者(pair1/pair2)に含まれないため先頭に追加する。
     player_id で重複を除外し、申込者→pair1→pair2 の順を維持する。
+    選手情報は _load_players() で一括取得した辞書から引く。
     """
     members = []
     seen = set()
 
     # 申込者本人（discord_id）を先頭に追加
-    if registration.get("discord_id"):
-        result = await db.execute_query(
-            "player_mst", operation="select", filters={"discord_id": registration["discord_id"]}
-        )
-        if not result.get("error") and result.get("data"):
-            player = result["data"][0]
-            members.append(player)
-            seen.add(player.get("player_id"))
+    player = by_discord.get(registration.get("discord_id"))
+    if player:
+        members.append(player)
+        seen.add(player.get("player_id"))
 
     # 出場者（pair1 + pair2）を追加
     member_ids = []
@@ -79,11 +93,8 @@ async def _build_team_members(registration: dict) -> list:
     for pid in member_ids:
         if not pid or pid in seen:
             continue
-        result = await db.execute_query(
-            "player_mst", operation="select", filters={"player_id": pid}
-        )
-        if not result.get("error") and result.get("data"):
-            members.append(result["data"][0])
+        if pid in by_id:
+            members.append(by_id[pid])
             seen.add(pid)
 
     return members
@@ -189,28 +200,18 @@ async def _enrich_registrations(registrations: list) -> list:
     ペア相手が player_mst に見つからない場合は partner=None のまま進める
     （他の申込の選手情報を誤って流用しない）。
     """
+    by_discord, by_id = await _load_players(registrations)
+
     enriched = []
     for reg in registrations:
-        applicant_result = await db.execute_query(
-            'player_mst',
-            operation='select',
-            filters={'discord_id': reg['discord_id']}
-        )
-        if applicant_result.get('error') or not applicant_result.get('data'):
+        applicant_row = by_discord.get(reg['discord_id'])
+        if not applicant_row:
             continue
-        applicant = _player_fields(applicant_result['data'][0])
+        applicant = _player_fields(applicant_row)
 
         partner = None
-        if reg.get('pair1'):
-            partner_result = await db.execute_query(
-                'player_mst',
-                operation='select',
-                filters={'player_id': reg['pair1']}
-            )
-            if not partner_result.get('error'):
-                partner_data = partner_result.get('data', [])
-                if partner_data:
-                    partner = _player_fields(partner_data[0])
+        if reg.get('pair1') and reg['pair1'] in by_id:
+            partner = _player_fields(by_id[reg['pair1']])
 
         enriched.append({**reg, 'applicant': applicant, 'partner': partner})
 
@@ -221,9 +222,11 @@ async def _generate_sumida_text(tournament: dict, registrations: list) -> "Excel
     """墨田区: 申込書テキストを生成してDiscordチャンネルへ送信"""
     tournament_name = tournament.get("tournament_name")
 
+    by_discord, by_id = await _load_players(registrations)
+
     enriched = []
     for reg in registrations:
-        members = await _build_team_members(reg)
+        members = _build_team_members(reg, by_discord, by_id)
         if members:
             enriched.append({**reg, "members": members})
 
@@ -249,17 +252,16 @@ async def _generate_sumida_text(tournament: dict, registrations: list) -> "Excel
         )
 
     sent = 0
-    async with httpx.AsyncClient() as client:
-        for text in texts:
-            for chunk in _split_for_discord(text):
-                resp = await client.post(webhook_url, json={"content": chunk}, timeout=10.0)
-                if resp.status_code in (200, 204):
-                    sent += 1
-                else:
-                    raise HTTPException(
-                        status_code=502,
-                        detail=f"Discord Webhook error: {resp.status_code} - {resp.text}",
-                    )
+    for text in texts:
+        for chunk in _split_for_discord(text):
+            resp = await discord.execute_webhook(webhook_url, {"content": chunk})
+            if resp.status_code in (200, 204):
+                sent += 1
+            else:
+                raise HTTPException(
+                    status_code=502,
+                    detail=f"Discord Webhook error: {resp.status_code} - {resp.text}",
+                )
 
     if tournament.get("classification") == 1:
         summary = f"{len(texts)}チーム分の申込テキストをDiscordに送信しました（{sent}メッセージ）"
@@ -303,17 +305,12 @@ async def send_discord_notification(tournament_name: str, file_urls: Dict[str, s
             content += f"個人戦申込書: {file_urls['individual_application']}\n"
 
         # Discord Webhookに送信
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                DISCORD_WEBHOOK_URL,
-                json={'content': content},
-                timeout=5.0
-            )
+        response = await discord.execute_webhook(DISCORD_WEBHOOK_URL, {'content': content}, timeout=5.0)
 
-            if response.status_code in [200, 204]:
-                print(f'✅ Discord通知送信成功: {tournament_name}')
-            else:
-                print(f'❌ Discord通知送信失敗: {response.status_code}')
+        if response.status_code in [200, 204]:
+            print(f'✅ Discord通知送信成功: {tournament_name}')
+        else:
+            print(f'❌ Discord通知送信失敗: {response.status_code}')
 
     except Exception as e:
         print(f'❌ Discord通知送信エラー: {e}')
@@ -336,46 +333,37 @@ class ExcelGenerationResponse(BaseModel):
 async def _send_excel_to_ward_webhook(ward_id: int, tournament_name: str, file_paths: Dict[str, str]):
     """生成した申込書Excelを、主催区の管理者チャンネル（区別webhook）へ添付送信する。
     未設定の区はデフォルト(広域)webhookにフォールバック。戻り値は添付CDN URLの辞書（取得できれば）。"""
-    import json as _json
-
     webhook_url = get_ward_webhook_url(ward_id)
     if not webhook_url:
         print(f"⚠️ 区別webhook未設定のためExcel送信スキップ (ward_id={ward_id})")
         return None
 
     # 添付ファイルを組み立て
-    multipart = []
+    attachments = []
     keys = []
-    for i, (key, path) in enumerate(file_paths.items()):
+    for key, path in file_paths.items():
         p = Path(path)
         if not p.exists():
             continue
-        with open(p, 'rb') as fh:
-            multipart.append((
-                f'files[{len(keys)}]',
-                (p.name, fh.read(), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
-            ))
+        attachments.append((p.name, p.read_bytes(), XLSX_MIME_TYPE))
         keys.append(key)
-    if not multipart:
+    if not attachments:
         return None
 
     content = f"📄 **{tournament_name} の申込書を生成しました**"
-    data = {'payload_json': _json.dumps({'content': content})}
-    sep = '&' if '?' in webhook_url else '?'
-    async with httpx.AsyncClient() as client:
-        resp = await client.post(f"{webhook_url}{sep}wait=true", files=multipart, data=data, timeout=30.0)
-        if resp.status_code not in (200, 204):
-            raise Exception(f"webhook error {resp.status_code}: {resp.text[:200]}")
-        # 添付のCDN URLを対応付け（取得できれば）
-        urls = {}
-        try:
-            atts = resp.json().get('attachments', [])
-            for k, att in zip(keys, atts):
-                if att.get('url'):
-                    urls[k] = att['url']
-        except Exception:
-            pass
-        return urls or None
+    resp = await discord.execute_webhook(webhook_url, {'content': content}, attachments, wait=True, timeout=30.0)
+    if resp.status_code not in (200, 204):
+        raise Exception(f"webhook error {resp.status_code}: {resp.text[:200]}")
+    # 添付のCDN URLを対応付け（取得できれば）
+    urls = {}
+    try:
+        atts = resp.json().get('attachments', [])
+        for k, att in zip(keys, atts):
+            if att.get('url'):
+                urls[k] = att['url']
+    except Exception:
+        pass
+    return urls or None
 
 
 @router.post("/excel/generate", response_model=ExcelGenerationResponse)
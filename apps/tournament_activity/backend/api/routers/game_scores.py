@@ -6,8 +6,8 @@
 ミニゲーム（「エビ走」など）のベストスコアをアカウント単位で保持し、
 利用者間で共有するランキング（ベスト5など）を提供する。
 
-汎用 execute_query は ORDER BY / LIMIT / upsert に未対応のため、
-ここでは db.pool を使った生SQLで実装する。
+汎用 execute_query は upsert や相関サブクエリに未対応のため、
+ランキング取得以外は db.acquire() で取得した接続上の生SQLで実装する。
 """
 
 import aiomysql
@@ -15,6 +15,7 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from api.database import db
+from api.player_cache import player_cache
 
 router = APIRouter()
 
@@ -47,7 +48,7 @@ async def _ensure_table():
         INDEX idx_game_score (game, best_score)
     ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
     """
-    async with db.pool.acquire() as conn:
+    async with db.acquire() as conn:
         async with conn.cursor() as cur:
             await cur.execute(create_sql)
     _table_ready = True
@@ -64,11 +65,9 @@ class ScoreSubmit(BaseModel):
 async def _resolve_display_name(discord_id: str, fallback: Optional[str]) -> Optional[str]:
     """player_mst の選手名を優先。無ければ送信された表示名にフォールバック。"""
     try:
-        res = await db.execute_query("player_mst", operation="select", filters={"discord_id": discord_id})
-        if res.get("data"):
-            name = res["data"][0].get("player_name")
-            if name:
-                return name
+        player = await player_cache.get_by_discord_id(discord_id)
+        if player and player.get("player_name"):
+            return player["player_name"]
     except Exception:
         pass
     return fallback
@@ -76,15 +75,16 @@ async def _resolve_display_name(discord_id: str, fallback: Optional[str]) -> Opt
 
 async def _fetch_top(game: str, limit: int) -> list:
     """ベストスコア上位を取得（同点は先に達成した方を上位）"""
-    sql = (
-        "SELECT discord_id, display_name, best_score, best_coins, updated_at "
-        "FROM game_scores WHERE game = %s "
-        "ORDER BY best_score DESC, updated_at ASC LIMIT %s"
+    result = await db.execute_query(
+        "game_scores", operation="select",
+        filters={"game": game},
+        columns="discord_id, display_name, best_score, best_coins, updated_at",
+        order_by="best_score DESC, updated_at ASC",
+        limit=limit,
     )
-    async with db.pool.acquire() as conn:
-        async with conn.cursor(aiomysql.DictCursor) as cur:
-            await cur.execute(sql, (game, limit))
-            rows = await cur.fetchall()
+    if result.get("error"):
+        raise HTTPException(status_code=500, detail=result["error"])
+    rows = result.get("data") or []
     top = []
     for i, r in enumerate(rows):
         top.append({
@@ -107,7 +107,7 @@ async def _rank_of(game: str, discord_id: str) -> Optional[int]:
         "  (gs.best_score = me.best_score AND gs.updated_at < me.updated_at)"
         ")"
     )
-    async with db.pool.acquire() as conn:
+    async with db.acquire() as conn:
         async with conn.cursor(aiomysql.DictCursor) as cur:
             await cur.execute(sql, (game, discord_id, game))
             row = await cur.fetchone()
@@ -139,12 +139,12 @@ async def submit_score(payload: ScoreSubmit):
             "  display_name = VALUES(display_name), "
             "  play_count = play_count + 1"
         )
-        async with db.pool.acquire() as conn:
+        async with db.acquire() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(upsert_sql, (payload.game, payload.discord_id, display_name, score, coins))
 
         # 更新後の自分のベストを取得し、新記録かどうか判定
-        async with db.pool.acquire() as conn:
+        async with db.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cur:
                 await cur.execute(
                     "SELECT best_score, best_coins FROM game_scores WHERE game = %s AND discord_id = %s",
@@ -188,7 +188,7 @@ async def delete_score(game: str, discord_id: str):
         raise HTTPException(status_code=403, detail="reset not allowed for this user")
     try:
         await _ensure_table()
-        async with db.pool.acquire() as conn:
+        async with db.acquire() as conn:
             async with conn.cursor() as cur:
                 await cur.execute(
                     "DELETE FROM game_scores WHERE game = %s AND discord_id = %s",
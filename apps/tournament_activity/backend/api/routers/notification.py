@@ -4,64 +4,26 @@
 Discord通知ルーター
 
 大会申込完了時にDiscord Webhookで通知 + 申込者へDM送信
+（DM・Webhookは通知アウトボックス api/notification_outbox.py に積み、バックグラウンドで送信する）
 """
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date, timedelta
-import httpx
 import os
 import re
 import aiomysql
 
 router = APIRouter()
 
+from api.discord_client import discord
+from api.notification_outbox import (
+    OUTBOX_STATUSES, enqueue, fan_out, new_batch_id, batch_progress, requeue, dm_message, webhook_message
+)
 from api.ward_webhooks import get_ward_webhook_url
 
 DISCORD_WEBHOOK_URL = os.getenv('DISCORD_WEBHOOK_URL', '')
-DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN', '')
-
-
-async def send_dm(discord_id: str, content: str):
-    """Discord BotでユーザーにDMを送信"""
-    if not DISCORD_BOT_TOKEN:
-        print('BOT_TOKENが設定されていません')
-        return
-
-    headers = {
-        'Authorization': f'Bot {DISCORD_BOT_TOKEN}',
-        'Content-Type': 'application/json',
-    }
-
-    try:
-        async with httpx.AsyncClient() as client:
-            # DMチャンネルを作成
-            dm_res = await client.post(
-                'https://discord.com/api/v10/users/@me/channels',
-                headers=headers,
-                json={'recipient_id': discord_id},
-                timeout=5.0,
-            )
-            if dm_res.status_code != 200:
-                print(f'❌ DMチャンネル作成失敗: {dm_res.status_code} {dm_res.text}')
-                return
-
-            channel_id = dm_res.json()['id']
-
-            # メッセージ送信
-            msg_res = await client.post(
-                f'https://discord.com/api/v10/channels/{channel_id}/messages',
-                headers=headers,
-                json={'content': content},
-                timeout=5.0,
-            )
-            if msg_res.status_code in [200, 201]:
-                print(f'✅ DM送信成功: {discord_id}')
-            else:
-                print(f'❌ DM送信失敗: {msg_res.status_code} {msg_res.text}')
-    except Exception as e:
-        print(f'❌ DM送信エラー: {e}')
 
 
 class RegistrationNotification(BaseModel):
@@ -86,31 +48,28 @@ async def notify_registration(notification: RegistrationNotification):
         content = f"【大会申込完了】\n{notification.tournament_name}\n{notification.type}{sex_label}\n{notification.player1_name}"
 
     results = {}
+    messages = []
 
     # 1. Webhookでチャンネル通知
     if DISCORD_WEBHOOK_URL:
-        try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    DISCORD_WEBHOOK_URL, json={'content': content}, timeout=5.0
-                )
-                if response.status_code in [200, 204]:
-                    print(f'✅ Webhook通知送信成功: {notification.tournament_name}')
-                    results['webhook'] = 'success'
-                else:
-                    print(f'❌ Webhook送信失敗: {response.status_code}')
-                    results['webhook'] = 'failed'
-        except Exception as e:
-            print(f'❌ Webhook送信エラー: {e}')
-            results['webhook'] = 'error'
+        messages.append(webhook_message(DISCORD_WEBHOOK_URL, {'content': content}, 'registration'))
+        results['webhook'] = 'queued'
 
     # 2. 申込者へDM送信
     if notification.discord_id:
         dm_content = f"✅ 大会申込が完了しました\n\n**{notification.tournament_name}**\n種別: {notification.type}{sex_label}"
         if notification.player2_name:
             dm_content += f"\nペア: {notification.player2_name}"
-        await send_dm(notification.discord_id, dm_content)
-        results['dm'] = 'sent'
+        dm = dm_message(notification.discord_id, dm_content, 'registration')
+        messages.append(dm)
+        results['dm'] = 'queued' if dm else 'skipped'
+
+    # 通知はベストエフォート（登録に失敗しても申込完了の応答は返し、結果欄を error にする）
+    try:
+        await enqueue(messages)
+    except Exception as e:
+        print(f'❌ 申込通知の登録エラー: {e}')
+        results = {key: 'error' if value == 'queued' else value for key, value in results.items()}
 
     return {'status': 'success', **results}
 
@@ -175,7 +134,7 @@ async def get_incomplete_profiles():
     try:
         today_str = date.today().isoformat()
 
-        async with db.pool.acquire() as conn:
+        async with db.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 # 1. 今後開催の大会を取得
                 await cursor.execute(
@@ -266,14 +225,14 @@ class ProfileIncompleteNotifyRequest(BaseModel):
 
 @router.post("/notify/send-profile-incomplete")
 async def send_profile_incomplete_notifications(request: ProfileIncompleteNotifyRequest):
-    """申込単位でプロフィール不備の通知を申込者へ送信"""
+    """申込単位でプロフィール不備の通知を申込者へ送信（通知アウトボックスに積む）"""
     from api.database import db
 
     try:
         if not request.registration_ids:
             return {"success": True, "sent_count": 0, "results": []}
 
-        async with db.pool.acquire() as conn:
+        async with db.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 placeholders = ','.join(['%s'] * len(request.registration_ids))
                 await cursor.execute(
@@ -304,6 +263,7 @@ async def send_profile_incomplete_notifications(request: ProfileIncompleteNotify
                         player_id_map[row['player_id']] = row
 
         results = []
+        messages = []
         sent_count = 0
 
         for reg in regs:
@@ -349,13 +309,11 @@ async def send_profile_incomplete_notifications(request: ProfileIncompleteNotify
                 'channel': 'not_requested',
             }
 
-            # DM送信（申込者へ）
+            # DM（申込者へ）
             if did:
-                try:
-                    await send_dm(did, dm_content)
-                    result_entry['dm'] = 'sent'
-                except Exception as e:
-                    result_entry['dm'] = f'error: {e}'
+                dm = dm_message(did, dm_content, 'profile_incomplete')
+                messages.append(dm)
+                result_entry['dm'] = 'queued' if dm else 'skipped'
 
             # チャンネル通知
             if request.send_channel and DISCORD_WEBHOOK_URL:
@@ -365,18 +323,17 @@ async def send_profile_incomplete_notifications(request: ProfileIncompleteNotify
                 if pair_issues:
                     all_issues.append(f"{pair_name}(ペア): {', '.join(pair_issues)}")
                 channel_content = f"【プロフィール不備通知】{t_name}\n申込者: {applicant_name}\n{chr(10).join(all_issues)}"
-                try:
-                    async with httpx.AsyncClient() as client:
-                        resp = await client.post(DISCORD_WEBHOOK_URL, json={'content': channel_content}, timeout=5.0)
-                        result_entry['channel'] = 'sent' if resp.status_code in [200, 204] else f'failed: {resp.status_code}'
-                except Exception as e:
-                    result_entry['channel'] = f'error: {e}'
-
-            result_entry['status'] = 'sent'
+                messages.append(webhook_message(DISCORD_WEBHOOK_URL, {'content': channel_content}, 'profile_incomplete'))
+                result_entry['channel'] = 'queued'
+
+            result_entry['status'] = 'queued'
             sent_count += 1
             results.append(result_entry)
 
-        return {"success": True, "sent_count": sent_count, "results": results}
+        # 送信は通知アウトボックスのディスパッチャが行う（進捗は GET /notify/batches/{batch_id}）
+        batch_id = await fan_out(messages)
+
+        return {"success": True, "sent_count": sent_count, "results": results, "batch_id": batch_id}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -395,7 +352,7 @@ async def notify_deadline_closed(target_date: Optional[str] = None):
         else:
             target = (date.today() - timedelta(days=1)).isoformat()
 
-        async with db.pool.acquire() as conn:
+        async with db.acquire() as conn:
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 # 締切日が対象日の大会を取得
                 await cursor.execute(
@@ -407,6 +364,7 @@ async def notify_deadline_closed(target_date: Optional[str] = None):
                     return {"success": True, "message": "締切日が昨日の大会はありません", "sent_count": 0}
 
                 results = []
+                batch_id = new_batch_id()
                 generated_groups = set()  # このrunで申込書を生成済みの大会グループ
                 for t in tournaments:
                     tid = t['tournament_id']
@@ -572,44 +530,24 @@ async def notify_deadline_closed(target_date: Optional[str] = None):
                     webhook_url = get_ward_webhook_url(ward_id)
 
                     if webhook_url:
+                        # 添付付きで拒否された場合はディスパッチャが本文のみで再送する（通知欠落防止）
                         try:
-                            async with httpx.AsyncClient() as client:
-                                if attached_files:
-                                    # multipart送信（添付ファイル付き）
-                                    import json as json_mod
-                                    multipart_files = []
-                                    for i, p in enumerate(attached_files):
-                                        with open(p, 'rb') as fh:
-                                            multipart_files.append((
-                                                f'files[{i}]',
-                                                (p.name, fh.read(), 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
-                                            ))
-                                    data = {'payload_json': json_mod.dumps({'content': content})}
-                                    resp = await client.post(webhook_url, files=multipart_files, data=data, timeout=20.0)
-                                    # 添付付き送信が失敗したら、申込一覧テキストだけでも再送（通知欠落防止）
-                                    if resp.status_code not in [200, 204]:
-                                        try:
-                                            fb = await client.post(webhook_url, json={'content': content}, timeout=10.0)
-                                            if fb.status_code in [200, 204]:
-                                                results.append({'tournament': t_name, 'status': 'sent_text_only_after_attach_fail'})
-                                            else:
-                                                results.append({'tournament': t_name, 'status': f'failed: attach={resp.status_code} text={fb.status_code}'})
-                                        except Exception as fe:
-                                            results.append({'tournament': t_name, 'status': f'error_fallback: {fe}'})
-                                    else:
-                                        results.append({'tournament': t_name, 'status': f'sent (添付{len(attached_files)}件)'})
-                                else:
-                                    resp = await client.post(webhook_url, json={'content': content}, timeout=10.0)
-                                    if resp.status_code in [200, 204]:
-                                        results.append({'tournament': t_name, 'status': f'sent ({excel_note})' if excel_note else 'sent'})
-                                    else:
-                                        results.append({'tournament': t_name, 'status': f'failed: {resp.status_code} body={resp.text[:200]}'})
+                            await enqueue([webhook_message(webhook_url, {'content': content}, 'deadline_closed', attached_files)], batch_id)
+                            if attached_files:
+                                results.append({'tournament': t_name, 'status': f'queued (添付{len(attached_files)}件)'})
+                            else:
+                                results.append({'tournament': t_name, 'status': f'queued ({excel_note})' if excel_note else 'queued'})
                         except Exception as e:
                             results.append({'tournament': t_name, 'status': f'error: {e}'})
                     else:
                         results.append({'tournament': t_name, 'status': 'no_webhook'})
 
-                return {"success": True, "sent_count": len([r for r in results if r['status'].startswith('sent')]), "results": results}
+                return {
+                    "success": True,
+                    "sent_count": len([r for r in results if r['status'].startswith('queued')]),
+                    "results": results,
+                    "batch_id": batch_id,
+                }
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -661,20 +599,21 @@ async def notify_tournament_registered(req: TournamentNotifyRequest):
         content += f"- 締切日: {fmt_date(req.deadline_date)}\n"
         content += f"- 形式: {classification_label}"
 
-        async with httpx.AsyncClient() as client:
-            response = await client.post(webhook_url, json={'content': content, 'allowed_mentions': {'parse': ['everyone']}}, timeout=5.0)
-            if response.status_code in [200, 204]:
-                print(f'✅ 大会登録通知送信: {req.tournament_name}')
-                # 通知済みフラグを更新
-                await db.execute_query(
-                    'tournament_mst', operation='update',
-                    filters={'tournament_id': req.tournament_id},
-                    data={'notified': 1}
-                )
-                return {'status': 'success'}
-            else:
-                print(f'❌ 大会登録通知失敗: {response.status_code}')
-                raise HTTPException(status_code=500, detail='通知送信に失敗しました')
+        response = await discord.execute_webhook(
+            webhook_url, {'content': content, 'allowed_mentions': {'parse': ['everyone']}}, timeout=5.0
+        )
+        if response.status_code in [200, 204]:
+            print(f'✅ 大会登録通知送信: {req.tournament_name}')
+            # 通知済みフラグを更新
+            await db.execute_query(
+                'tournament_mst', operation='update',
+                filters={'tournament_id': req.tournament_id},
+                data={'notified': 1}
+            )
+            return {'status': 'success'}
+        else:
+            print(f'❌ 大会登録通知失敗: {response.status_code}')
+            raise HTTPException(status_code=500, detail='通知送信に失敗しました')
     except HTTPException:
         raise
     except Exception as e:
@@ -717,6 +656,7 @@ async def notify_deadline_reminder(target_date: Optional[str] = None):
                 return str(d)
 
         results = []
+        messages = []
         for t in tournaments:
             classification_label = '団体戦' if t.get('classification') == 1 else '個人戦'
             type_val = t.get('type')
@@ -731,26 +671,79 @@ async def notify_deadline_reminder(target_date: Optional[str] = None):
                 content += f"\n- 種別: {types_str}"
             content += "\n\nまだ申込がお済みでない方はお早めにお願いします。"
 
-            try:
-                async with httpx.AsyncClient() as client:
-                    resp = await client.post(
-                        webhook_url,
-                        json={'content': content, 'allowed_mentions': {'parse': ['everyone']}},
-                        timeout=10.0,
-                    )
-                    if resp.status_code in (200, 204):
-                        results.append({'tournament': t.get('tournament_name'), 'status': 'sent'})
-                    else:
-                        results.append({'tournament': t.get('tournament_name'), 'status': f'failed: {resp.status_code}'})
-            except Exception as e:
-                results.append({'tournament': t.get('tournament_name'), 'status': f'error: {e}'})
+            messages.append(webhook_message(
+                webhook_url,
+                {'content': content, 'allowed_mentions': {'parse': ['everyone']}},
+                'deadline_reminder',
+            ))
+            results.append({'tournament': t.get('tournament_name'), 'status': 'queued'})
+
+        batch_id = await fan_out(messages)
 
         return {
             'success': True,
-            'sent_count': len([r for r in results if r['status'] == 'sent']),
+            'sent_count': len(results),
             'results': results,
+            'batch_id': batch_id,
         }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+# --- 通知アウトボックス ---
+
+@router.get("/notify/outbox")
+async def get_notification_outbox(status: str = 'dead', limit: int = 100):
+    """通知アウトボックスの状態別件数と、指定した状態（既定: dead）の通知一覧"""
+    from api.database import db
+
+    if status not in OUTBOX_STATUSES:
+        raise HTTPException(status_code=400, detail=f'status は {", ".join(OUTBOX_STATUSES)} のいずれか')
+
+    try:
+        counts = await db.fetchall("SELECT status, COUNT(*) AS count FROM notification_outbox GROUP BY status")
+        items = await db.fetchall(
+            "SELECT id, kind, channel, target, payload, attempts, next_attempt_at, last_error, created_at, sent_at"
+            " FROM notification_outbox WHERE status = %s ORDER BY id DESC LIMIT %s",
+            (status, min(max(limit, 1), 1000)),
+            json_fields=['payload']
+        )
+        for item in items:
+            # Webhook URL にはトークンが含まれるので返さない
+            if item['channel'] == 'webhook':
+                item['target'] = None
+        return {
+            'counts': {row['status']: row['count'] for row in counts},
+            'items': items,
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/notify/batches/{batch_id}")
+async def get_notification_batch(batch_id: str):
+    """一斉送信（batch_id）の進捗と宛先ごとの送信結果"""
+    try:
+        progress = await batch_progress(batch_id)
+        if not progress['total']:
+            raise HTTPException(status_code=404, detail='指定した batch_id の通知はありません')
+        return progress
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/notify/outbox/{message_id}/retry")
+async def retry_notification(message_id: int):
+    """dead になった通知を送信待ちに戻して再送する"""
+    try:
+        if not await requeue([message_id]):
+            raise HTTPException(status_code=404, detail='dead の通知が見つかりません')
+        return {'status': 'queued', 'id': message_id}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
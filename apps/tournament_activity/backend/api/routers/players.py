@@ -7,11 +7,12 @@
 """
 
 from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, AsyncIterator
 from api.database import db
-import aiomysql
-import json
+from api import json_codec
+from api.player_cache import player_cache
 import csv
 import io
 
@@ -88,17 +89,57 @@ class LinkDiscordBody(BaseModel):
     discord_id: str
 
 
+# GET /players で1回に読み込んで書き出す行数
+_STREAM_CHUNK_ROWS = 200
+
+# 重複検出・CSV補完で使うカラム（全件走査はこの列だけ読む）
+_DUPLICATE_COLUMNS = 'player_id, player_name, discord_id, birth_date'
+_IMPORT_COLUMNS = (
+    'player_id, jsta_number, player_name, player_name_kana, sex, birth_date, affiliated_club, '
+    'skill_grade, skill_grade_date, referee_qualification, referee_date, referee_expiry'
+)
+
+
+async def _players_page(after_id: Optional[int]) -> list:
+    """player_mst を player_id 順に after_id の次から _STREAM_CHUNK_ROWS 行読む（1回ごとに接続を返す）"""
+    if after_id is None:
+        return await db.fetchall(
+            "SELECT * FROM player_mst ORDER BY player_id LIMIT %s", (_STREAM_CHUNK_ROWS,)
+        )
+    return await db.fetchall(
+        "SELECT * FROM player_mst WHERE player_id > %s ORDER BY player_id LIMIT %s",
+        (after_id, _STREAM_CHUNK_ROWS)
+    )
+
+
+async def _players_json(page: list) -> AsyncIterator[bytes]:
+    """先頭ページから player_id のキーセットで読み進め、JSON配列を少しずつ返す
+
+    メモリに持つのは1ページ分だけで、ページの読み込みの間だけ接続を借りる
+    （クライアントへの送信中は接続を占有しない）。
+    """
+    yield b'['
+    first = True
+    while page:
+        yield (('' if first else ',') + ','.join(json_codec.dumps(row) for row in page)).encode()
+        first = False
+        if len(page) < _STREAM_CHUNK_ROWS:
+            break
+        page = await _players_page(page[-1]['player_id'])
+    yield b']'
+
+
 @router.get("/players")
 async def get_players():
-    """全選手を取得"""
+    """全選手を取得（player_id 順に _STREAM_CHUNK_ROWS 行ずつ読みながら返す）"""
     try:
-        result = await db.execute_query('player_mst', operation='select')
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
-        return result.get('data', [])
+        # 先頭ページは応答を始める前に読む（DBエラーを500で返せるように）
+        page = await _players_page(None)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+    return StreamingResponse(_players_json(page), media_type='application/json')
+
 
 @router.get("/players/match")
 async def match_player(player_name: str, birth_date: str):
@@ -124,21 +165,16 @@ async def match_player(player_name: str, birth_date: str):
 async def get_duplicate_players():
     """重複の可能性がある選手を検出"""
     try:
-        result = await db.execute_query('player_mst', operation='select')
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
-
-        players = result.get('data', [])
-
         # player_name でグループ化して重複を検出
         name_groups: dict = {}
-        for p in players:
-            name = p.get('player_name', '').strip()
-            if not name:
-                continue
-            if name not in name_groups:
-                name_groups[name] = []
-            name_groups[name].append(p)
+        async with db.stream_select('player_mst', columns=_DUPLICATE_COLUMNS) as players:
+            async for p in players:
+                name = (p.get('player_name') or '').strip()
+                if not name:
+                    continue
+                if name not in name_groups:
+                    name_groups[name] = []
+                name_groups[name].append(p)
 
         # 重複ペアを生成
         duplicates = []
@@ -169,96 +205,94 @@ async def get_duplicate_players():
 
 @router.post("/players/merge")
 async def merge_players(req: MergeRequest):
-    """2つの選手アカウントを統合する"""
+    """2つの選手アカウントを統合する（全更新を1トランザクションで実行）"""
     try:
-        # 両選手の存在確認
-        keep_result = await db.execute_query(
-            'player_mst', operation='select', filters={'player_id': req.keep_id}
-        )
-        remove_result = await db.execute_query(
-            'player_mst', operation='select', filters={'player_id': req.remove_id}
-        )
+        async with db.transaction() as tx:
+            # 両選手の存在確認（統合完了まで他リクエストからの更新をロック）
+            keep_result = await tx.execute_query(
+                'player_mst', operation='select', filters={'player_id': req.keep_id}, for_update=True
+            )
+            remove_result = await tx.execute_query(
+                'player_mst', operation='select', filters={'player_id': req.remove_id}, for_update=True
+            )
 
-        keep_data = keep_result.get('data', [])
-        remove_data = remove_result.get('data', [])
+            keep_data = keep_result.get('data', [])
+            remove_data = remove_result.get('data', [])
 
-        if not keep_data:
-            raise HTTPException(status_code=404, detail=f"残す選手 (ID: {req.keep_id}) が見つかりません")
-        if not remove_data:
-            raise HTTPException(status_code=404, detail=f"削除する選手 (ID: {req.remove_id}) が見つかりません")
+            if not keep_data:
+                raise HTTPException(status_code=404, detail=f"残す選手 (ID: {req.keep_id}) が見つかりません")
+            if not remove_data:
+                raise HTTPException(status_code=404, detail=f"削除する選手 (ID: {req.remove_id}) が見つかりません")
 
-        keep_player = keep_data[0]
-        remove_player = remove_data[0]
+            keep_player = keep_data[0]
+            remove_player = remove_data[0]
 
-        async with db.pool.acquire() as conn:
-            async with conn.cursor(aiomysql.DictCursor) as cursor:
-                # 1. tournament_registration: pair1 の更新
-                await cursor.execute(
-                    "UPDATE tournament_registration SET pair1 = %s WHERE pair1 = %s",
-                    (req.keep_id, req.remove_id)
-                )
-                pair1_updated = cursor.rowcount
+            # 1. tournament_registration: pair1 の更新
+            pair1_updated = await tx.execute(
+                "UPDATE tournament_registration SET pair1 = %s WHERE pair1 = %s",
+                (req.keep_id, req.remove_id)
+            )
 
-                # 2. tournament_registration: pair2 (JSON配列) の更新
-                # pair2 は JSON配列なので文字列置換で対応
-                await cursor.execute(
-                    "UPDATE tournament_registration SET pair2 = REPLACE(pair2, %s, %s) WHERE pair2 LIKE %s",
-                    (str(req.remove_id), str(req.keep_id), f'%{req.remove_id}%')
+            # 2. tournament_registration: pair2 (JSON配列) の更新
+            # remove_id を含む申込を registration_member から引き、配列内の一致する要素だけ置き換える
+            pair2_rows = await tx.fetchall(
+                "SELECT registration_id, pair2 FROM tournament_registration WHERE registration_id IN ("
+                "SELECT registration_id FROM registration_member WHERE player_id = %s AND role = 'pair2') FOR UPDATE",
+                (req.remove_id,)
+            )
+            for row in pair2_rows:
+                pair2 = row['pair2']
+                if isinstance(pair2, str):
+                    pair2 = json_codec.loads(pair2)
+                await tx.execute_query(
+                    'tournament_registration',
+                    operation='update',
+                    filters={'registration_id': row['registration_id']},
+                    data={'pair2': [req.keep_id if pid == req.remove_id else pid for pid in pair2 or []]}
                 )
-                pair2_updated = cursor.rowcount
+            pair2_updated = len(pair2_rows)
+            # メンバー行も残す選手に付け替える
+            await tx.execute(
+                "UPDATE registration_member SET player_id = %s WHERE player_id = %s",
+                (req.keep_id, req.remove_id)
+            )
 
-                # 3. practice_participants: player_id の更新
-                # keep_id が既に存在する場合は remove_id のレコードを削除
-                await cursor.execute(
-                    "SELECT id FROM practice_participants WHERE player_id = %s",
-                    (req.keep_id,)
-                )
-                keep_practices = {row['id'] for row in await cursor.fetchall()}
+            # 3. practice_participants: player_id の更新
+            # keep_id が既に同じ練習に参加している場合は remove_id のレコードを削除
+            # （同じテーブルを参照するサブクエリは派生テーブルで包んでから使う）
+            practice_deleted = await tx.execute(
+                "DELETE FROM practice_participants WHERE player_id = %s AND practice_id IN ("
+                "SELECT practice_id FROM (SELECT practice_id FROM practice_participants WHERE player_id = %s) kp)",
+                (req.remove_id, req.keep_id)
+            )
+            # 残り（keep_id が参加していない練習）は player_id を付け替え
+            practice_updated = await tx.execute(
+                "UPDATE practice_participants SET player_id = %s WHERE player_id = %s",
+                (req.keep_id, req.remove_id)
+            )
 
-                await cursor.execute(
-                    "SELECT id, practice_id FROM practice_participants WHERE player_id = %s",
+            # 4. discord_id の引き継ぎ
+            discord_transferred = False
+            if remove_player.get('discord_id') and not keep_player.get('discord_id'):
+                # discord_id はUNIQUEのため、先に削除対象から外してから付け替える
+                await tx.execute(
+                    "UPDATE player_mst SET discord_id = NULL WHERE player_id = %s",
                     (req.remove_id,)
                 )
-                remove_practices = await cursor.fetchall()
-
-                practice_updated = 0
-                practice_deleted = 0
-                for rp in remove_practices:
-                    # practice_id で重複チェック
-                    await cursor.execute(
-                        "SELECT id FROM practice_participants WHERE player_id = %s AND practice_id = %s",
-                        (req.keep_id, rp['practice_id'])
-                    )
-                    existing = await cursor.fetchone()
-                    if existing:
-                        # keep_id が同じ練習に既に参加 -> remove_id のレコードを削除
-                        await cursor.execute(
-                            "DELETE FROM practice_participants WHERE player_id = %s AND practice_id = %s",
-                            (req.remove_id, rp['practice_id'])
-                        )
-                        practice_deleted += 1
-                    else:
-                        # keep_id が参加していない -> player_id を更新
-                        await cursor.execute(
-                            "UPDATE practice_participants SET player_id = %s WHERE player_id = %s AND practice_id = %s",
-                            (req.keep_id, req.remove_id, rp['practice_id'])
-                        )
-                        practice_updated += 1
-
-                # 4. discord_id の引き継ぎ
-                discord_transferred = False
-                if remove_player.get('discord_id') and not keep_player.get('discord_id'):
-                    await cursor.execute(
-                        "UPDATE player_mst SET discord_id = %s WHERE player_id = %s",
-                        (remove_player['discord_id'], req.keep_id)
-                    )
-                    discord_transferred = True
-
-                # 5. 削除対象の選手を削除
-                await cursor.execute(
-                    "DELETE FROM player_mst WHERE player_id = %s",
-                    (req.remove_id,)
+                await tx.execute(
+                    "UPDATE player_mst SET discord_id = %s WHERE player_id = %s",
+                    (remove_player['discord_id'], req.keep_id)
                 )
+                discord_transferred = True
+
+            # 5. 削除対象の選手を削除
+            await tx.execute(
+                "DELETE FROM player_mst WHERE player_id = %s",
+                (req.remove_id,)
+            )
+
+        player_cache.invalidate(req.keep_id)
+        player_cache.invalidate(req.remove_id)
 
         return {
             "success": True,
@@ -343,6 +377,7 @@ async def create_player(player: PlayerCreate):
                         filters={'player_id': existing_player['player_id']},
                         data={'discord_id': player.discord_id}
                     )
+                    player_cache.invalidate(existing_player['player_id'])
                     existing_player['discord_id'] = player.discord_id
                 return existing_player
 
@@ -401,6 +436,7 @@ async def update_player_by_discord_id(discord_id: str, player: PlayerUpdate):
 
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
+        player_cache.invalidate(discord_id=discord_id)
 
         data = result.get('data', [])
         if not data:
@@ -430,6 +466,7 @@ async def update_player_by_id(player_id: int, player: PlayerUpdate):
 
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
+        player_cache.invalidate(player_id)
 
         data = result.get('data', [])
         if not data:
@@ -463,6 +500,7 @@ async def link_discord(player_id: int, body: LinkDiscordBody):
         )
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
+        player_cache.invalidate(player_id)
 
         return {"success": True, "message": "Discord IDを紐付けました"}
     except HTTPException:
@@ -503,6 +541,7 @@ async def update_player_permissions(player_id: int, permissions: PlayerPermissio
 
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
+        player_cache.invalidate(player_id)
 
         return {"success": True, "message": "権限を更新しました"}
     except HTTPException:
@@ -540,6 +579,7 @@ async def update_player_ward_flags(player_id: int, flags: PlayerWardFlagsUpdate)
 
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
+        player_cache.invalidate(player_id)
 
         return {"success": True, "message": "区登録状況を更新しました"}
     except HTTPException:
@@ -581,6 +621,7 @@ async def update_player_qualifications(player_id: int, quals: PlayerQualificatio
 
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
+        player_cache.invalidate(player_id)
 
         return {"success": True, "message": "資格情報を更新しました"}
     except HTTPException:
@@ -598,22 +639,20 @@ async def import_csv(file: UploadFile = File(...)):
         text = content.decode('utf-8-sig')
         reader = csv.DictReader(io.StringIO(text))
 
-        # 全選手を取得
-        all_players = await db.execute_query('player_mst', operation='select')
-        players = all_players.get('data', [])
-
-        # jsta_numberとplayer_nameでインデックス作成
+        # 全選手を走査して jsta_number と player_name でインデックス作成
         by_jsta = {}
         by_name = {}
-        for p in players:
-            if p.get('jsta_number'):
-                by_jsta[p['jsta_number']] = p
-            if p.get('player_name'):
-                by_name[p['player_name']] = p
+        async with db.stream_select('player_mst', columns=_IMPORT_COLUMNS) as players:
+            async for p in players:
+                if p.get('jsta_number'):
+                    by_jsta[p['jsta_number']] = p
+                if p.get('player_name'):
+                    by_name[p['player_name']] = p
 
         updated = 0
         skipped = 0
         not_found = []
+        fills: dict = {}
 
         for row in reader:
             jsta = row.get('会員番号', '').strip()
@@ -662,16 +701,19 @@ async def import_csv(file: UploadFile = File(...)):
                 fill['referee_expiry'] = referee_exp.replace('/', '-')[:7]
 
             if fill:
-                await db.execute_query(
-                    'player_mst',
-                    operation='update',
-                    filters={'player_id': player['player_id']},
-                    data=fill
-                )
+                fills.setdefault(player['player_id'], {'player_id': player['player_id']}).update(fill)
+                player.update(fill)  # 同一選手が複数行にある場合は先の行の値で埋まったものとして扱う
                 updated += 1
             else:
                 skipped += 1
 
+        # 補完内容はまとめて一括UPDATE（1行ずつのUPDATEだと数千行で数分かかるため）
+        if fills:
+            result = await db.bulk_update('player_mst', 'player_id', list(fills.values()))
+            if result.get('error'):
+                raise HTTPException(status_code=500, detail=result['error'])
+            player_cache.clear()
+
         return {
             "success": True,
             "updated": updated,
@@ -701,6 +743,7 @@ async def delete_player(player_id: int):
         )
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
+        player_cache.invalidate(player_id)
 
         return {"success": True, "message": "選手を削除しました"}
     except HTTPException:
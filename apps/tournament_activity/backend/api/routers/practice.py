@@ -10,9 +10,11 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from typing import Optional
 from datetime import timedelta, datetime, date as _date
-import os
-import httpx
 from api.database import db
+from api.discord_client import discord
+from api.json_codec import FastJSONResponse
+from api.player_cache import player_cache
+from api.rosters import practice_roster
 
 
 # 練習時刻変更時の通知先Discordチャンネル
@@ -40,8 +42,7 @@ async def _notify_practice_time_extended(
     new_start: str, new_end: str
 ):
     """練習時間が延長された場合のみDiscordチャンネルへ @everyone 付きで通知"""
-    bot_token = os.getenv('DISCORD_BOT_TOKEN', '')
-    if not bot_token or not PRACTICE_TIME_CHANGE_NOTIFY_CHANNEL_ID:
+    if not discord.configured or not PRACTICE_TIME_CHANGE_NOTIFY_CHANNEL_ID:
         return
     if not old_start or not old_end or not new_start or not new_end:
         return
@@ -73,18 +74,15 @@ async def _notify_practice_time_extended(
             f"となります。"
         )
 
-        headers = {'Authorization': f'Bot {bot_token}', 'Content-Type': 'application/json'}
-        async with httpx.AsyncClient() as client:
-            res = await client.post(
-                f'https://discord.com/api/v10/channels/{PRACTICE_TIME_CHANGE_NOTIFY_CHANNEL_ID}/messages',
-                headers=headers,
-                json={'content': content, 'allowed_mentions': {'parse': ['everyone']}},
-                timeout=5.0,
-            )
-            if res.status_code in (200, 201):
-                print(f'✅ 練習時間延長通知送信成功: {content}')
-            else:
-                print(f'⚠️ 練習時間延長通知失敗: status={res.status_code} body={res.text[:200]}')
+        res = await discord.send_message(
+            PRACTICE_TIME_CHANGE_NOTIFY_CHANNEL_ID,
+            {'content': content, 'allowed_mentions': {'parse': ['everyone']}},
+            timeout=5.0,
+        )
+        if res.status_code in (200, 201):
+            print(f'✅ 練習時間延長通知送信成功: {content}')
+        else:
+            print(f'⚠️ 練習時間延長通知失敗: status={res.status_code} body={res.text[:200]}')
     except Exception as e:
         print(f'⚠️ 練習時間延長通知失敗: {e}')
 
@@ -146,73 +144,80 @@ class PracticeJoin(BaseModel):
 
 async def _is_admin_actor(discord_id: Optional[str]) -> bool:
     """操作者が管理者(admin_role=0)または練習管理者(practice_admin=1)か"""
-    if not discord_id:
-        return False
-    res = await db.execute_query('player_mst', operation='select', filters={'discord_id': discord_id})
-    if not res.get('data'):
+    row = await player_cache.get_by_discord_id(discord_id)
+    if not row:
         return False
-    row = res['data'][0]
     return row.get('admin_role') == 0 or row.get('practice_admin') == 1
 
 
-@router.get("/practice")
-async def get_practice_schedules():
-    """練習予定一覧を取得（参加者数付き）"""
+def _parse_date_param(name: str, value: Optional[str]) -> Optional[_date]:
+    """クエリパラメータの日付（YYYY-MM-DD）を検証する"""
+    if value is None:
+        return None
     try:
-        result = await db.execute_query(
-            'practice_schedule',
-            operation='select'
-        )
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
+        return _date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f'{name} は YYYY-MM-DD 形式で指定してください')
 
-        schedules = result.get('data', [])
-        # 時刻フィールドを文字列に変換
-        schedules = [_fix_time_fields(s) for s in schedules]
-        # 日付順にソート
-        schedules.sort(key=lambda s: s.get('practice_date', ''))
 
+@router.get("/practice")
+async def get_practice_schedules(
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    upcoming: bool = False,
+    limit: Optional[int] = None,
+    offset: int = 0,
+):
+    """練習予定一覧を取得（参加者数付き）
+
+    参加者名・招待者（api/rosters.py）とコート予約数は練習IDでまとめて取得する
+    （練習の件数によらずクエリ4本）。
+
+    Args:
+        from_date: この日以降の練習のみ（YYYY-MM-DD）
+        to_date: この日以前の練習のみ（YYYY-MM-DD。月単位なら from_date と組み合わせる）
+        upcoming: True なら今日以降の練習のみ（from_date より優先）
+        limit: 最大件数（省略時は全件）
+        offset: ページング用。先頭から読み飛ばす件数
+    """
+    try:
+        start = _date.today() if upcoming else _parse_date_param('from_date', from_date)
+        end = _parse_date_param('to_date', to_date)
+
+        sql = "SELECT * FROM practice_schedule WHERE 1 = 1"
+        params: list = []
+        if start is not None:
+            sql += " AND practice_date >= %s"
+            params.append(start)
+        if end is not None:
+            sql += " AND practice_date <= %s"
+            params.append(end)
+        # 日付順（同日は作成順）
+        sql += " ORDER BY practice_date, id"
+        if limit is not None:
+            sql += " LIMIT %s OFFSET %s"
+            params.extend([max(1, min(limit, 1000)), max(0, offset)])
+
+        schedules = [_fix_time_fields(s) for s in await db.fetchall(sql, params)]
+        # 参加者数・参加者名・招待者
+        await practice_roster.attach(schedules)
+
+        # コート予約数
         for schedule in schedules:
-            participants_result = await db.execute_query(
-                'practice_participants',
-                operation='select',
-                filters={'practice_id': schedule['id']}
-            )
-            participants = participants_result.get('data', [])
-            schedule['participant_count'] = len(participants)
-
-            # コート予約数
-            r_result = await db.execute_query(
-                'practice_court_reservations',
-                operation='select',
-                filters={'practice_id': schedule['id']}
+            schedule['reservation_count'] = 0
+        if schedules:
+            by_id = {s['id']: s for s in schedules}
+            ids = list(by_id)
+            reservations = await db.fetchall(
+                "SELECT practice_id, COUNT(*) AS reservation_count FROM practice_court_reservations"
+                f" WHERE practice_id IN ({', '.join(['%s'] * len(ids))}) GROUP BY practice_id",
+                ids
             )
-            schedule['reservation_count'] = len(r_result.get('data', []) or [])
-
-            # 参加者名を取得
-            names = []
-            for pt in participants:
-                player_result = await db.execute_query(
-                    'player_mst',
-                    operation='select',
-                    filters={'player_id': pt['player_id']}
-                )
-                player_data = player_result.get('data', [])
-                if player_data:
-                    names.append(player_data[0]['player_name'])
-            schedule['participant_names'] = names
-
-            # 招待者リスト（visibility=invitedの場合）
-            if schedule.get('visibility') == 'invited':
-                inv_result = await db.execute_query(
-                    'practice_invitations', operation='select',
-                    filters={'practice_id': schedule['id']}
-                )
-                schedule['invited_player_ids'] = [r['player_id'] for r in (inv_result.get('data') or [])]
-            else:
-                schedule['invited_player_ids'] = []
+            for row in reservations:
+                by_id[row['practice_id']]['reservation_count'] = row['reservation_count']
 
-        return schedules
+        # 件数が多いので jsonable_encoder を通さずに直接JSON化する
+        return FastJSONResponse(schedules)
     except HTTPException:
         raise
     except Exception as e:
@@ -223,28 +228,7 @@ async def get_practice_schedules():
 async def get_practice_participants(practice_id: int):
     """練習の参加者一覧を取得（選手名付き）"""
     try:
-        result = await db.execute_query(
-            'practice_participants',
-            operation='select',
-            filters={'practice_id': practice_id}
-        )
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
-
-        participants = result.get('data', [])
-
-        for participant in participants:
-            player_result = await db.execute_query(
-                'player_mst',
-                operation='select',
-                filters={'player_id': participant['player_id']}
-            )
-            player_data = player_result.get('data', [])
-            participant['player_name'] = player_data[0]['player_name'] if player_data else None
-
-        return participants
-    except HTTPException:
-        raise
+        return await practice_roster.participants(practice_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -321,16 +305,7 @@ async def leave_practice(practice_id: int, player_id: int, discord_id: Optional[
         if deadline:
             if _deadline_passed(deadline):
                 # 管理者 or 練習管理者は締切後でも削除可
-                is_admin = False
-                if discord_id:
-                    a_res = await db.execute_query(
-                        'player_mst', operation='select', filters={'discord_id': discord_id}
-                    )
-                    if a_res.get('data'):
-                        row = a_res['data'][0]
-                        if row.get('admin_role') == 0 or row.get('practice_admin') == 1:
-                            is_admin = True
-                if not is_admin:
+                if not await _is_admin_actor(discord_id):
                     raise HTTPException(status_code=400, detail="締切後はキャンセルできません")
 
         result = await db.execute_query(
@@ -492,13 +467,16 @@ async def update_invitations(practice_id: int, body: InvitationUpdate):
             'practice_invitations', operation='delete',
             filters={'practice_id': practice_id}
         )
-        # 新しい招待を挿入
-        for pid in body.player_ids:
-            await db.execute_query(
-                'practice_invitations', operation='insert',
-                data={'practice_id': practice_id, 'player_id': pid}
-            )
+        # 新しい招待を一括挿入
+        result = await db.bulk_insert(
+            'practice_invitations',
+            [{'practice_id': practice_id, 'player_id': pid} for pid in dict.fromkeys(body.player_ids)]
+        )
+        if result.get('error'):
+            raise HTTPException(status_code=500, detail=result['error'])
         return {"success": True, "message": f"{len(body.player_ids)}名を招待しました"}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -621,11 +599,7 @@ PRACTICE_NOTIFY_CHANNEL_ID = '1489117062952390817'
 @router.post("/practice/{practice_id}/notify-reservations")
 async def notify_practice_reservations(practice_id: int):
     """指定した練習の予約者をDiscordチャンネルに通知"""
-    import os
-    import httpx
-
-    DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN', '')
-    if not DISCORD_BOT_TOKEN:
+    if not discord.configured:
         raise HTTPException(status_code=500, detail="BOT_TOKEN未設定")
 
     # 練習情報を取得
@@ -666,22 +640,12 @@ async def notify_practice_reservations(practice_id: int):
     content = '\n'.join(lines)
 
     # Discordチャンネルに投稿
-    headers = {
-        'Authorization': f'Bot {DISCORD_BOT_TOKEN}',
-        'Content-Type': 'application/json',
-    }
     try:
-        async with httpx.AsyncClient() as client:
-            resp = await client.post(
-                f'https://discord.com/api/v10/channels/{PRACTICE_NOTIFY_CHANNEL_ID}/messages',
-                headers=headers,
-                json={'content': content},
-                timeout=5.0,
-            )
-            if resp.status_code in [200, 201]:
-                return {"success": True, "message": "通知を送信しました"}
-            else:
-                raise HTTPException(status_code=500, detail=f"送信失敗: {resp.status_code}")
+        resp = await discord.send_message(PRACTICE_NOTIFY_CHANNEL_ID, {'content': content}, timeout=5.0)
+        if resp.status_code in [200, 201]:
+            return {"success": True, "message": "通知を送信しました"}
+        else:
+            raise HTTPException(status_code=500, detail=f"送信失敗: {resp.status_code}")
     except HTTPException:
         raise
     except Exception as e:
@@ -691,12 +655,9 @@ async def notify_practice_reservations(practice_id: int):
 @router.post("/practice/notify-upcoming-reservations")
 async def notify_upcoming_reservations():
     """翌日に開催される練習の予約者をDiscordチャンネルに通知（毎週金曜8:00のcronで翌土曜分を通知）"""
-    import os
-    import httpx
     from datetime import date, timedelta as td
 
-    DISCORD_BOT_TOKEN = os.getenv('DISCORD_BOT_TOKEN', '')
-    if not DISCORD_BOT_TOKEN:
+    if not discord.configured:
         raise HTTPException(status_code=500, detail="BOT_TOKEN未設定")
 
     # 翌日の日付（金曜実行→翌土曜の練習が対象）
@@ -741,22 +702,12 @@ async def notify_upcoming_reservations():
         content = '\n'.join(lines)
 
         # Discordチャンネルに投稿
-        headers = {
-            'Authorization': f'Bot {DISCORD_BOT_TOKEN}',
-            'Content-Type': 'application/json',
-        }
         try:
-            async with httpx.AsyncClient() as client:
-                resp = await client.post(
-                    f'https://discord.com/api/v10/channels/{PRACTICE_NOTIFY_CHANNEL_ID}/messages',
-                    headers=headers,
-                    json={'content': content},
-                    timeout=5.0,
-                )
-                if resp.status_code in [200, 201]:
-                    sent.append({'practice_id': practice_id, 'status': 'sent'})
-                else:
-                    sent.append({'practice_id': practice_id, 'status': f'failed: {resp.status_code}'})
+            resp = await discord.send_message(PRACTICE_NOTIFY_CHANNEL_ID, {'content': content}, timeout=5.0)
+            if resp.status_code in [200, 201]:
+                sent.append({'practice_id': practice_id, 'status': 'sent'})
+            else:
+                sent.append({'practice_id': practice_id, 'status': f'failed: {resp.status_code}'})
         except Exception as e:
             sent.append({'practice_id': practice_id, 'status': f'error: {e}'})
 
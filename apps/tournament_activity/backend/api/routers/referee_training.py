@@ -11,6 +11,7 @@ from pydantic import BaseModel
 from typing import Optional
 from datetime import timedelta
 from api.database import db
+from api.rosters import referee_training_roster
 
 
 def _fix_time_fields(record: dict) -> dict:
@@ -64,16 +65,8 @@ async def get_referee_trainings():
         # 日付順にソート
         trainings.sort(key=lambda t: t.get('training_date', ''))
 
-        for training in trainings:
-            participants_result = await db.execute_query(
-                'referee_training_registration',
-                operation='select',
-                filters={'training_id': training['id']}
-            )
-            participants = participants_result.get('data', [])
-            training['participant_count'] = len(participants)
-
-        return trainings
+        # 参加者数（講習会IDでまとめて数える）
+        return await referee_training_roster.attach(trainings, names=False)
     except HTTPException:
         raise
     except Exception as e:
@@ -84,26 +77,7 @@ async def get_referee_trainings():
 async def get_referee_training_participants(training_id: int):
     """審判講習会の参加者一覧を取得（選手名付き）"""
     try:
-        result = await db.execute_query(
-            'referee_training_registration',
-            operation='select',
-            filters={'training_id': training_id}
-        )
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
-
-        participants = result.get('data', [])
-
-        for participant in participants:
-            player_result = await db.execute_query(
-                'player_mst',
-                operation='select',
-                filters={'discord_id': participant['discord_id']}
-            )
-            player_data = player_result.get('data', [])
-            participant['player_name'] = player_data[0]['player_name'] if player_data else None
-
-        return participants
+        return await referee_training_roster.participants(training_id)
     except HTTPException:
         raise
     except Exception as e:
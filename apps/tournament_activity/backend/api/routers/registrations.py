@@ -6,13 +6,17 @@
 大会申込の操作
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import date
 from api.database import db
+from api.json_codec import FastJSONResponse
+from api.notification_outbox import dispatcher, enqueue_in, dm_message, webhook_message
+from api.player_cache import player_cache
+from api.registration_members import replace_members, delete_members, registrations_of_player
+from api.routers.available_tournaments import invalidate_available_tournaments
 from api.ward_webhooks import get_ward_webhook_url
-import httpx
 import os
 
 router = APIRouter()
@@ -28,19 +32,129 @@ class RegistrationCreate(BaseModel):
     team_status: int = 0  # 0=チーム確定, 1=参加希望
 
 
+async def _delete_registration(registration_id: int):
+    """申込とそのメンバー行を削除"""
+    async with db.transaction() as tx:
+        await delete_members(tx, [registration_id])
+        await tx.execute_query(
+            'tournament_registration',
+            operation='delete',
+            filters={'registration_id': registration_id}
+        )
+
+
+async def _invalidate_available(discord_id: Optional[str], member_ids) -> None:
+    """申込者とメンバー（pair1/pair2）の申込可能大会キャッシュを破棄"""
+    try:
+        discord_ids = [discord_id]
+        for pid in member_ids:
+            member = await player_cache.get_by_player_id(pid) if pid else None
+            if member:
+                discord_ids.append(member.get('discord_id'))
+        invalidate_available_tournaments(discord_ids)
+    except Exception as e:
+        print(f'⚠️ 申込可能大会キャッシュの個別破棄に失敗したため全破棄: {e}')
+        invalidate_available_tournaments()
+
+
+async def _registration_messages(registration: RegistrationCreate) -> tuple:
+    """申込通知（区チャンネルへの Webhook と申込者・メンバーへの DM）の行とログ用の表示名を返す"""
+    try:
+        webhook_url = os.getenv('DISCORD_WEBHOOK_URL', '')
+        if not webhook_url:
+            return [], ''
+
+        # 申込者名を取得
+        applicant = await player_cache.get_by_discord_id(registration.discord_id)
+        applicant_name = applicant['player_name'] if applicant else registration.discord_id
+
+        # 大会名を取得
+        tournament = await db.execute_query('tournament_mst', operation='select', filters={'tournament_id': registration.tournament_id})
+        tournament_name = tournament['data'][0]['tournament_name'] if tournament.get('data') else registration.tournament_id
+        classification = tournament['data'][0].get('classification', 0) if tournament.get('data') else 0
+
+        registrated_ward = tournament['data'][0].get('registrated_ward') if tournament.get('data') else None
+
+        # Webhook送信先を主催区で振り分け（未設定の区は広域チャンネルにフォールバック）
+        target_webhook = get_ward_webhook_url(registrated_ward)
+        if not target_webhook:
+            raise Exception(f'Discord Webhook未設定 (ward_id={registrated_ward})')
+
+        sex_label = '男子' if registration.sex == 0 else '女子'
+
+        if classification == 1 and registration.team_status == 1:
+            # 団体戦（個人参加希望）
+            content = f"🙋 **大会申込（参加希望）**\n**{tournament_name}**\n{registration.type} {sex_label}【団体】\n申込者: {applicant_name}"
+        elif classification == 1:
+            # 団体戦（チーム確定）
+            member_names = []
+            all_ids = ([registration.pair1] if registration.pair1 else []) + (registration.pair2 or [])
+            for pid in all_ids:
+                if pid:
+                    p = await player_cache.get_by_player_id(pid)
+                    if p:
+                        member_names.append(p['player_name'])
+            members_str = '、'.join(member_names) if member_names else ''
+            content = f"📋 **大会申込（チーム）**\n**{tournament_name}**\n{registration.type} {sex_label}【団体】\n申込者: {applicant_name}\n出場者: {members_str}"
+        else:
+            # 個人戦
+            pair_name = ''
+            if registration.pair1:
+                pair = await player_cache.get_by_player_id(registration.pair1)
+                if pair:
+                    pair_name = pair['player_name']
+            if pair_name:
+                content = f"📋 **大会申込**\n**{tournament_name}**\n{registration.type} {sex_label}\n申込者: {applicant_name}\n出場者: {applicant_name}、{pair_name}"
+            else:
+                content = f"📋 **大会申込**\n**{tournament_name}**\n{registration.type} {sex_label}\n申込者: {applicant_name}"
+
+        # 申込者+ペア/メンバーへもDM（チャンネルと同じ内容）
+        dm_targets = set()
+        if registration.discord_id:
+            dm_targets.add(registration.discord_id)
+
+        # ペア/メンバーのdiscord_idを取得
+        member_player_ids = []
+        if classification == 1:
+            member_player_ids = ([registration.pair1] if registration.pair1 else []) + (registration.pair2 or [])
+        elif registration.pair1:
+            member_player_ids = [registration.pair1]
+
+        for pid in member_player_ids:
+            if pid:
+                p = await player_cache.get_by_player_id(pid)
+                if p and p.get('discord_id'):
+                    dm_targets.add(p['discord_id'])
+
+        messages = [webhook_message(target_webhook, {'content': content}, 'registration')]
+        messages += [dm_message(target_id, content, 'registration') for target_id in dm_targets]
+        return messages, f'{tournament_name} / {applicant_name}'
+    except Exception as e:
+        print(f'⚠️ 申込通知の作成失敗（申込自体は続行）: {e}')
+        return [], ''
+
+
 @router.post("/registrations")
 async def create_registration(registration: RegistrationCreate):
     """新規申込を登録"""
     try:
         data = registration.model_dump()
-        result = await db.execute_query(
-            'tournament_registration',
-            operation='insert',
-            data=data
-        )
-
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
+        messages, label = await _registration_messages(registration)
+        # 申込・メンバー行（registration_member）・通知を同じトランザクションで登録
+        # （通知の登録に失敗したら申込もロールバックし、申込が無いのに通知だけ送られることもない）
+        async with db.transaction() as tx:
+            result = await tx.execute_query(
+                'tournament_registration',
+                operation='insert',
+                data=data
+            )
+            await replace_members(tx, result['data'][0]['id'], registration.pair1, registration.pair2)
+            queued = await enqueue_in(tx, messages)
+        if queued:
+            # 送信は通知アウトボックスのディスパッチャが行う（Discordの応答を待たずに返す）
+            dispatcher.wake()
+            print(f'📨 申込通知を登録: {label}（{queued}件）')
+        await _invalidate_available(registration.discord_id, [registration.pair1] + (registration.pair2 or []))
 
         # パターンA（チーム確定）の場合、メンバーのパターンB（参加希望）レコードを削除
         if registration.team_status == 0 and registration.pair2:
@@ -50,13 +164,9 @@ async def create_registration(registration: RegistrationCreate):
                 if member_id is None:
                     continue
                 # player_idからdiscord_idを取得
-                player_result = await db.execute_query(
-                    'player_mst',
-                    operation='select',
-                    filters={'player_id': member_id}
-                )
-                if player_result.get('data'):
-                    member_discord_id = player_result['data'][0].get('discord_id')
+                member = await player_cache.get_by_player_id(member_id)
+                if member:
+                    member_discord_id = member.get('discord_id')
                     if member_discord_id:
                         # その人のこの大会の参加希望(team_status=1)を削除
                         existing = await db.execute_query(
@@ -71,117 +181,7 @@ async def create_registration(registration: RegistrationCreate):
                             for reg in existing['data']:
                                 # 同一種別の参加希望のみ削除（他種別の希望は残す）
                                 if reg.get('team_status') == 1 and reg.get('type') == registration.type:
-                                    await db.execute_query(
-                                        'tournament_registration',
-                                        operation='delete',
-                                        filters={'registration_id': reg['registration_id']}
-                                    )
-
-        # Discord Webhook通知
-        try:
-            webhook_url = os.getenv('DISCORD_WEBHOOK_URL', '')
-            if webhook_url:
-                # 申込者名を取得
-                applicant = await db.execute_query('player_mst', operation='select', filters={'discord_id': registration.discord_id})
-                applicant_name = applicant['data'][0]['player_name'] if applicant.get('data') else registration.discord_id
-
-                # 大会名を取得
-                tournament = await db.execute_query('tournament_mst', operation='select', filters={'tournament_id': registration.tournament_id})
-                tournament_name = tournament['data'][0]['tournament_name'] if tournament.get('data') else registration.tournament_id
-                classification = tournament['data'][0].get('classification', 0) if tournament.get('data') else 0
-
-                registrated_ward = tournament['data'][0].get('registrated_ward') if tournament.get('data') else None
-
-                # Webhook送信先を主催区で振り分け（未設定の区は広域チャンネルにフォールバック）
-                target_webhook = get_ward_webhook_url(registrated_ward)
-                if not target_webhook:
-                    raise Exception(f'Discord Webhook未設定 (ward_id={registrated_ward})')
-
-                sex_label = '男子' if registration.sex == 0 else '女子'
-
-                if classification == 1 and registration.team_status == 1:
-                    # 団体戦（個人参加希望）
-                    content = f"🙋 **大会申込（参加希望）**\n**{tournament_name}**\n{registration.type} {sex_label}【団体】\n申込者: {applicant_name}"
-                elif classification == 1:
-                    # 団体戦（チーム確定）
-                    member_names = []
-                    all_ids = ([registration.pair1] if registration.pair1 else []) + (registration.pair2 or [])
-                    for pid in all_ids:
-                        if pid:
-                            p = await db.execute_query('player_mst', operation='select', filters={'player_id': pid})
-                            if p.get('data'):
-                                member_names.append(p['data'][0]['player_name'])
-                    members_str = '、'.join(member_names) if member_names else ''
-                    content = f"📋 **大会申込（チーム）**\n**{tournament_name}**\n{registration.type} {sex_label}【団体】\n申込者: {applicant_name}\n出場者: {members_str}"
-                else:
-                    # 個人戦
-                    pair_name = ''
-                    if registration.pair1:
-                        pair = await db.execute_query('player_mst', operation='select', filters={'player_id': registration.pair1})
-                        if pair.get('data'):
-                            pair_name = pair['data'][0]['player_name']
-                    if pair_name:
-                        content = f"📋 **大会申込**\n**{tournament_name}**\n{registration.type} {sex_label}\n申込者: {applicant_name}\n出場者: {applicant_name}、{pair_name}"
-                    else:
-                        content = f"📋 **大会申込**\n**{tournament_name}**\n{registration.type} {sex_label}\n申込者: {applicant_name}"
-
-                async with httpx.AsyncClient() as client:
-                    await client.post(target_webhook, json={'content': content}, timeout=5.0)
-                print(f'✅ 申込通知送信: {tournament_name} / {applicant_name}')
-
-                # 申込者+ペア/メンバーへDM送信（チャンネルと同じ内容）
-                bot_token = os.getenv('DISCORD_BOT_TOKEN', '')
-                if bot_token:
-                    # DM送信先のdiscord_idを収集
-                    dm_targets = set()
-                    if registration.discord_id:
-                        dm_targets.add(registration.discord_id)
-
-                    # ペア/メンバーのdiscord_idを取得
-                    member_player_ids = []
-                    if classification == 1:
-                        member_player_ids = ([registration.pair1] if registration.pair1 else []) + (registration.pair2 or [])
-                    elif registration.pair1:
-                        member_player_ids = [registration.pair1]
-
-                    for pid in member_player_ids:
-                        if pid:
-                            p_result = await db.execute_query('player_mst', operation='select', filters={'player_id': pid})
-                            if p_result.get('data') and p_result['data'][0].get('discord_id'):
-                                dm_targets.add(p_result['data'][0]['discord_id'])
-
-                    headers = {
-                        'Authorization': f'Bot {bot_token}',
-                        'Content-Type': 'application/json',
-                    }
-                    for target_id in dm_targets:
-                        try:
-                            async with httpx.AsyncClient() as client:
-                                dm_ch = await client.post(
-                                    'https://discord.com/api/v10/users/@me/channels',
-                                    headers=headers,
-                                    json={'recipient_id': target_id},
-                                    timeout=5.0,
-                                )
-                                if dm_ch.status_code == 200:
-                                    channel_id = dm_ch.json()['id']
-                                    msg_res = await client.post(
-                                        f'https://discord.com/api/v10/channels/{channel_id}/messages',
-                                        headers=headers,
-                                        json={'content': content},
-                                        timeout=5.0,
-                                    )
-                                    if msg_res.status_code in (200, 201):
-                                        print(f'✅ DM送信成功: {target_id}')
-                                    else:
-                                        print(f'⚠️ DM本文送信失敗: {target_id} / {msg_res.status_code} {msg_res.text[:120]}')
-                                else:
-                                    print(f'⚠️ DMチャンネル作成失敗: {target_id} / {dm_ch.status_code}')
-                        except Exception as dm_e:
-                            print(f'⚠️ DM送信失敗（申込自体は成功）: {target_id} / {dm_e}')
-
-        except Exception as e:
-            print(f'⚠️ 申込通知送信失敗（申込自体は成功）: {e}')
+                                    await _delete_registration(reg['registration_id'])
 
         return result.get('data', [{}])[0]
     except Exception as e:
@@ -207,28 +207,15 @@ async def get_user_registrations(discord_id: str):
         for r in own_regs:
             r['is_applicant'] = True
 
-        # 自分のplayer_idを取得してペアとしての申込を検索
-        player_result = await db.execute_query(
-            'player_mst',
-            operation='select',
-            filters={'discord_id': discord_id}
-        )
-        player_data = player_result.get('data', [])
+        # 自分のplayer_idを取得してペア・団体戦メンバーとしての申込を検索
+        player = await player_cache.get_by_discord_id(discord_id)
 
         pair_regs = []
-        if player_data:
-            player_id = player_data[0]['player_id']
-            pair_result = await db.execute_query(
-                'tournament_registration',
-                operation='select',
-                filters={'pair1': player_id},
-                json_fields=['pair2']
-            )
-            if pair_result.get('data'):
-                for r in pair_result['data']:
-                    if r['registration_id'] not in own_ids:
-                        r['is_applicant'] = False
-                        pair_regs.append(r)
+        if player:
+            for r in await registrations_of_player(player['player_id']):
+                if r['registration_id'] not in own_ids:
+                    r['is_applicant'] = False
+                    pair_regs.append(r)
 
         return own_regs + pair_regs
     except Exception as e:
@@ -252,14 +239,13 @@ async def delete_registration(registration_id: int):
         raise HTTPException(status_code=404, detail="申込が見つかりません")
 
     # 削除
-    delete_result = await db.execute_query(
-        'tournament_registration',
-        operation='delete',
-        filters={'registration_id': registration_id}
-    )
+    try:
+        await _delete_registration(registration_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-    if delete_result.get('error'):
-        raise HTTPException(status_code=500, detail=delete_result['error'])
+    deleted = result['data'][0]
+    await _invalidate_available(deleted.get('discord_id'), [deleted.get('pair1')] + (deleted.get('pair2') or []))
 
     return {"success": True, "message": "申込をキャンセルしました"}
 
@@ -299,14 +285,18 @@ async def update_pair(registration_id: int, request: PairUpdateRequest):
                 raise HTTPException(status_code=400, detail="締切日を過ぎているため変更できません")
 
     # ペア更新
-    update_result = await db.execute_query(
-        'tournament_registration',
-        operation='update',
-        filters={'registration_id': registration_id},
-        data={'pair1': request.pair1}
-    )
-    if update_result.get('error'):
-        raise HTTPException(status_code=500, detail=update_result['error'])
+    try:
+        async with db.transaction() as tx:
+            await tx.execute_query(
+                'tournament_registration',
+                operation='update',
+                filters={'registration_id': registration_id},
+                data={'pair1': request.pair1}
+            )
+            await replace_members(tx, registration_id, request.pair1, registration.get('pair2'))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    await _invalidate_available(registration.get('discord_id'), [registration.get('pair1'), request.pair1])
 
     return {"success": True, "message": "ペアを変更しました"}
 
@@ -347,26 +337,29 @@ async def update_team(registration_id: int, request: TeamUpdateRequest):
                 raise HTTPException(status_code=400, detail="締切日を過ぎているため変更できません")
 
     # チームメンバー更新（確定状態に正規化＝参加希望フラグを解除）
-    update_result = await db.execute_query(
-        'tournament_registration',
-        operation='update',
-        filters={'registration_id': registration_id},
-        data={'pair1': request.pair1, 'pair2': request.pair2, 'team_status': 0}
+    try:
+        async with db.transaction() as tx:
+            await tx.execute_query(
+                'tournament_registration',
+                operation='update',
+                filters={'registration_id': registration_id},
+                data={'pair1': request.pair1, 'pair2': request.pair2, 'team_status': 0}
+            )
+            await replace_members(tx, registration_id, request.pair1, request.pair2)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    await _invalidate_available(
+        registration.get('discord_id'),
+        [registration.get('pair1'), request.pair1] + (registration.get('pair2') or []) + request.pair2
     )
-    if update_result.get('error'):
-        raise HTTPException(status_code=500, detail=update_result['error'])
 
     # 新メンバーの参加希望レコードを削除（同一種別のみ）
     reg_type = registration.get('type')
     all_member_ids = [request.pair1] + request.pair2
     for member_id in all_member_ids:
-        player_result = await db.execute_query(
-            'player_mst',
-            operation='select',
-            filters={'player_id': member_id}
-        )
-        if player_result.get('data'):
-            member_discord_id = player_result['data'][0].get('discord_id')
+        member = await player_cache.get_by_player_id(member_id)
+        if member:
+            member_discord_id = member.get('discord_id')
             if member_discord_id:
                 existing = await db.execute_query(
                     'tournament_registration',
@@ -379,64 +372,85 @@ async def update_team(registration_id: int, request: TeamUpdateRequest):
                 if existing.get('data'):
                     for reg in existing['data']:
                         if reg.get('team_status') == 1 and reg.get('type') == reg_type:
-                            await db.execute_query(
-                                'tournament_registration',
-                                operation='delete',
-                                filters={'registration_id': reg['registration_id']}
-                            )
+                            await _delete_registration(reg['registration_id'])
 
     return {"success": True, "message": "チームメンバーを変更しました"}
 
 
-@router.get("/registrations/tournament/{tournament_id}")
-async def get_tournament_registrations(tournament_id: str):
-    """大会の申込一覧を取得（選手情報付き）"""
-    try:
-        result = await db.execute_query(
-            'tournament_registration',
-            operation='select',
-            filters={'tournament_id': tournament_id},
-            json_fields=['pair2']
-        )
+# 申込一覧で fields に指定できる項目
+REGISTRATION_COLUMNS = (
+    'registration_id', 'discord_id', 'tournament_id', 'type', 'sex', 'pair1', 'pair2',
+    'submitted_at', 'updated_at', 'team_status',
+)
+REGISTRATION_NAME_FIELDS = ('applicant_name', 'pair_name', 'member_names')
 
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
 
-        registrations = result.get('data', [])
-
-        enriched = []
-        for reg in registrations:
-            # 申込者の選手情報を取得
-            applicant_result = await db.execute_query(
-                'player_mst',
-                operation='select',
-                filters={'discord_id': reg['discord_id']}
-            )
-            applicant_data = applicant_result.get('data', [])
-            reg['applicant_name'] = applicant_data[0]['player_name'] if applicant_data else None
-
-            # ペアの選手情報を取得
-            pair_result = await db.execute_query(
-                'player_mst',
-                operation='select',
-                filters={'player_id': reg['pair1']}
-            )
-            pair_data = pair_result.get('data', [])
-            reg['pair_name'] = pair_data[0]['player_name'] if pair_data else None
-
-            # 団体戦メンバー名を取得
-            member_names = []
-            all_member_ids = ([reg['pair1']] if reg.get('pair1') else []) + (reg.get('pair2') or [])
-            for mid in all_member_ids:
-                if mid:
-                    m_result = await db.execute_query('player_mst', operation='select', filters={'player_id': mid})
-                    if m_result.get('data'):
-                        member_names.append(m_result['data'][0]['player_name'])
-            reg['member_names'] = member_names
-
-            enriched.append(reg)
+@router.get("/registrations/tournament/{tournament_id}")
+async def get_tournament_registrations(
+    tournament_id: str,
+    fields: Optional[List[str]] = Query(None),
+    limit: Optional[int] = None,
+    after_id: Optional[int] = None,
+):
+    """大会の申込一覧を取得（選手情報付き）
+
+    申込者名・ペア名は JOIN で、団体戦メンバー名は registration_member からまとめて取得する
+    （申込件数によらずクエリ2本）。
+
+    Args:
+        fields: 返す項目（?fields=type&fields=applicant_name。省略時は全項目。
+            registration_id は常に含める）
+        limit: 最大件数（省略時は全件）
+        after_id: ページング用。前回受け取った最後の registration_id を渡すと続きを返す
+    """
+    try:
+        wanted = set(fields) if fields else set(REGISTRATION_COLUMNS + REGISTRATION_NAME_FIELDS)
+        unknown = wanted - set(REGISTRATION_COLUMNS + REGISTRATION_NAME_FIELDS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"不明な項目: {', '.join(sorted(unknown))}")
+
+        columns = ['r.registration_id'] + [
+            f"r.{c}" for c in REGISTRATION_COLUMNS if c in wanted and c != 'registration_id'
+        ]
+        joins = ''
+        if 'applicant_name' in wanted:
+            columns.append('a.player_name AS applicant_name')
+            joins += ' LEFT JOIN player_mst a ON a.discord_id = r.discord_id'
+        if 'pair_name' in wanted:
+            columns.append('p.player_name AS pair_name')
+            joins += ' LEFT JOIN player_mst p ON p.player_id = r.pair1'
+
+        sql = f"SELECT {', '.join(columns)} FROM tournament_registration r{joins} WHERE r.tournament_id = %s"
+        params: list = [tournament_id]
+        if after_id is not None:
+            sql += " AND r.registration_id > %s"
+            params.append(after_id)
+        sql += " ORDER BY r.registration_id"
+        if limit is not None:
+            sql += " LIMIT %s"
+            params.append(max(1, min(limit, 1000)))
+
+        registrations = await db.fetchall(sql, params, json_fields=['pair2'])
+
+        # 団体戦メンバー名（pair1 → pair2 の並び順）
+        if 'member_names' in wanted:
+            for reg in registrations:
+                reg['member_names'] = []
+            if registrations:
+                by_id = {reg['registration_id']: reg for reg in registrations}
+                ids = list(by_id)
+                rows = await db.fetchall(
+                    "SELECT m.registration_id, p.player_name FROM registration_member m"
+                    " JOIN player_mst p ON p.player_id = m.player_id"
+                    f" WHERE m.registration_id IN ({', '.join(['%s'] * len(ids))})"
+                    " ORDER BY m.registration_id, m.role, m.position",
+                    ids
+                )
+                for row in rows:
+                    by_id[row['registration_id']]['member_names'].append(row['player_name'])
 
-        return enriched
+        return FastJSONResponse(registrations)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
-
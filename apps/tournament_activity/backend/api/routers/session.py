@@ -3,14 +3,12 @@
 """
 セッション管理ルーター
 
-Discord IDをSupabaseに保存
+Discord IDを sessions テーブルに保存（api/session_store.py）
 """
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import uuid
-from datetime import datetime
-from api.database import db
+from api.session_store import session_store
 
 router = APIRouter()
 
@@ -23,34 +21,17 @@ class SessionCreate(BaseModel):
 @router.post("/session")
 async def create_session(session: SessionCreate):
     """
-    セッションを作成（Supabaseに保存）
+    セッションを作成（SESSION_TTL_HOURS 後に期限切れ）
     
     Returns:
         session_id: セッションID
     """
-    session_id = str(uuid.uuid4())
-    
-    # MariaDBに保存
     try:
-        result = await db.execute_query(
-            'sessions',
-            operation='insert',
-            data={
-                'session_id': session_id,
-                'discord_id': session.discord_id,
-                'username': session.username,
-                'created_at': datetime.now().isoformat()
-            }
-        )
-
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
+        session_id = await session_store.create(session.discord_id, session.username)
 
         print(f'セッション作成: {session_id} for {session.discord_id}')
 
         return {'session_id': session_id}
-    except HTTPException:
-        raise
     except Exception as e:
         print(f'セッション作成エラー: {e}')
         raise HTTPException(status_code=500, detail=str(e))
@@ -59,30 +40,16 @@ async def create_session(session: SessionCreate):
 @router.get("/session/{session_id}")
 async def get_session(session_id: str):
     """
-    セッション情報を取得
+    セッション情報を取得（取得済みのセッションはキャッシュから返す）
     
     Returns:
         discord_id, username
     """
     try:
-        result = await db.execute_query(
-            'sessions',
-            operation='select',
-            filters={'session_id': session_id}
-        )
-
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
-
-        data = result.get('data', [])
-        if not data:
-            print(f'セッション未発見: {session_id}')
+        session_data = await session_store.get(session_id)
+        if session_data is None:
             raise HTTPException(status_code=404, detail="Session not found")
 
-        session_data = data[0]
-
-        print(f'セッション取得成功: {session_id}')
-
         return {
             'discord_id': session_data['discord_id'],
             'username': session_data['username']
@@ -92,4 +59,3 @@ async def get_session(session_id: str):
     except Exception as e:
         print(f'セッション取得エラー: {e}')
         raise HTTPException(status_code=500, detail=str(e))
-
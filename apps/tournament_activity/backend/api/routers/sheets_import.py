@@ -172,109 +172,113 @@ async def import_from_sheets():
         created_count = 0
         updated_count = 0
         details = []
+        reservation_rows = []
+        # 時間延長の通知はコミット後に送る（ロールバック時に誤通知しないため）
+        extended_notifications = []
+
+        from api.routers.practice import _normalize_time, _notify_practice_time_extended
+
+        # 3〜4 の更新は1トランザクションで行い、途中失敗時は予約の削除も含めて取り消す
+        async with db.transaction() as tx:
+            for key, schedule in schedule_map.items():
+                practice_date = schedule['practice_date']
+                location = schedule['location']
+
+                # 3. 既存の練習日程を検索（同時取り込みと競合しないよう行ロック）
+                existing = await tx.execute_query(
+                    'practice_schedule', operation='select',
+                    filters={'practice_date': practice_date, 'location': location},
+                    for_update=True
+                )
+
+                if existing.get('data'):
+                    # 既存あり → 開始/終了時刻と予約情報を更新
+                    row = existing['data'][0]
+                    practice_id = row['id']
+                    action = '更新'
+
+                    # 既存の時刻を 'HH:MM' に正規化して比較
+                    old_start = _normalize_time(row.get('start_time'))
+                    old_end = _normalize_time(row.get('end_time'))
+                    new_start = schedule['earliest_start']
+                    new_end = schedule['latest_end']
+
+                    update_fields: dict = {}
+                    if old_start != new_start:
+                        update_fields['start_time'] = new_start
+                    if old_end != new_end:
+                        update_fields['end_time'] = new_end
+                    # 期限が未設定なら開催日の5日前 21:00 に設定
+                    if not row.get('deadline_date'):
+                        p_date = datetime.strptime(practice_date, '%Y-%m-%d').date()
+                        deadline_dt = datetime.combine(p_date - timedelta(days=5), datetime.min.time()).replace(hour=21)
+                        update_fields['deadline_date'] = deadline_dt.strftime('%Y-%m-%d %H:%M:%S')
+
+                    if update_fields:
+                        await tx.execute_query(
+                            'practice_schedule', operation='update',
+                            filters={'id': practice_id},
+                            data=update_fields
+                        )
 
-        for key, schedule in schedule_map.items():
-            practice_date = schedule['practice_date']
-            location = schedule['location']
-
-            # 3. 既存の練習日程を検索
-            existing = await db.execute_query(
-                'practice_schedule', operation='select',
-                filters={'practice_date': practice_date, 'location': location}
-            )
-
-            if existing.get('data'):
-                # 既存あり → 開始/終了時刻と予約情報を更新
-                row = existing['data'][0]
-                practice_id = row['id']
-                action = '更新'
-
-                # 既存の時刻を 'HH:MM' に正規化して比較
-                from api.routers.practice import _normalize_time, _notify_practice_time_extended
-                old_start = _normalize_time(row.get('start_time'))
-                old_end = _normalize_time(row.get('end_time'))
-                new_start = schedule['earliest_start']
-                new_end = schedule['latest_end']
-
-                update_fields: dict = {}
-                if old_start != new_start:
-                    update_fields['start_time'] = new_start
-                if old_end != new_end:
-                    update_fields['end_time'] = new_end
-                # 期限が未設定なら開催日の5日前 21:00 に設定
-                if not row.get('deadline_date'):
+                    # 練習時間が延長された場合のみDiscord通知
+                    if ('start_time' in update_fields or 'end_time' in update_fields) and old_start and old_end:
+                        extended_notifications.append((practice_date, old_start, old_end, new_start, new_end))
+                else:
+                    # 新規作成: 申込期限は開催日の5日前 21:00
                     p_date = datetime.strptime(practice_date, '%Y-%m-%d').date()
                     deadline_dt = datetime.combine(p_date - timedelta(days=5), datetime.min.time()).replace(hour=21)
-                    update_fields['deadline_date'] = deadline_dt.strftime('%Y-%m-%d %H:%M:%S')
-
-                if update_fields:
-                    await db.execute_query(
-                        'practice_schedule', operation='update',
-                        filters={'id': practice_id},
-                        data=update_fields
+                    deadline_str = deadline_dt.strftime('%Y-%m-%d %H:%M:%S')
+                    result = await tx.execute_query(
+                        'practice_schedule', operation='insert',
+                        data={
+                            'practice_date': practice_date,
+                            'start_time': schedule['earliest_start'],
+                            'end_time': schedule['latest_end'],
+                            'location': location,
+                            'deadline_date': deadline_str,
+                        }
                     )
-
-                # 練習時間が延長された場合のみDiscord通知
-                if ('start_time' in update_fields or 'end_time' in update_fields) and old_start and old_end:
-                    try:
-                        await _notify_practice_time_extended(
-                            practice_date, old_start, old_end, new_start, new_end
+                    practice_id = result['data'][0].get('id')
+                    # insertの返り値からIDを取得できなければ再検索
+                    if not practice_id:
+                        sel = await tx.execute_query(
+                            'practice_schedule', operation='select',
+                            filters={'practice_date': practice_date, 'location': location}
                         )
-                    except Exception as e:
-                        print(f'⚠️ 取り込み通知エラー: {e}')
-            else:
-                # 新規作成: 申込期限は開催日の5日前 21:00
-                p_date = datetime.strptime(practice_date, '%Y-%m-%d').date()
-                deadline_dt = datetime.combine(p_date - timedelta(days=5), datetime.min.time()).replace(hour=21)
-                deadline_str = deadline_dt.strftime('%Y-%m-%d %H:%M:%S')
-                result = await db.execute_query(
-                    'practice_schedule', operation='insert',
-                    data={
-                        'practice_date': practice_date,
-                        'start_time': schedule['earliest_start'],
-                        'end_time': schedule['latest_end'],
-                        'location': location,
-                        'deadline_date': deadline_str,
-                    }
+                        if sel.get('data'):
+                            practice_id = sel['data'][0]['id']
+                        else:
+                            details.append(f"❌ {practice_date} {location}: ID取得失敗")
+                            continue
+                    created_count += 1
+                    action = '新規'
+
+                # 4. 既存のコート予約を削除してスプレッドシートの内容で置き換え
+                await tx.execute_query(
+                    'practice_court_reservations', operation='delete',
+                    filters={'practice_id': practice_id}
                 )
-                if result.get('error'):
-                    details.append(f"❌ {practice_date} {location}: 作成失敗")
-                    continue
-                practice_id = result['data'][0].get('id') or result['data'][0].get('player_id')
-                # insertの返り値からIDを取得
-                if not practice_id:
-                    sel = await db.execute_query(
-                        'practice_schedule', operation='select',
-                        filters={'practice_date': practice_date, 'location': location}
-                    )
-                    if sel.get('data'):
-                        practice_id = sel['data'][0]['id']
-                    else:
-                        details.append(f"❌ {practice_date} {location}: ID取得失敗")
-                        continue
-                created_count += 1
-                action = '新規'
-
-            # 4. 既存のコート予約を削除してスプレッドシートの内容で置き換え
-            await db.execute_query(
-                'practice_court_reservations', operation='delete',
-                filters={'practice_id': practice_id}
-            )
-
-            # 時間順にソートして登録
-            sorted_reservations = sorted(schedule['reservations'], key=lambda r: (r['start_time'], r['end_time']))
-            for res in sorted_reservations:
-                await db.execute_query(
-                    'practice_court_reservations', operation='insert',
-                    data={
+
+                # 時間順にソートして登録（最後に全練習分をまとめて一括INSERT）
+                sorted_reservations = sorted(schedule['reservations'], key=lambda r: (r['start_time'], r['end_time']))
+                for res in sorted_reservations:
+                    reservation_rows.append({
                         'practice_id': practice_id,
                         'start_time': res['start_time'],
                         'end_time': res['end_time'],
                         'reserver_name': res['reserver_name'],
-                    }
-                )
-            updated_count += len(schedule['reservations'])
-            details.append(f"✅ [{action}] {practice_date} {location}: {len(schedule['reservations'])}件の予約")
+                    })
+                updated_count += len(schedule['reservations'])
+                details.append(f"✅ [{action}] {practice_date} {location}: {len(schedule['reservations'])}件の予約")
+
+            await tx.bulk_insert('practice_court_reservations', reservation_rows)
+
+        for args in extended_notifications:
+            try:
+                await _notify_practice_time_extended(*args)
+            except Exception as e:
+                print(f'⚠️ 取り込み通知エラー: {e}')
 
         return {
             "success": True,
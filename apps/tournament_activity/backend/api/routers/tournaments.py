@@ -6,12 +6,14 @@
 大会マスタの操作
 """
 
-from fastapi import APIRouter, HTTPException, UploadFile, File
+from fastapi import APIRouter, HTTPException, UploadFile, File, Query
 from fastapi.responses import FileResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Dict, Tuple
 from datetime import date, datetime
 from api.database import db
+from api.json_codec import FastJSONResponse
+from api.routers.available_tournaments import invalidate_available_tournaments
 import json
 import os
 import re
@@ -172,45 +174,92 @@ class TournamentRegisterRequest(BaseModel):
 
 
 @router.get("/tournaments")
-async def get_tournaments():
-    """全大会を取得（申込数付き）"""
-    try:
-        result = await db.execute_query('tournament_mst', operation='select', json_fields=['type'])
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
-
-        tournaments = result.get('data', [])
-
-        # 各大会の申込数を取得
-        reg_result = await db.execute_query('tournament_registration', operation='select')
-        reg_data = reg_result.get('data', [])
+async def get_tournaments(
+    ward: Optional[int] = None,
+    classification: Optional[int] = None,
+    upcoming: bool = False,
+    ids: Optional[List[str]] = Query(None),
+):
+    """大会を取得（申込数付き）
 
-        # tournament_idごとの申込数をカウント
-        count_map: dict = {}
-        for r in reg_data:
-            tid = r.get('tournament_id')
-            if tid:
-                count_map[tid] = count_map.get(tid, 0) + 1
+    絞り込み（指定したものだけ適用。無指定なら全大会）:
+        ward: 主催区ID（registrated_ward）
+        classification: 種別（0/1/2）
+        upcoming: true なら開催日が今日以降の大会のみ
+        ids: 大会IDのリスト（?ids=A&ids=B）
+    """
+    try:
+        where = []
+        params: list = []
+        if ward is not None:
+            where.append("t.registrated_ward = %s")
+            params.append(ward)
+        if classification is not None:
+            where.append("t.classification = %s")
+            params.append(classification)
+        if upcoming:
+            where.append("t.tournament_date >= %s")
+            params.append(date.today())
+        if ids:
+            where.append(f"t.tournament_id IN ({', '.join(['%s'] * len(ids))})")
+            params.extend(ids)
+
+        # 申込数は大会ごとにインデックス（idx_registration_tournament_id）で数える
+        sql = (
+            "SELECT t.*, (SELECT COUNT(*) FROM tournament_registration r"
+            " WHERE r.tournament_id = t.tournament_id) AS entry_count"
+            " FROM tournament_mst t"
+        )
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        tournaments = await db.fetchall(sql, params, json_fields=['type'])
 
+        # 要項ファイルの実在チェック
+        guidelines = _guideline_index()
         for t in tournaments:
-            t['entry_count'] = count_map.get(t['tournament_id'], 0)
-            # 要項ファイルの実在チェック
-            t['has_guideline'] = _guideline_exists(t['tournament_id'])
+            t['has_guideline'] = _safe_guideline_id(t['tournament_id']) in guidelines
 
-        return tournaments
+        # 件数が多いので jsonable_encoder を通さずに直接JSON化する
+        return FastJSONResponse(tournaments)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-def _guideline_exists(tournament_id: str) -> bool:
-    """要項ファイルが実際に存在するかチェック"""
-    if not tournament_id:
-        return False
-    safe_id = re.sub(r'[^\w\-]', '_', tournament_id)
-    for ext in ('.pdf', '.jpg', '.jpeg', '.png', '.xlsx', '.xls'):
-        if os.path.exists(os.path.join(UPLOAD_DIR, f"{safe_id}{ext}")):
-            return True
-    return False
+GUIDELINE_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png', '.xlsx', '.xls')
+
+# 要項ファイルの索引（ディレクトリの更新時刻, {safe_id: ファイル名}）
+_guideline_cache: Tuple[int, Dict[str, str]] = (-1, {})
+
+
+def _safe_guideline_id(tournament_id: str) -> str:
+    """大会IDを要項ファイル名に使える形にする"""
+    return re.sub(r'[^\w\-]', '_', tournament_id or '')
+
+
+def _guideline_index() -> Dict[str, str]:
+    """
+    要項ファイルの索引 {safe_id: ファイル名}
+
+    大会ごとに拡張子の数だけ os.path.exists を呼ぶ代わりに、ディレクトリを1回走査して
+    キャッシュする。ファイルの追加・削除でディレクトリの更新時刻が変わるので、
+    別ワーカーが保存した場合も次の呼び出しで作り直される。
+    同じ大会に複数の拡張子がある場合は GUIDELINE_EXTENSIONS の順で先のものを使う。
+    """
+    global _guideline_cache
+    mtime = os.stat(UPLOAD_DIR).st_mtime_ns
+    if _guideline_cache[0] != mtime:
+        index: Dict[str, str] = {}
+        rank: Dict[str, int] = {}
+        with os.scandir(UPLOAD_DIR) as entries:
+            for entry in entries:
+                stem, ext = os.path.splitext(entry.name)
+                if ext in GUIDELINE_EXTENSIONS and entry.is_file():
+                    order = GUIDELINE_EXTENSIONS.index(ext)
+                    if order < rank.get(stem, len(GUIDELINE_EXTENSIONS)):
+                        index[stem] = entry.name
+                        rank[stem] = order
+        _guideline_cache = (mtime, index)
+    return _guideline_cache[1]
 
 
 @router.get("/tournaments/{tournament_id}")
@@ -303,6 +352,7 @@ async def register_tournament(request: TournamentRegisterRequest):
 
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
+        invalidate_available_tournaments()
 
         # 監査ログ: 大会の登録/更新を前後差分で記録
         try:
@@ -450,6 +500,7 @@ async def update_tournament(tournament_id: str, request: TournamentUpdate):
 
         if result.get('error'):
             raise HTTPException(status_code=500, detail=result['error'])
+        invalidate_available_tournaments()
 
         # 更新後のデータを取得して返す
         updated = await db.execute_query(
@@ -470,28 +521,25 @@ async def update_tournament(tournament_id: str, request: TournamentUpdate):
 async def delete_tournament(tournament_id: str):
     """大会を削除"""
     try:
-        # 大会の存在確認（監査ログ用に全カラム取得）
-        existing = await db.execute_query(
-            'tournament_mst',
-            operation='select',
-            filters={'tournament_id': tournament_id},
-        )
-
-        if existing.get('error'):
-            raise HTTPException(status_code=500, detail=existing['error'])
-
-        if not existing.get('data'):
-            raise HTTPException(status_code=404, detail="大会が見つかりません")
+        # 存在確認と削除を1トランザクションで行う（確認後に他リクエストが更新しても
+        # 監査ログのスナップショットと削除内容がずれないよう行ロックする）
+        async with db.transaction() as tx:
+            existing = await tx.execute_query(
+                'tournament_mst',
+                operation='select',
+                filters={'tournament_id': tournament_id},
+                for_update=True
+            )
 
-        # 削除
-        result = await db.execute_query(
-            'tournament_mst',
-            operation='delete',
-            filters={'tournament_id': tournament_id}
-        )
+            if not existing.get('data'):
+                raise HTTPException(status_code=404, detail="大会が見つかりません")
 
-        if result.get('error'):
-            raise HTTPException(status_code=500, detail=result['error'])
+            await tx.execute_query(
+                'tournament_mst',
+                operation='delete',
+                filters={'tournament_id': tournament_id}
+            )
+        invalidate_available_tournaments()
 
         # 監査ログ: 削除前のスナップショットを記録
         try:
@@ -519,11 +567,11 @@ class GuidelineBase64Request(BaseModel):
 
 def _save_guideline(tournament_id: str, content: bytes, original_filename: Optional[str] = None) -> str:
     """要項ファイルを保存して相対パスを返す"""
-    safe_id = re.sub(r'[^\w\-]', '_', tournament_id)
+    safe_id = _safe_guideline_id(tournament_id)
     ext = '.pdf'
     if original_filename:
         _, file_ext = os.path.splitext(original_filename.lower())
-        if file_ext in ('.pdf', '.jpg', '.jpeg', '.png', '.xlsx', '.xls'):
+        if file_ext in GUIDELINE_EXTENSIONS:
             ext = file_ext
     filename = f"{safe_id}{ext}"
     filepath = os.path.join(UPLOAD_DIR, filename)
@@ -569,17 +617,10 @@ async def upload_guideline_base64(tournament_id: str, request: GuidelineBase64Re
 async def get_guideline(tournament_id: str):
     """大会要項ファイルを取得"""
     try:
-        safe_id = re.sub(r'[^\w\-]', '_', tournament_id)
-        # 拡張子を探す
-        filepath = None
-        for ext in ('.pdf', '.jpg', '.jpeg', '.png', '.xlsx', '.xls'):
-            candidate = os.path.join(UPLOAD_DIR, f"{safe_id}{ext}")
-            if os.path.exists(candidate):
-                filepath = candidate
-                break
-
-        if not filepath:
+        filename = _guideline_index().get(_safe_guideline_id(tournament_id))
+        if not filename:
             raise HTTPException(status_code=404, detail="要項ファイルが見つかりません")
+        filepath = os.path.join(UPLOAD_DIR, filename)
 
         import mimetypes
         mime = mimetypes.guess_type(filepath)[0] or 'application/octet-stream'
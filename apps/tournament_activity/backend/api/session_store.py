@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+セッションの保存・取得（sessions テーブル + プロセス内キャッシュ）
+
+セッションは作成後に書き換わらないため、取得したものはプロセス内に LRU + TTL で保持し、
+同じ session_id の取得は DB を引かずに返す（作成したセッションも最初から載せる）。
+期限（expires_at）を過ぎたセッションは返さず、スイーパーが SESSION_SWEEP_INTERVAL 秒ごとに
+SESSION_SWEEP_BATCH 件ずつ削除する。
+
+環境変数:
+    SESSION_TTL_HOURS: セッションの有効時間（既定 168 = 7日）
+    SESSION_CACHE_TTL: キャッシュの保持秒数（既定 300、0 でキャッシュ無効）
+    SESSION_CACHE_SIZE: キャッシュの最大件数（既定 5000）
+    SESSION_SWEEP_INTERVAL: 期限切れセッションを削除する間隔（秒、既定 3600、0 で削除しない）
+    SESSION_SWEEP_BATCH: 1回の DELETE で消す件数（既定 1000）
+"""
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, Tuple
+
+from api.database import db
+
+SESSION_TTL_HOURS = float(os.getenv('SESSION_TTL_HOURS', '168'))
+SESSION_CACHE_TTL = float(os.getenv('SESSION_CACHE_TTL', '300'))
+SESSION_CACHE_SIZE = int(os.getenv('SESSION_CACHE_SIZE', '5000'))
+SESSION_SWEEP_INTERVAL = float(os.getenv('SESSION_SWEEP_INTERVAL', '3600'))
+SESSION_SWEEP_BATCH = int(os.getenv('SESSION_SWEEP_BATCH', '1000'))
+
+
+def _now() -> datetime:
+    return datetime.now().replace(microsecond=0)
+
+
+def _as_datetime(value: Any) -> Optional[datetime]:
+    """DB から読んだ日時（datetime または ISO 文字列）を datetime にする"""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+class SessionStore:
+    """session_id → セッション（discord_id, username, expires_at）"""
+
+    def __init__(
+        self,
+        ttl_hours: float = SESSION_TTL_HOURS,
+        cache_ttl: float = SESSION_CACHE_TTL,
+        cache_size: int = SESSION_CACHE_SIZE,
+        sweep_interval: float = SESSION_SWEEP_INTERVAL,
+        sweep_batch: int = SESSION_SWEEP_BATCH
+    ):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.sweep_interval = sweep_interval
+        self.sweep_batch = sweep_batch
+        # session_id → (キャッシュ期限, セッション)。末尾が最近使ったもの
+        self._cache: 'OrderedDict[str, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {'hits': 0, 'misses': 0, 'swept': 0}
+
+    async def create(self, discord_id: str, username: str) -> str:
+        """セッションを作成して session_id を返す"""
+        session_id = str(uuid.uuid4())
+        now = _now()
+        session = {
+            'session_id': session_id,
+            'discord_id': discord_id,
+            'username': username,
+            'created_at': now,
+            'expires_at': now + self.ttl,
+        }
+        result = await db.execute_query('sessions', operation='insert', data=session)
+        if result.get('error'):
+            raise RuntimeError(result['error'])
+        self._remember(session)
+        return session_id
+
+    async def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """有効なセッションを取得（無い・期限切れなら None）"""
+        entry = self._cache.get(session_id)
+        if entry is not None:
+            cache_expires, session = entry
+            if cache_expires > time.monotonic() and session['expires_at'] > _now():
+                self._cache.move_to_end(session_id)
+                self._stats['hits'] += 1
+                return dict(session)
+            del self._cache[session_id]
+
+        self._stats['misses'] += 1
+        result = await db.execute_query(
+            'sessions', operation='select',
+            filters={'session_id': session_id},
+            columns='session_id, discord_id, username, created_at, expires_at', json_fields=()
+        )
+        if result.get('error'):
+            raise RuntimeError(result['error'])
+        if not result.get('data'):
+            return None
+
+        session = result['data'][0]
+        session['expires_at'] = self._expires_at(session)
+        if session['expires_at'] is None or session['expires_at'] <= _now():
+            return None
+        self._remember(session)
+        return dict(session)
+
+    async def start(self) -> None:
+        """期限切れセッションのスイーパーを起動する"""
+        if self.sweep_interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def sweep(self) -> int:
+        """期限切れのセッションを sweep_batch 件ずつ削除し、削除した件数を返す"""
+        now = _now()
+        total = 0
+        while True:
+            # 1バッチ（読み込み → 削除）ごとに1トランザクションでコミットする
+            async with db.transaction() as tx:
+                rows = await tx.fetchall(
+                    "SELECT session_id FROM sessions"
+                    " WHERE expires_at < %s OR (expires_at IS NULL AND created_at < %s) LIMIT %s",
+                    (now, now - self.ttl, self.sweep_batch)
+                )
+                ids = [row['session_id'] for row in rows]
+                if ids:
+                    await tx.execute(
+                        f"DELETE FROM sessions WHERE session_id IN ({', '.join(['%s'] * len(ids))})", ids
+                    )
+            if not ids:
+                break
+            total += len(ids)
+            if len(ids) < self.sweep_batch:
+                break
+            # 他のクエリを待たせないよう1バッチごとに譲る
+            await asyncio.sleep(0)
+        self._stats['swept'] += total
+        return total
+
+    def stats(self) -> Dict[str, Any]:
+        """キャッシュのヒット数・削除件数など（/health 用）"""
+        return {'cached': len(self._cache), **self._stats}
+
+    def _expires_at(self, session: Dict[str, Any]) -> Optional[datetime]:
+        expires_at = _as_datetime(session.get('expires_at'))
+        if expires_at is not None:
+            return expires_at
+        # expires_at 追加前に作られたセッション
+        created_at = _as_datetime(session.get('created_at'))
+        if created_at is None:
+            return None
+        return created_at.replace(tzinfo=None) + self.ttl
+
+    def _remember(self, session: Dict[str, Any]) -> None:
+        if self.cache_ttl <= 0:
+            return
+        session_id = session['session_id']
+        self._cache.pop(session_id, None)
+        self._cache[session_id] = (time.monotonic() + self.cache_ttl, dict(session))
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            try:
+                count = await self.sweep()
+                if count:
+                    print(f'🧹 期限切れセッション {count} 件を削除しました')
+            except Exception as e:
+                print(f'⚠️ 期限切れセッションの削除に失敗: {e}')
+            await asyncio.sleep(self.sweep_interval)
+
+
+# グローバルインスタンス
+session_store = SessionStore()
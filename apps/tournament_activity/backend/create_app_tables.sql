@@ -0,0 +1,149 @@
+-- 練習・イベント・審判講習・アプリログ関連テーブル
+-- database_setup_mariadb.sql 以降にアプリで追加されたテーブル・カラムの定義。
+-- 本番DBに既にあるものは IF NOT EXISTS で何もしない。
+-- （SQLite版の開発用DB api/database_sqlite.py もこのファイルからスキーマを作る）
+
+-- 選手マスタの追加カラム
+ALTER TABLE player_mst
+  ADD COLUMN IF NOT EXISTS player_name_kana VARCHAR(255) DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS last_name VARCHAR(100) DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS first_name VARCHAR(100) DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS last_name_kana VARCHAR(100) DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS first_name_kana VARCHAR(100) DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS member_level INT DEFAULT NULL COMMENT '0=正会員, 1=準会員, 2=ゲスト',
+  ADD COLUMN IF NOT EXISTS admin_role INT DEFAULT 2 COMMENT '0=管理者, 1=大会申込管理者, 2=一般',
+  ADD COLUMN IF NOT EXISTS managed_ward_id INT DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS practice_admin TINYINT(1) DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS arakawa_flg TINYINT(1) DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS adachi_flg TINYINT(1) DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS itabashi_flg TINYINT(1) DEFAULT 0,
+  ADD COLUMN IF NOT EXISTS skill_grade VARCHAR(20) DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS skill_grade_date DATE DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS referee_qualification VARCHAR(20) DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS referee_date DATE DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS referee_expiry VARCHAR(7) DEFAULT NULL COMMENT 'YYYY-MM',
+  ADD COLUMN IF NOT EXISTS created_by VARCHAR(255) DEFAULT NULL;
+
+-- 大会・申込の追加カラム
+ALTER TABLE tournament_mst
+  ADD COLUMN IF NOT EXISTS max_entries INT DEFAULT NULL,
+  ADD COLUMN IF NOT EXISTS notified TINYINT(1) DEFAULT 0;
+
+ALTER TABLE tournament_registration
+  ADD COLUMN IF NOT EXISTS team_status INT NOT NULL DEFAULT 0 COMMENT '0=チーム確定, 1=参加希望';
+
+-- 申込可能大会の取得（締切日で絞り込む）用
+CREATE INDEX IF NOT EXISTS idx_tournament_deadline ON tournament_mst (deadline_date);
+
+-- 練習日程
+CREATE TABLE IF NOT EXISTS practice_schedule (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    practice_date DATE NOT NULL,
+    start_time TIME NOT NULL,
+    end_time TIME NOT NULL,
+    location VARCHAR(255) NOT NULL,
+    court_number VARCHAR(100) DEFAULT NULL,
+    deadline_date DATETIME DEFAULT NULL,
+    status VARCHAR(20) DEFAULT NULL,
+    visibility VARCHAR(20) DEFAULT 'public',
+    closed TINYINT(1) DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_practice_date (practice_date),
+    INDEX idx_practice_date_location (practice_date, location)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS practice_participants (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    practice_id INT NOT NULL,
+    player_id INT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_practice (practice_id),
+    INDEX idx_player (player_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS practice_invitations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    practice_id INT NOT NULL,
+    player_id INT NOT NULL,
+    INDEX idx_practice (practice_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS practice_court_reservations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    practice_id INT NOT NULL,
+    start_time VARCHAR(10) NOT NULL,
+    end_time VARCHAR(10) NOT NULL,
+    reserver_name VARCHAR(255) DEFAULT NULL,
+    INDEX idx_practice (practice_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- イベント
+CREATE TABLE IF NOT EXISTS events (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    event_date DATE NOT NULL,
+    start_time TIME DEFAULT NULL,
+    end_time TIME DEFAULT NULL,
+    location VARCHAR(255) DEFAULT NULL,
+    deadline_date DATETIME DEFAULT NULL,
+    max_participants INT DEFAULT NULL,
+    description TEXT DEFAULT NULL,
+    status VARCHAR(20) DEFAULT NULL,
+    visibility VARCHAR(20) DEFAULT 'public',
+    created_by VARCHAR(255) DEFAULT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_event_date (event_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS event_participants (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    event_id INT NOT NULL,
+    player_id INT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_event (event_id),
+    INDEX idx_player (player_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS event_invitations (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    event_id INT NOT NULL,
+    player_id INT NOT NULL,
+    INDEX idx_event (event_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 審判講習会
+CREATE TABLE IF NOT EXISTS referee_training (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    training_date DATE NOT NULL,
+    reception_time VARCHAR(10) DEFAULT NULL,
+    start_time VARCHAR(10) DEFAULT NULL,
+    location VARCHAR(255) NOT NULL,
+    training_type VARCHAR(100) DEFAULT NULL,
+    notes TEXT DEFAULT NULL,
+    deadline_date DATETIME DEFAULT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_training_date (training_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+CREATE TABLE IF NOT EXISTS referee_training_registration (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    training_id INT NOT NULL,
+    discord_id VARCHAR(255) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_training (training_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- アプリログ（フロントエンド・ログイン記録）
+CREATE TABLE IF NOT EXISTS app_logs (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    level VARCHAR(10) NOT NULL,
+    discord_id VARCHAR(255) DEFAULT NULL,
+    username VARCHAR(255) DEFAULT NULL,
+    display_name VARCHAR(255) DEFAULT NULL,
+    event VARCHAR(100) NOT NULL,
+    detail TEXT DEFAULT NULL,
+    admin_role VARCHAR(50) DEFAULT NULL,
+    member_level_name VARCHAR(50) DEFAULT NULL,
+    INDEX idx_discord (discord_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -12,3 +12,15 @@ CREATE TABLE IF NOT EXISTS comments (
     INDEX idx_target (target_type, target_id),
     INDEX idx_player (player_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 返信先（スレッド。トップレベルは NULL）
+ALTER TABLE comments
+  ADD COLUMN IF NOT EXISTS parent_id INT DEFAULT NULL;
+
+-- メンション先の名前（{"player_id": 名前} の JSON。投稿・編集時に保存し、一覧で使う）
+ALTER TABLE comments
+  ADD COLUMN IF NOT EXISTS mention_names TEXT DEFAULT NULL;
+
+-- トップレベルのコメントを新しい順にページングする / 返信をまとめて引く
+CREATE INDEX IF NOT EXISTS idx_target_thread ON comments (target_type, target_id, parent_id, id);
+CREATE INDEX IF NOT EXISTS idx_parent ON comments (parent_id);
@@ -0,0 +1,10 @@
+-- DMチャンネルIDのキャッシュ（discord_dm_channel）
+-- Discord の DM は「DMチャンネル作成 → メッセージ送信」の2回の API 呼び出しが要るが、
+-- ユーザーごとの DM チャンネルIDは変わらないため、作成済みのIDを保存して2回目以降は送信だけにする。
+-- api/dm_channels.py がプロセス内の LRU と合わせて読み書きする。
+
+CREATE TABLE IF NOT EXISTS discord_dm_channel (
+    discord_id VARCHAR(32) NOT NULL PRIMARY KEY,
+    channel_id VARCHAR(32) NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
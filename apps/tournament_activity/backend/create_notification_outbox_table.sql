@@ -0,0 +1,34 @@
+-- 通知アウトボックス（notification_outbox）
+-- Discord への DM・Webhook 通知を1件1行で積み、api/notification_outbox.py の
+-- ディスパッチャがバックグラウンドで送信する（APIは積んだ時点で応答を返す）。
+-- status: pending（送信待ち）→ sending（送信中）→ sent（送信済）/ dead（再送上限・恒久エラー）
+-- dead の行は GET /api/notify/outbox で確認し、POST /api/notify/outbox/{id}/retry で再送できる。
+
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    kind VARCHAR(40) NOT NULL,                     -- 'registration', 'mention', 'deadline_closed' など
+    channel VARCHAR(10) NOT NULL,                  -- 'dm' または 'webhook'
+    target VARCHAR(500) NOT NULL,                  -- DM: discord_id / Webhook: URL
+    payload TEXT NOT NULL,                         -- Discord に POST する JSON 本文
+    attachments MEDIUMTEXT DEFAULT NULL,           -- 添付ファイル（name, content_type, base64 の data）の JSON 配列（Webhookのみ）
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NOT NULL,
+    claim_token VARCHAR(36) DEFAULT NULL,          -- 送信中の行を取得したディスパッチャの識別子
+    claimed_at DATETIME DEFAULT NULL,
+    last_error VARCHAR(500) DEFAULT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME DEFAULT NULL,
+    INDEX idx_outbox_due (status, next_attempt_at),
+    INDEX idx_outbox_claim (claim_token)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- 一斉送信（fan_out）ごとの進捗確認用
+ALTER TABLE notification_outbox
+  ADD COLUMN IF NOT EXISTS batch_id VARCHAR(32) DEFAULT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_outbox_batch ON notification_outbox (batch_id);
+
+-- 添付ファイルは積む時点の内容を行に保存する（送信時にファイルを読まない）
+ALTER TABLE notification_outbox
+  MODIFY COLUMN attachments MEDIUMTEXT DEFAULT NULL;
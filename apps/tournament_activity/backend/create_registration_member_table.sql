@@ -0,0 +1,15 @@
+-- 申込メンバーテーブル（registration_member）
+-- tournament_registration.pair1 / pair2(JSON配列) の選手を1人1行に展開したもの。
+-- 「この選手が含まれる申込」をインデックスで引くために使う（pair2 の LIKE 検索を置き換える）。
+-- 申込の作成・変更・削除時に api/registration_members.py が同期する。
+-- 既存の申込は作成後に scripts/backfill_registration_member.py で投入する。
+
+CREATE TABLE IF NOT EXISTS registration_member (
+    registration_id INT NOT NULL,
+    player_id INT NOT NULL,
+    role VARCHAR(10) NOT NULL,                 -- 'pair1' または 'pair2'
+    position INT NOT NULL DEFAULT 0,           -- pair2 配列内の順番（pair1 は 0）
+    PRIMARY KEY (registration_id, role, position),
+    INDEX idx_member_player (player_id, registration_id),
+    FOREIGN KEY (registration_id) REFERENCES tournament_registration(registration_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -1,13 +1,18 @@
--- セッションテーブルを作成
+-- セッションテーブル（従来方式の起動リンク用。discord_id を session_id で受け渡す）
+-- expires_at を過ぎたセッションは api/session_store.py のスイーパーが定期的に削除する。
 
 CREATE TABLE IF NOT EXISTS sessions (
-    session_id TEXT PRIMARY KEY,
-    discord_id TEXT NOT NULL,
-    username TEXT NOT NULL,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT TIMEZONE('utc', NOW())
-);
+    session_id VARCHAR(36) PRIMARY KEY,
+    discord_id VARCHAR(255) NOT NULL,
+    username VARCHAR(255) NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME DEFAULT NULL,
+    INDEX idx_sessions_discord_id (discord_id),
+    INDEX idx_sessions_created_at (created_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
--- インデックス
-CREATE INDEX IF NOT EXISTS idx_sessions_discord_id ON sessions(discord_id);
-CREATE INDEX IF NOT EXISTS idx_sessions_created_at ON sessions(created_at);
+-- 既存テーブルへの追加（expires_at が NULL の古い行は created_at + SESSION_TTL_HOURS で期限切れ扱い）
+ALTER TABLE sessions
+  ADD COLUMN IF NOT EXISTS expires_at DATETIME DEFAULT NULL;
 
+CREATE INDEX IF NOT EXISTS idx_sessions_expires_at ON sessions (expires_at);
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+registration_member の初期投入
+
+create_registration_member_table.sql でテーブルを作成した後に1回実行する。
+既存の申込の pair1 / pair2 から行を作り直すので、何度実行しても同じ結果になる。
+
+使い方:
+    cd apps/tournament_activity/backend
+    python scripts/backfill_registration_member.py
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.database import db  # noqa: E402
+from api.registration_members import backfill_members  # noqa: E402
+
+
+async def main():
+    await db.initialize()
+    try:
+        count = await backfill_members()
+        print(f'✅ registration_member を作成しました: {count} 行')
+    finally:
+        await db.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
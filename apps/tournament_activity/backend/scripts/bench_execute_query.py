@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+execute_query のオーバーヘッド計測（マイクロベンチマーク）
+
+DBには接続せず、固定の結果を返すダミーカーソルで Database._run_query を呼び、
+SQL組み立てとJSONデコードにかかる1呼び出しあたりの時間を測る。
+比較用に、文キャッシュ導入前の組み立て処理（毎回文字列結合・全行でフィールド確認）を
+同じ条件で実行する。
+
+使い方:
+    cd apps/tournament_activity/backend
+    python scripts/bench_execute_query.py [--rows 50] [--calls 20000]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.database import db  # noqa: E402
+
+
+class DummyCursor:
+    """execute は何もせず、fetchall で固定の行を返すカーソル"""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self.description = tuple((name,) for name in rows[0]) if rows else None
+        self.lastrowid = 1
+        self.rowcount = 1
+
+    async def execute(self, sql, params):
+        pass
+
+    async def fetchall(self):
+        # DictCursor と同様に毎回新しい辞書を返す
+        return tuple(dict(row) for row in self._rows)
+
+
+def _legacy_deserialize(row, json_fields=None):
+    """キャッシュ導入前の _deserialize_json_fields"""
+    if json_fields is None:
+        json_fields = ['type', 'pair2']
+    result = dict(row)
+    for field in json_fields:
+        if field in result and result[field]:
+            if isinstance(result[field], str):
+                try:
+                    result[field] = json.loads(result[field])
+                except json.JSONDecodeError:
+                    pass
+    return result
+
+
+async def _legacy_select(cursor, table, filters, columns='*', json_fields=None):
+    """キャッシュ導入前の select 経路"""
+    sql = f"SELECT {columns} FROM {table}"
+    params = []
+    if filters:
+        where_clauses = []
+        for key, value in filters.items():
+            where_clauses.append(f"{key} = %s")
+            params.append(value)
+        sql += " WHERE " + " AND ".join(where_clauses)
+    await cursor.execute(sql, params)
+    rows = await cursor.fetchall()
+    return {'data': [_legacy_deserialize(row, json_fields) for row in rows], 'error': None}
+
+
+async def _legacy_update(cursor, table, filters, data):
+    """キャッシュ導入前の update 経路"""
+    serialized = data.copy()
+    for key, value in serialized.items():
+        if isinstance(value, (list, dict)):
+            serialized[key] = json.dumps(value, ensure_ascii=False)
+    set_clauses = [f"{key} = %s" for key in serialized.keys()]
+    params = list(serialized.values())
+    sql = f"UPDATE {table} SET {', '.join(set_clauses)}"
+    where_clauses = []
+    for key, value in filters.items():
+        where_clauses.append(f"{key} = %s")
+        params.append(value)
+    sql += " WHERE " + " AND ".join(where_clauses)
+    await cursor.execute(sql, params)
+    return {'data': [data], 'error': None}
+
+
+async def _measure(label, func, calls, repeat=5):
+    """calls 回の実行を repeat 回測り、最速回の1呼び出しあたりのマイクロ秒を返す"""
+    for _ in range(min(calls, 1000)):  # ウォームアップ
+        await func()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(calls):
+            await func()
+        best = min(best, time.perf_counter() - start)
+    per_call = best / calls * 1_000_000
+    print(f"  {label:<8} {per_call:8.2f} µs/call")
+    return per_call
+
+
+async def main(rows: int, calls: int):
+    registrations = DummyCursor([
+        {
+            'id': i,
+            'tournament_id': 'T001',
+            'type': '["一般"]',
+            'pair1': 100 + i,
+            'pair2': '[200, 201]',
+            'updated_at': '2024-01-01 00:00:00',
+        }
+        for i in range(rows)
+    ])
+    # JSONカラムを持たないテーブル（デフォルトの json_fields が毎行無駄に確認されていた）
+    players = DummyCursor([
+        {'player_id': i, 'discord_id': str(10 ** 17 + i), 'player_name': f'選手{i}', 'sex': 0}
+        for i in range(rows)
+    ])
+    empty = DummyCursor([])
+    filters = {'tournament_id': 'T001', 'status': 'active'}
+    data = {'pair1': 100, 'pair2': [200, 201], 'type': ['一般'], 'status': 'active'}
+
+    cases = [
+        (
+            f'select registrations ({rows} rows, JSON columns)',
+            lambda: _legacy_select(registrations, 'tournament_registrations', filters),
+            lambda: db._run_query(registrations, 'tournament_registrations', 'select', filters, None, '*', None),
+        ),
+        (
+            f'select player_mst ({rows} rows, no JSON columns)',
+            lambda: _legacy_select(players, 'player_mst', {'discord_id': '1'}),
+            lambda: db._run_query(players, 'player_mst', 'select', {'discord_id': '1'}, None, '*', None),
+        ),
+        (
+            'select (0 rows)',
+            lambda: _legacy_select(empty, 'tournament_registrations', filters),
+            lambda: db._run_query(empty, 'tournament_registrations', 'select', filters, None, '*', None),
+        ),
+        (
+            'update',
+            lambda: _legacy_update(empty, 'tournament_registrations', {'id': 1}, data),
+            lambda: db._run_query(empty, 'tournament_registrations', 'update', {'id': 1}, data, '*', None),
+        ),
+    ]
+
+    print(f"execute_query overhead ({calls} calls x 5, best run, no DB I/O)")
+    for name, before, after in cases:
+        print(f"{name}:")
+        t_before = await _measure('before', before, calls)
+        t_after = await _measure('after', after, calls)
+        print(f"  speedup  {t_before / t_after:8.2f}x")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='execute_query のオーバーヘッド計測')
+    parser.add_argument('--rows', type=int, default=50, help='select が返す行数')
+    parser.add_argument('--calls', type=int, default=5000, help='1ケースあたりの呼び出し回数')
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.calls))
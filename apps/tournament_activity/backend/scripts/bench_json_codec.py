@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+JSONコーデックの計測（10k行の一覧レスポンス・DBのJSONカラム）
+
+DBには接続せず、一覧エンドポイントが返すのと同じ形の行を作って比較する。
+    response: FastAPI 既定の経路（jsonable_encoder + JSONResponse）と
+              FastJSONResponse を直接返す経路
+    decode:   type / pair2 の JSON 文字列を行ごとに標準 json と json_codec でデコード
+    encode:   INSERT/UPDATE 時のリスト → JSON 文字列
+両経路の出力が同じJSONになることも確認する。
+
+使い方:
+    cd apps/tournament_activity/backend
+    python scripts/bench_json_codec.py [--rows 10000] [--repeat 5]
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+
+from api import json_codec  # noqa: E402
+from api.json_codec import FastJSONResponse  # noqa: E402
+
+
+def _players(n):
+    return [
+        {
+            'player_id': i,
+            'discord_id': str(900000000000000000 + i),
+            'jsta_number': f'S{i}',
+            'player_name': f'選手{i}',
+            'address': f'東京都荒川区町屋{i % 9 + 1}-{i % 30 + 1}',
+            'phone_number': '090-0000-0000',
+            'birth_date': date(1970, 1, 1) + timedelta(days=i),
+            'sex': i % 2,
+            'affiliated_club': '荒川クラブ',
+            'created_at': datetime(2024, 1, 1, 12, 0, 0),
+            'updated_at': datetime(2024, 1, 2, 12, 0, 0),
+        }
+        for i in range(n)
+    ]
+
+
+def _practices(n):
+    # TIME カラムは aiomysql から timedelta、集計値は Decimal で返ってくることがある
+    return [
+        {
+            'id': i,
+            'practice_date': date(2025, 1, 1) + timedelta(days=i % 365),
+            'start_time': timedelta(hours=9),
+            'end_time': timedelta(hours=12),
+            'location': '荒川総合スポーツセンター',
+            'fee': Decimal('500'),
+            'participant_count': 12,
+            'participant_names': [f'選手{j}' for j in range(12)],
+            'invited_player_ids': [],
+        }
+        for i in range(n)
+    ]
+
+
+def _measure(func, repeat):
+    """repeat 回測って最速回のミリ秒を返す"""
+    func()  # ウォームアップ
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _report(name, before, after, repeat):
+    t_before = _measure(before, repeat)
+    t_after = _measure(after, repeat)
+    print(f'{name}:')
+    print(f'  before   {t_before:8.2f} ms')
+    print(f'  after    {t_after:8.2f} ms')
+    print(f'  speedup  {t_before / t_after:8.2f}x')
+
+
+def main(rows, repeat):
+    print(f'JSON codec: {json_codec.JSON_CODEC} ({rows} rows, best of {repeat})')
+
+    for label, data in (('players', _players(rows)), ('practice', _practices(rows))):
+        default = JSONResponse(jsonable_encoder(data)).body
+        fast = FastJSONResponse(data).body
+        assert json.loads(default) == json.loads(fast), f'{label}: output differs'
+        _report(
+            f'response {label} ({len(default) / 1024:.0f} KiB)',
+            lambda: JSONResponse(jsonable_encoder(data)).body,
+            lambda: FastJSONResponse(data).body,
+            repeat,
+        )
+
+    # tournament_registration の type / pair2 相当
+    raw = [('["一般", "35"]', f'[{i}, {i + 1}]') for i in range(rows)]
+    _report(
+        'decode type/pair2',
+        lambda: [(json.loads(t), json.loads(p)) for t, p in raw],
+        lambda: [(json_codec.loads(t), json_codec.loads(p)) for t, p in raw],
+        repeat,
+    )
+    values = [(['一般', '35'], [i, i + 1]) for i in range(rows)]
+    _report(
+        'encode type/pair2',
+        lambda: [(json.dumps(t, ensure_ascii=False), json.dumps(p, ensure_ascii=False)) for t, p in values],
+        lambda: [(json_codec.dumps(t), json_codec.dumps(p)) for t, p in values],
+        repeat,
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='JSONコーデックの計測')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
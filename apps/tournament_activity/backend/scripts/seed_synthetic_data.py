@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+負荷試験用の合成データ投入
+
+選手・大会・申込・練習・イベント・コメントを指定した規模で db.bulk_insert する。
+DB_BACKEND=sqlite と組み合わせると MariaDB 無しでアプリ全体を計測できる。
+乱数は --seed で固定されるので、同じ引数なら同じデータになる。
+
+使い方:
+    cd apps/tournament_activity/backend
+    DB_BACKEND=sqlite DB_SQLITE_PATH=bench.sqlite3 \\
+        python scripts/seed_synthetic_data.py [--players 2000] [--tournaments 200] [--practices 500]
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.database import db  # noqa: E402
+from api.registration_members import backfill_members  # noqa: E402
+
+LAST_NAMES = ['佐藤', '鈴木', '高橋', '田中', '伊藤', '渡辺', '山本', '中村', '小林', '加藤']
+FIRST_NAMES = ['太郎', '花子', '一郎', '美咲', '健太', '由美', '翔', '陽子', '大輔', '彩']
+CLUBS = ['荒川クラブ', '足立ソフトテニス会', '板橋STC', '江東クラブ', None]
+LOCATIONS = ['荒川総合スポーツセンター', '東綾瀬公園', '板橋区立城北公園', '夢の島公園']
+TYPES = ['一般', '35', '45', '55']
+
+# 合成データの player_id / discord_id が既存データと重ならないようにずらす
+ID_OFFSET = 100000
+
+
+def _players(n: int, rng: random.Random):
+    rows = []
+    for i in range(n):
+        last, first = rng.choice(LAST_NAMES), rng.choice(FIRST_NAMES)
+        rows.append({
+            'player_id': ID_OFFSET + i,
+            'discord_id': str(900000000000000000 + i),
+            'jsta_number': f'S{ID_OFFSET + i}',
+            'player_name': f'{last}{first}{i}',
+            'last_name': last,
+            'first_name': f'{first}{i}',
+            'post_number': '116-0001',
+            'address': f'東京都荒川区町屋{i % 9 + 1}-{i % 30 + 1}',
+            'phone_number': f'090-{i % 10000:04d}-{(i * 7) % 10000:04d}',
+            'birth_date': date(1950, 1, 1) + timedelta(days=rng.randrange(20000)),
+            'sex': i % 2,
+            'affiliated_club': rng.choice(CLUBS),
+            'member_level': rng.choice([0, 0, 0, 1, 2]),
+            'admin_role': 0 if i < 3 else 2,
+            'arakawa_flg': int(rng.random() < 0.5),
+            'adachi_flg': int(rng.random() < 0.3),
+            'itabashi_flg': int(rng.random() < 0.2),
+        })
+    return rows
+
+
+def _tournaments(n: int, rng: random.Random, today: date):
+    rows = []
+    for i in range(n):
+        held = today + timedelta(days=rng.randrange(-365, 180))
+        rows.append({
+            'tournament_id': f'synthetic_{i:05d}',
+            'registrated_ward': rng.choice([8, 18, 19, 21]),
+            'tournament_name': f'合成大会{i}',
+            'classification': rng.choice([0, 1, 2]),
+            'mix_flg': int(rng.random() < 0.2),
+            'type': rng.sample(TYPES, rng.randint(1, 3)),
+            'tournament_date': held,
+            'deadline_date': held - timedelta(days=14),
+            'venue': rng.choice(LOCATIONS),
+        })
+    return rows
+
+
+def _registrations(players, tournaments, per_tournament: int, rng: random.Random):
+    rows = []
+    for tournament in tournaments:
+        # discord_id × 大会 × 種別 は一意なので、同じ大会では選手を重複させない
+        for applicant in rng.sample(players, min(per_tournament, len(players))):
+            partner = rng.choice(players)
+            rows.append({
+                'discord_id': applicant['discord_id'],
+                'tournament_id': tournament['tournament_id'],
+                'type': tournament['type'][0],
+                'sex': applicant['sex'],
+                'pair1': applicant['player_id'],
+                'pair2': [partner['player_id']],
+            })
+    return rows
+
+
+def _practices(n: int, per_practice: int, players, rng: random.Random, today: date):
+    schedules, participants = [], []
+    for i in range(n):
+        practice_id = ID_OFFSET + i
+        start_hour = rng.choice([9, 13, 18])
+        schedules.append({
+            'id': practice_id,
+            'practice_date': today + timedelta(days=rng.randrange(-180, 90)),
+            'start_time': f'{start_hour:02d}:00:00',
+            'end_time': f'{start_hour + 3:02d}:00:00',
+            'location': rng.choice(LOCATIONS),
+            'court_number': str(rng.randint(1, 8)),
+            'visibility': 'public',
+        })
+        for player in rng.sample(players, min(rng.randint(0, per_practice), len(players))):
+            participants.append({'practice_id': practice_id, 'player_id': player['player_id']})
+    return schedules, participants
+
+
+def _events(n: int, per_event: int, players, rng: random.Random, today: date):
+    events, participants = [], []
+    for i in range(n):
+        event_id = ID_OFFSET + i
+        events.append({
+            'id': event_id,
+            'title': f'合成イベント{i}',
+            'event_date': today + timedelta(days=rng.randrange(-90, 90)),
+            'location': rng.choice(LOCATIONS),
+            'max_participants': per_event * 2,
+            'visibility': 'public',
+        })
+        for player in rng.sample(players, min(rng.randint(0, per_event), len(players))):
+            participants.append({'event_id': event_id, 'player_id': player['player_id']})
+    return events, participants
+
+
+def _comments(tournaments, per_target: int, players, rng: random.Random):
+    rows = []
+    now = datetime.now().replace(microsecond=0)
+    for tournament in tournaments:
+        for j in range(rng.randint(0, per_target)):
+            rows.append({
+                'target_type': 'tournament',
+                'target_id': tournament['tournament_id'],
+                'player_id': rng.choice(players)['player_id'],
+                'body': f'コメント{j}',
+                'created_at': now - timedelta(minutes=rng.randrange(100000)),
+            })
+    return rows
+
+
+async def _insert(table: str, rows):
+    result = await db.bulk_insert(table, rows)
+    if result.get('error'):
+        raise RuntimeError(f'{table}: {result["error"]}')
+    print(f'  {table:<24} {len(rows):>8} rows')
+
+
+async def main(args):
+    rng = random.Random(args.seed)
+    today = date.today()
+
+    await db.initialize()
+    try:
+        players = _players(args.players, rng)
+        tournaments = _tournaments(args.tournaments, rng, today)
+        registrations = _registrations(players, tournaments, args.registrations_per_tournament, rng)
+        schedules, practice_participants = _practices(args.practices, args.participants, players, rng, today)
+        events, event_participants = _events(args.events, args.participants, players, rng, today)
+        comments = _comments(tournaments, args.comments_per_target, players, rng)
+
+        print('合成データを投入します:')
+        await _insert('player_mst', players)
+        await _insert('tournament_mst', tournaments)
+        await _insert('tournament_registration', registrations)
+        print(f'  {"registration_member":<24} {await backfill_members():>8} rows')
+        await _insert('practice_schedule', schedules)
+        await _insert('practice_participants', practice_participants)
+        await _insert('events', events)
+        await _insert('event_participants', event_participants)
+        await _insert('comments', comments)
+    finally:
+        await db.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='負荷試験用の合成データ投入')
+    parser.add_argument('--players', type=int, default=2000)
+    parser.add_argument('--tournaments', type=int, default=200)
+    parser.add_argument('--registrations-per-tournament', type=int, default=40)
+    parser.add_argument('--practices', type=int, default=500)
+    parser.add_argument('--events', type=int, default=100)
+    parser.add_argument('--participants', type=int, default=20, help='練習・イベント1件あたりの最大参加者数')
+    parser.add_argument('--comments-per-target', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
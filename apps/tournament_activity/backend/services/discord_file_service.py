@@ -4,12 +4,13 @@ Discord ファイル送信サービス
 大会申込ExcelファイルをDiscordチャンネルに送信
 """
 import os
-import json
-import requests
-import asyncio
 from typing import Dict, List, Tuple
 from pathlib import Path
 
+from api.discord_client import discord
+
+XLSX_MIME_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
 
 class DiscordFileService:
     """Discord ファイル送信サービス"""
@@ -74,8 +75,8 @@ class DiscordFileService:
         if not files_to_upload:
             raise ValueError("No files to upload")
 
-        # Discordにファイルをアップロード（同期メソッドを非同期実行）
-        message_data = await asyncio.to_thread(self._send_files_to_discord, content, files_to_upload)
+        # Discordにファイルをアップロード
+        message_data = await self._send_files_to_discord(content, files_to_upload)
 
         # アップロードされたファイルのURLを取得
         result = {}
@@ -92,13 +93,13 @@ class DiscordFileService:
 
         return result
 
-    def _send_files_to_discord(
+    async def _send_files_to_discord(
         self,
         content: str,
         files: List[Tuple[str, str]]
     ) -> Dict:
         """
-        Discord APIでファイルを送信（同期版 - requestsを使用）
+        Discord APIでファイルを送信（共通の Discord クライアントを使用）
 
         Args:
             content: メッセージ内容
@@ -107,50 +108,20 @@ class DiscordFileService:
         Returns:
             Discord APIのレスポンス（メッセージデータ）
         """
-        url = f"https://discord.com/api/v10/channels/{self.channel_id}/messages"
-        headers = {
-            "Authorization": f"Bot {self.bot_token}"
-        }
-
-        # ファイルをマルチパートフォームデータとして準備
-        files_data = {}
-        file_handles = []
-
-        try:
-            for idx, (file_path, file_name) in enumerate(files):
-                if not Path(file_path).exists():
-                    raise FileNotFoundError(f"File not found: {file_path}")
-
-                f = open(file_path, 'rb')
-                file_handles.append(f)
-                files_data[f'files[{idx}]'] = (file_name, f, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-
-            # payload_jsonを正しいJSON文字列に変換
-            payload = {
-                "content": content
-            }
-            data = {
-                'payload_json': json.dumps(payload)
-            }
-
-            # requestsを使用してファイルをアップロード
-            response = requests.post(
-                url,
-                headers=headers,
-                data=data,
-                files=files_data,
-                timeout=60.0
-            )
+        attachments = []
+        for file_path, file_name in files:
+            if not Path(file_path).exists():
+                raise FileNotFoundError(f"File not found: {file_path}")
+            attachments.append((file_name, Path(file_path).read_bytes(), XLSX_MIME_TYPE))
 
-            if response.status_code not in [200, 201]:
-                raise Exception(f"Discord API error: {response.status_code} - {response.text}")
+        response = await discord.send_message(
+            self.channel_id, {"content": content}, attachments, timeout=60.0
+        )
 
-            return response.json()
+        if response.status_code not in [200, 201]:
+            raise Exception(f"Discord API error: {response.status_code} - {response.text}")
 
-        finally:
-            # ファイルハンドルをクローズ
-            for f in file_handles:
-                f.close()
+        return response.json()
 
     def _get_current_time(self) -> str:
         """現在時刻を取得（日本時間）"""
@@ -14,6 +14,7 @@ interface Comment {
   player_id: number
   player_name: string | null
   body: string
+  mention_names?: Record<string, string>  // 投稿時に解決したメンション先の名前
   created_at: string
   updated_at: string
 }
@@ -24,11 +25,17 @@ interface MemberOption {
 }
 
 const apiUrl = import.meta.env.VITE_API_URL || 'http://localhost:8000'
+// 1回に読み込むトップレベルのコメント数（返信は親と一緒に届く）
+const PAGE_SIZE = 30
+// GET /api/comments の limit の上限
+const MAX_PAGE_SIZE = 200
 
 type MentionTarget = number | 'new' | 'reply'
 
 export default function CommentSection({ targetType, targetId, discordId }: CommentSectionProps) {
   const [comments, setComments] = useState<Comment[]>([])
+  const [hasMore, setHasMore] = useState(false)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [members, setMembers] = useState<MemberOption[]>([])
   const [body, setBody] = useState('')
   const [posting, setPosting] = useState(false)
@@ -59,11 +66,15 @@ export default function CommentSection({ targetType, targetId, discordId }: Comm
       setLoading(true)
       try {
         const [cRes, mRes, meRes] = await Promise.all([
-          fetch(`${apiUrl}/api/comments?target_type=${targetType}&target_id=${targetId}`),
+          fetch(`${apiUrl}/api/comments?target_type=${targetType}&target_id=${targetId}&limit=${PAGE_SIZE}`),
           fetch(`${apiUrl}/api/players`),
           fetch(`${apiUrl}/api/players/discord/${discordId}`),
         ])
-        if (cRes.ok) setComments(await cRes.json())
+        if (cRes.ok) {
+          const page: Comment[] = await cRes.json()
+          setComments(page)
+          setHasMore(page.filter(c => !c.parent_id).length >= PAGE_SIZE)
+        }
         if (mRes.ok) {
           const all = await mRes.json()
           setMembers(all.map((p: any) => ({ player_id: p.player_id, player_name: p.player_name })))
@@ -78,13 +89,45 @@ export default function CommentSection({ targetType, targetId, discordId }: Comm
     load()
   }, [targetType, targetId, discordId])
 
+  // 投稿・編集・削除後: 読み込み済みの範囲を取り直す
+  // （新しい投稿の分 +1 件多く取り、API の上限で届かなかった古いスレッドは読み込み済みのものを残す）
   const reload = async () => {
     try {
-      const res = await fetch(`${apiUrl}/api/comments?target_type=${targetType}&target_id=${targetId}`)
-      if (res.ok) setComments(await res.json())
+      const loaded = comments.filter(c => !c.parent_id).length
+      const limit = Math.min(Math.max(PAGE_SIZE, loaded + 1), MAX_PAGE_SIZE)
+      const res = await fetch(`${apiUrl}/api/comments?target_type=${targetType}&target_id=${targetId}&limit=${limit}`)
+      if (!res.ok) return
+      const page: Comment[] = await res.json()
+      const pageRoots = page.filter(c => !c.parent_id)
+      if (pageRoots.length < limit) {
+        // 最古のスレッドまで届いた
+        setComments(page)
+        setHasMore(false)
+        return
+      }
+      const oldest = Math.min(...pageRoots.map(c => c.id))
+      const older = comments.filter(c => (c.parent_id ?? c.id) < oldest)
+      setComments([...page, ...older])
+      setHasMore(older.some(c => !c.parent_id) ? hasMore : true)
     } catch {}
   }
 
+  // さらに古いコメントを読み込む（読み込み済みの最古のトップレベルより前）
+  const loadOlder = async () => {
+    const roots = comments.filter(c => !c.parent_id)
+    if (roots.length === 0) return
+    const beforeId = Math.min(...roots.map(c => c.id))
+    setLoadingMore(true)
+    try {
+      const res = await fetch(`${apiUrl}/api/comments?target_type=${targetType}&target_id=${targetId}&limit=${PAGE_SIZE}&before_id=${beforeId}`)
+      if (res.ok) {
+        const page: Comment[] = await res.json()
+        setComments(prev => [...page, ...prev.filter(c => !page.some(p => p.id === c.id))])
+        setHasMore(page.filter(c => !c.parent_id).length >= PAGE_SIZE)
+      }
+    } catch {} finally { setLoadingMore(false) }
+  }
+
   const setValueFor = (which: MentionTarget, v: string) => {
     if (which === 'new') setBody(v)
     else if (which === 'reply') setReplyBody(v)
@@ -221,7 +264,7 @@ export default function CommentSection({ targetType, targetId, discordId }: Comm
     } catch { alert('通信エラー') }
   }
 
-  const renderBody = (text: string) => {
+  const renderBody = (text: string, mentionNames?: Record<string, string>) => {
     const parts: any[] = []
     const re = /<@(\d+)>/g
     let last = 0
@@ -229,9 +272,9 @@ export default function CommentSection({ targetType, targetId, discordId }: Comm
     while ((m = re.exec(text)) !== null) {
       if (m.index > last) parts.push(text.slice(last, m.index))
       const pid = Number(m[1])
-      const member = members.find(mb => mb.player_id === pid)
+      const name = mentionNames?.[m[1]] || members.find(mb => mb.player_id === pid)?.player_name
       parts.push(
-        <span key={`m-${m.index}`} style={{ color: '#93c5fd', backgroundColor: '#1e3a8a40', padding: '1px 4px', borderRadius: '3px', fontSize: '13px' }}>@{member?.player_name || '?'}</span>
+        <span key={`m-${m.index}`} style={{ color: '#93c5fd', backgroundColor: '#1e3a8a40', padding: '1px 4px', borderRadius: '3px', fontSize: '13px' }}>@{name || '?'}</span>
       )
       last = m.index + m[0].length
     }
@@ -280,7 +323,7 @@ export default function CommentSection({ targetType, targetId, discordId }: Comm
         </div>
       ) : (
         <>
-          <div style={{ fontSize: '13px', color: '#e2e8f0', whiteSpace: 'pre-wrap', wordBreak: 'break-word' }}>{renderBody(c.body)}</div>
+          <div style={{ fontSize: '13px', color: '#e2e8f0', whiteSpace: 'pre-wrap', wordBreak: 'break-word' }}>{renderBody(c.body, c.mention_names)}</div>
           <div style={{ display: 'flex', gap: '10px', marginTop: '6px' }}>
             {myPlayerId && <button onClick={() => startReply(c)} style={btnLink}>返信</button>}
             {canEdit(c) && <button onClick={() => handleStartEdit(c)} style={btnLink}>編集</button>}
@@ -292,7 +335,7 @@ export default function CommentSection({ targetType, targetId, discordId }: Comm
   )
 
   // ツリー構築
-  const topLevel = comments.filter(c => !c.parent_id)
+  const topLevel = comments.filter(c => !c.parent_id).sort((a, b) => a.id - b.id)
   const repliesOf = (rootId: number) =>
     comments.filter(c => c.parent_id === rootId).sort((a, b) => (a.created_at || '').localeCompare(b.created_at || ''))
 
@@ -308,6 +351,11 @@ export default function CommentSection({ targetType, targetId, discordId }: Comm
         <p style={{ color: '#64748b', fontSize: '13px', marginBottom: '12px' }}>まだコメントはありません</p>
       ) : (
         <div style={{ display: 'flex', flexDirection: 'column', gap: '8px', marginBottom: '12px' }}>
+          {hasMore && (
+            <button onClick={loadOlder} disabled={loadingMore} style={btnGhost}>
+              {loadingMore ? '読み込み中...' : '以前のコメントを表示'}
+            </button>
+          )}
           {topLevel.map(c => {
             const replies = repliesOf(c.id)
             return (
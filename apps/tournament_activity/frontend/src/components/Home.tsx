@@ -123,11 +123,12 @@ export default function Home({ discordId, permissionInfo, onNavigate }: HomeProp
 
         // 練習データ取得
         {
-          const pRes = await fetch(`${apiUrl}/api/practice`)
+          const ymd = (d: Date) => `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`
+          const todayStr = ymd(new Date())
+          // 今日以降の練習だけで足りるので期間を絞って取得
+          const pRes = await fetch(`${apiUrl}/api/practice?from_date=${todayStr}`)
           if (pRes.ok) {
             const rawData = await pRes.json()
-            const ymd = (d: Date) => `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}-${String(d.getDate()).padStart(2, '0')}`
-            const todayStr = ymd(new Date())
 
             // 公開設定による閲覧制御（限定公開練習の漏洩防止）
             const ml = permissionInfo?.memberLevel
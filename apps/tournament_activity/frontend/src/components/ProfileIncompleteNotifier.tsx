@@ -168,12 +168,12 @@ export default function ProfileIncompleteNotifier({ discordId: _discordId }: Pro
                       {sentResult && (
                         <div style={{
                           marginTop: '8px', padding: '8px 10px', borderRadius: '6px',
-                          backgroundColor: sentResult.status === 'sent' ? '#064e3b' : '#1e293b',
-                          fontSize: '12px', color: sentResult.status === 'sent' ? '#6ee7b7' : '#94a3b8',
+                          backgroundColor: sentResult.status === 'queued' ? '#064e3b' : '#1e293b',
+                          fontSize: '12px', color: sentResult.status === 'queued' ? '#6ee7b7' : '#94a3b8',
                         }}>
-                          DM: {sentResult.dm === 'sent' ? '送信済' : sentResult.dm === 'no_discord_id' ? 'Discord未連携' : `失敗(${sentResult.dm})`}
+                          DM: {sentResult.dm === 'queued' ? '送信予約済' : sentResult.dm === 'no_discord_id' ? 'Discord未連携' : `失敗(${sentResult.dm})`}
                           {sentResult.channel && sentResult.channel !== 'not_requested' && (
-                            <> / チャンネル: {sentResult.channel === 'sent' ? '送信済' : `失敗(${sentResult.channel})`}</>
+                            <> / チャンネル: {sentResult.channel === 'queued' ? '送信予約済' : `失敗(${sentResult.channel})`}</>
                           )}
                         </div>
                       )}